@@ -0,0 +1,207 @@
+"""
+Activities log writer
+Builds the activities log of a day as columns from the PriceBook and the Ledger history
+instead of from the order depths of every state, and writes the semicolon-separated rows in
+chunks with one join per row. The rows are the ones write_activities produces: the levels
+of each side in book order without the empty ones, the mid price of the best bid and ask
+(the dolphin sightings or 0 without both sides) and the profit and loss of the tick.
+The same table can be saved as .npz, or as .parquet when pyarrow is installed.
+"""
+from typing import List, Optional
+import numpy as np
+import pandas as pd
+from ledger import Ledger
+from market_data import PRICE_LEVELS, PriceBook
+from datamodel import Symbol
+
+ACTIVITIES_CHUNK_ROWS = 8192
+
+
+def _strings(values: np.ndarray) -> np.ndarray:
+    return np.array(list(map(str, values.tolist())), dtype=object)
+
+
+def _repeated_strings(values: np.ndarray) -> np.ndarray:
+    # prices and volumes take few distinct values, each is formatted once
+    uniques, inverse = np.unique(values, return_inverse=True)
+    return _strings(uniques)[inverse.reshape(-1)]
+
+
+def _side(prices: np.ndarray, volumes: np.ndarray, integral: np.ndarray, sign: int) -> tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Moves the valid levels of every row to the front, like the items of an OrderDepth side.
+    Returns their prices, signed volumes and both formatted ('' for the missing levels).
+    """
+    valid = prices > 0
+    price_text = np.full(prices.shape, '', dtype=object)
+    volume_text = np.full(prices.shape, '', dtype=object)
+    for level in range(prices.shape[1]):
+        rows = valid[:, level]
+        column = prices[rows, level]
+        price_text[rows, level] = _repeated_strings(column.astype(np.int64) if integral[level] else column)
+        volume_text[rows, level] = _repeated_strings(sign * volumes[rows, level])
+    order = np.argsort(~valid, axis=1, kind='stable')
+    return (np.take_along_axis(np.where(valid, prices, np.nan), order, axis=1),
+            np.take_along_axis(np.where(valid, sign * volumes, 0), order, axis=1),
+            np.take_along_axis(price_text, order, axis=1),
+            np.take_along_axis(volume_text, order, axis=1))
+
+
+class ActivitiesTable:
+    """
+    The rows of the activities log in log order, tick by tick and symbol by symbol.
+    Empty levels have a NaN price, a 0 volume and empty texts, ask volumes are negative like
+    in the log. mid_price is 0 (or the dolphin
+    sightings) and profit_and_loss 0.0 where a book side is empty.
+    """
+    def __init__(self,
+                 day: int,
+                 ticks: np.ndarray,
+                 timestamps: np.ndarray,
+                 symbol_codes: np.ndarray,
+                 symbols: List[Symbol],
+                 bid_prices: np.ndarray,
+                 bid_volumes: np.ndarray,
+                 bid_texts: tuple[np.ndarray, np.ndarray],
+                 ask_prices: np.ndarray,
+                 ask_volumes: np.ndarray,
+                 ask_texts: tuple[np.ndarray, np.ndarray],
+                 mid_prices: np.ndarray,
+                 profit_and_loss: np.ndarray,
+                 quoted: np.ndarray,
+                 sightings: np.ndarray,
+                 in_ledger: np.ndarray):
+        self.day = day
+        self.ticks = ticks
+        self.timestamps = timestamps
+        self.symbol_codes = symbol_codes
+        self.symbols = symbols
+        self.bid_prices = bid_prices
+        self.bid_volumes = bid_volumes
+        self.bid_texts = bid_texts
+        self.ask_prices = ask_prices
+        self.ask_volumes = ask_volumes
+        self.ask_texts = ask_texts
+        self.mid_prices = mid_prices
+        self.profit_and_loss = profit_and_loss
+        self.quoted = quoted
+        self.sightings = sightings
+        self.in_ledger = in_ledger
+
+    def __len__(self) -> int:
+        return len(self.timestamps)
+
+    def lines(self, start: int, stop: int) -> str:
+        """
+        Returns rows start to stop of the activities log, each ending in a newline
+        """
+        day = str(self.day)
+        symbols = [self.symbols[code] for code in self.symbol_codes[start:stop].tolist()]
+        columns = [[day] * len(symbols), list(map(str, self.timestamps[start:stop].tolist())), symbols]
+        for prices, volumes in (self.bid_texts, self.ask_texts):
+            for level in range(PRICE_LEVELS):
+                columns.append(prices[start:stop, level].tolist())
+                columns.append(volumes[start:stop, level].tolist())
+        mids = _repeated_strings(self.mid_prices[start:stop])
+        # without a mid price the log has an integer 0, except for the dolphin sightings
+        mids[~self.quoted[start:stop] & ~self.sightings[start:stop]] = '0'
+        columns.append(mids.tolist())
+        columns.append(list(map(str, self.profit_and_loss[start:stop].tolist())))
+        return '\n'.join(map(';'.join, zip(*columns))) + '\n' if len(symbols) > 0 else ''
+
+    def write_csv(self, f, chunk_rows=ACTIVITIES_CHUNK_ROWS):
+        for start in range(0, len(self), chunk_rows):
+            f.write(self.lines(start, start + chunk_rows))
+
+    def final_profits(self) -> dict[Symbol, float]:
+        """
+        Returns the profit and loss of the last tick by symbol, for the symbols of the ledger with a mid price
+        """
+        if len(self) == 0:
+            return {}
+        last = (self.ticks == self.ticks[-1]) & self.quoted & self.in_ledger
+        return dict(zip([self.symbols[code] for code in self.symbol_codes[last].tolist()], self.profit_and_loss[last].tolist()))
+
+    def to_frame(self) -> pd.DataFrame:
+        """
+        Returns the table with the columns of the activities log
+        """
+        frame = pd.DataFrame({
+            'day': np.full(len(self), self.day),
+            'timestamp': self.timestamps,
+            'product': pd.Categorical.from_codes(self.symbol_codes, self.symbols),
+        })
+        for side, prices, volumes in (('bid', self.bid_prices, self.bid_volumes), ('ask', self.ask_prices, self.ask_volumes)):
+            for level in range(PRICE_LEVELS):
+                frame[f'{side}_price_{level + 1}'] = prices[:, level]
+                frame[f'{side}_volume_{level + 1}'] = volumes[:, level]
+        frame['mid_price'] = self.mid_prices
+        frame['profit_and_loss'] = self.profit_and_loss
+        return frame
+
+    def save(self, path: str):
+        """
+        Writes the table to a .npz file, or to a .parquet file (needs pyarrow or fastparquet)
+        """
+        if path.endswith('.parquet'):
+            self.to_frame().to_parquet(path, index=False)
+        elif path.endswith('.npz'):
+            frame = self.to_frame()
+            np.savez_compressed(path, symbols=np.array(self.symbols), product_codes=self.symbol_codes,
+                                **{ column: frame[column].to_numpy() for column in frame.columns if column != 'product' })
+        else:
+            raise ValueError(f'Unknown activities table format {path}, expected .npz or .parquet')
+
+
+def activities_table(book: PriceBook, symbols: List[Symbol], day: int, time_limit: int, ledger: Optional[Ledger]) -> ActivitiesTable:
+    """
+    Builds the activities rows of symbols for every timestamp of the book up to time_limit,
+    with the profit and loss recorded by the ledger (0.0 for symbols it does not hold)
+    """
+    n = book.cutoff(time_limit)
+    ticks, timestamps = pd.factorize(book.timestamps[:n])
+    column_of_code = np.array([symbols.index(p) if p in symbols else -1 for p in book.products] + [-1], dtype=np.int64)
+    columns = column_of_code[book.product_codes[:n]]
+    listed = np.flatnonzero(columns >= 0)
+    # the last row of a symbol at a timestamp is the order depth of the state
+    row_of = np.full((len(timestamps), len(symbols)), -1, dtype=np.int64)
+    row_of[ticks[listed], columns[listed]] = listed
+    tick_of, code_of = np.nonzero(row_of >= 0)
+    rows = row_of[tick_of, code_of]
+
+    bid_prices, bid_volumes, bid_price_text, bid_volume_text = _side(book.bid_prices[rows], book.bid_volumes[rows], book.integral_bids, 1)
+    ask_prices, ask_volumes, ask_price_text, ask_volume_text = _side(book.ask_prices[rows], book.ask_volumes[rows], book.integral_asks, -1)
+    with np.errstate(invalid='ignore'):
+        best_bid = np.fmax.reduce(bid_prices, axis=1)
+        best_ask = np.fmin.reduce(ask_prices, axis=1)
+    quoted = ~np.isnan(best_bid) & ~np.isnan(best_ask)
+    sightings = np.array([symbol == 'DOLPHIN_SIGHTINGS' for symbol in symbols])[code_of]
+    mids = np.where(quoted, (best_bid + best_ask) / 2, np.where(sightings, book.mid_prices[rows], 0.0))
+
+    profit_and_loss = np.zeros(len(rows))
+    in_ledger = np.zeros(len(rows), dtype=bool)
+    if ledger is not None:
+        ledger_column = np.array([ledger.columns.get(symbol, -1) for symbol in symbols], dtype=np.int64)[code_of]
+        in_ledger = ledger_column >= 0
+        pnl = ledger.profits + ledger.balances
+        held = quoted & in_ledger
+        profit_and_loss[held] = pnl[tick_of[held], ledger_column[held]]
+
+    return ActivitiesTable(
+        day,
+        tick_of,
+        np.asarray(timestamps, dtype=np.int64)[tick_of],
+        code_of,
+        list(symbols),
+        bid_prices,
+        bid_volumes,
+        (bid_price_text, bid_volume_text),
+        ask_prices,
+        ask_volumes,
+        (ask_price_text, ask_volume_text),
+        mids,
+        profit_and_loss,
+        quoted,
+        sightings,
+        in_ledger,
+    )
@@ -13,8 +13,10 @@ from stockfish.constants import (
     DIP,
     UKULELE,
     PICNIC_BASKET,
-    OLIVIA
+    OLIVIA,
+    DAY_LENGTH
 )
+from stockfish.indicators import RingBuffer, SimpleMovingAverage
 from stockfish.logger import Logger
 from stockfish.utils import (
     get_best_ask,
@@ -22,7 +24,6 @@ from stockfish.utils import (
     get_worst_ask,
     get_worst_bid,
     get_mid_price,
-    get_moving_average,
     place_buy_order,
     place_sell_order
 )
@@ -32,7 +33,7 @@ class Round5:
     """
     Using stable, trending, pairs, seasonal, correlated, and ETF strategies to trade.
     """
-    def __init__(self):
+    def __init__(self, **params):
         self.logger = Logger(local=True)
         self.position_limit = {
             PEARLS: 20,
@@ -46,7 +47,26 @@ class Round5:
             UKULELE: 70,
             PICNIC_BASKET: 70
         }
+        # Tuning values of the strategies, overridable by keyword (see sweep.py)
+        self.params = {
+            'trending_window': 3,
+            'pairs_correlation': 1.875,
+            'pairs_threshold': 0.001,
+            'seasonal_trough_start': 125000,
+            'seasonal_trough_end': 150000,
+            'seasonal_peak_start': 525000,
+            'seasonal_peak_end': 550000,
+            'correlated_threshold': 8,
+            'etf_premium': 400,
+            'etf_threshold': 60
+        }
+        unknown = set(params) - set(self.params)
+        if unknown:
+            raise ValueError(f'Unknown parameters: {", ".join(sorted(unknown))}')
+        self.params.update(params)
+        # Only the last two mid prices of the pairs are compared
         self.mid_prices = {}
+        self.moving_averages = {}
         self.last_observation = {}
 
     def run(self, state):
@@ -65,31 +85,31 @@ class Round5:
             state,
             result,
             BANANAS,
-            3
+            self.params['trending_window']
         )
         self.trade_pairs(
             state,
             result,
             PINA_COLADAS,
             COCONUTS,
-            1.875,
-            0.001
+            self.params['pairs_correlation'],
+            self.params['pairs_threshold']
         )
         self.trade_seasonal(
             state,
             result,
             BERRIES,
-            125000,
-            150000,
-            525000,
-            550000
+            self.params['seasonal_trough_start'],
+            self.params['seasonal_trough_end'],
+            self.params['seasonal_peak_start'],
+            self.params['seasonal_peak_end']
         )
         self.trade_correlated(
             state,
             result,
             DIVING_GEAR,
             DOLPHIN_SIGHTINGS,
-            8
+            self.params['correlated_threshold']
         )
         self.trade_etf(
             state,
@@ -100,8 +120,8 @@ class Round5:
                 DIP: 4,
                 UKULELE: 1
             },
-            400,
-            60
+            self.params['etf_premium'],
+            self.params['etf_threshold']
         )
 
         return result
@@ -122,10 +142,9 @@ class Round5:
             return
         if product not in result:
             result[product] = []
-        if product not in self.mid_prices:
-            self.mid_prices[product] = []
-        self.mid_prices[product].append(get_mid_price(state.order_depths[product]))
-        acceptable_price = get_moving_average(self.mid_prices[product], window)
+        if product not in self.moving_averages:
+            self.moving_averages[product] = SimpleMovingAverage(window)
+        acceptable_price = self.moving_averages[product].update(get_mid_price(state.order_depths[product]))
         position = state.position.get(product, 0)
         buy_volume = self.position_limit.get(product, 0) - position
         sell_volume = self.position_limit.get(product, 0) + position
@@ -140,9 +159,9 @@ class Round5:
         if product2 not in result:
             result[product2] = []
         if product1 not in self.mid_prices:
-            self.mid_prices[product1] = []
+            self.mid_prices[product1] = RingBuffer(2)
         if product2 not in self.mid_prices:
-            self.mid_prices[product2] = []
+            self.mid_prices[product2] = RingBuffer(2)
         self.mid_prices[product1].append(get_mid_price(state.order_depths[product1]))
         self.mid_prices[product2].append(get_mid_price(state.order_depths[product2]))
         best_ask = get_best_ask(state.order_depths[product1])
@@ -167,9 +186,11 @@ class Round5:
         position = state.position.get(product, 0)
         buy_volume = self.position_limit.get(product, 0) - position
         sell_volume = self.position_limit.get(product, 0) + position
-        if buy_volume > 0 and state.timestamp >= trough_start and state.timestamp <= trough_end:
+        # the time of day, also on the later days of a multi-day backtest
+        time = state.timestamp % DAY_LENGTH
+        if buy_volume > 0 and time >= trough_start and time <= trough_end:
             place_buy_order(product, result[product], best_ask, buy_volume)
-        if sell_volume > 0 and state.timestamp >= peak_start and state.timestamp <= peak_end:
+        if sell_volume > 0 and time >= peak_start and time <= peak_end:
             place_sell_order(product, result[product], best_bid, sell_volume)
 
     def trade_correlated(self, state, result, product, observation, threshold):
@@ -1,15 +1,24 @@
 from trader import Trader
 
 from datamodel import *
-from typing import Any  #, Callable
+from market_data import MidPrices, PriceBook, TradeTape, add_market_trades, build_states, mid_prices_from_book, price_book_from_frame, trade_tape_from_frame
+from cache import build_caches, cached_prices, cached_prices_window, cached_trades, cached_trades_window
+from ledger import Ledger
+from activities import ActivitiesTable, activities_table
+from counterparties import counterparty_pnl, final_pnl
+from logger import BackgroundSink, FileSink, LogSink
+from matching import FILL_MODELS, PASSIVE_QUEUE_AHEAD, MatchingEngine, PassiveFill, aggregate_orders, exceeds_position_limit
+from profiler import NULL_PROFILER, Profiler
+from budget import TickBudget
+from checkpoint import CHECKPOINT_DIRECTORY, Checkpoint, checkpoint_path, load_checkpoint, save_checkpoint
+from typing import Optional  #, Callable
 import numpy as np
-import pandas as pd
 import statistics
-import copy
 import uuid
-import random
 import os
 import sys
+import argparse
+import contextlib
 from datetime import datetime
 
 # Timesteps used in training files
@@ -72,65 +81,10 @@ SYMBOLS_BY_ROUND_POSITIONABLE = {
 }
 
 def process_prices(df_prices, round, time_limit) -> dict[int, TradingState]:
-    states = {}
-    for _, row in df_prices.iterrows():
-        time: int = int(row["timestamp"])
-        if time > time_limit:
-            break
-        product: str = row["product"]
-        if states.get(time) == None:
-            position: Dict[Product, Position] = {}
-            own_trades: Dict[Symbol, List[Trade]] = {}
-            market_trades: Dict[Symbol, List[Trade]] = {}
-            observations: Dict[Product, Observation] = {}
-            listings = {}
-            depths = {}
-            states[time] = TradingState(time, listings, depths, own_trades, market_trades, position, observations)
-
-        if product not in states[time].position and product in SYMBOLS_BY_ROUND_POSITIONABLE[round]:
-            states[time].position[product] = 0
-            states[time].own_trades[product] = []
-            states[time].market_trades[product] = []
-
-        states[time].listings[product] = Listing(product, product, "1")
-
-        if product == "DOLPHIN_SIGHTINGS":
-            states[time].observations["DOLPHIN_SIGHTINGS"] = row['mid_price']
-
-        depth = OrderDepth()
-        if row["bid_price_1"]> 0:
-            depth.buy_orders[row["bid_price_1"]] = int(row["bid_volume_1"])
-        if row["bid_price_2"]> 0:
-            depth.buy_orders[row["bid_price_2"]] = int(row["bid_volume_2"])
-        if row["bid_price_3"]> 0:
-            depth.buy_orders[row["bid_price_3"]] = int(row["bid_volume_3"])
-        if row["ask_price_1"]> 0:
-            depth.sell_orders[row["ask_price_1"]] = -int(row["ask_volume_1"])
-        if row["ask_price_2"]> 0:
-            depth.sell_orders[row["ask_price_2"]] = -int(row["ask_volume_2"])
-        if row["ask_price_3"]> 0:
-            depth.sell_orders[row["ask_price_3"]] = -int(row["ask_volume_3"])
-        states[time].order_depths[product] = depth
-
-    return states
+    return build_states(price_book_from_frame(df_prices), SYMBOLS_BY_ROUND_POSITIONABLE[round], time_limit)
 
 def process_trades(df_trades, states: dict[int, TradingState], time_limit, names=True):
-    for _, trade in df_trades.iterrows():
-        time: int = trade['timestamp']
-        if time > time_limit:
-            break
-        symbol = trade['symbol']
-        if symbol not in states[time].market_trades:
-            states[time].market_trades[symbol] = []
-        t = Trade(
-                symbol,
-                trade['price'],
-                trade['quantity'],
-                str(trade['buyer']),
-                str(trade['seller']),
-                time)
-        states[time].market_trades[symbol].append(t)
-    return states
+    return add_market_trades(states, trade_tape_from_frame(df_trades), time_limit)
 
 current_limits = {
     'PEARLS': 20,
@@ -145,23 +99,197 @@ current_limits = {
     'PICNIC_BASKET': 70,
 }
 
-def calc_mid(states: dict[int, TradingState], round: int, time: int, max_time: int) -> dict[str, float]:
-    medians_by_symbol = {}
-    non_empty_time = time
-    for psymbol in SYMBOLS_BY_ROUND_POSITIONABLE[round]:
-        hitted_zero = False
-        while len(states[non_empty_time].order_depths[psymbol].sell_orders.keys()) == 0 or len(states[non_empty_time].order_depths[psymbol].buy_orders.keys()) == 0:
-            # little hack
-            if time == 0 or hitted_zero and time != max_time:
-                hitted_zero = True
-                non_empty_time += TIME_DELTA
-            else:
-                non_empty_time -= TIME_DELTA
-        min_ask = min(states[non_empty_time].order_depths[psymbol].sell_orders.keys())
-        max_bid = max(states[non_empty_time].order_depths[psymbol].buy_orders.keys())
-        median_price = statistics.median([min_ask, max_bid])
-        medians_by_symbol[psymbol] = median_price
-    return medians_by_symbol
+def training_paths(round: int, day: int, names=True) -> tuple[str, str]:
+    prices_path = os.path.join(TRAINING_DATA_PREFIX, f'prices_round_{round}_day_{day}.csv')
+    trades_path = os.path.join(TRAINING_DATA_PREFIX, f'trades_round_{round}_day_{day}_wn.csv')
+    if not names:
+        trades_path = os.path.join(TRAINING_DATA_PREFIX, f'trades_round_{round}_day_{day}_nn.csv')
+    return prices_path, trades_path
+
+def load_day(round: int, day: int, names=True) -> tuple[PriceBook, TradeTape]:
+    prices_path, trades_path = training_paths(round, day, names)
+    return cached_prices(prices_path), cached_trades(trades_path)
+
+
+def load_window(round: int, day: int, names=True, start_time=0, end_time=999900) -> tuple[PriceBook, TradeTape]:
+    """
+    load_day cut to the timestamps from start_time to end_time. For a window starting later
+    than 0, a day without a cache is not parsed whole: the index of its CSVs finds the rows
+    of the window, and only those are parsed.
+    """
+    if start_time == 0:
+        book, tape = load_day(round, day, names)
+        return book.window(start_time, end_time), tape.window(start_time, end_time)
+    prices_path, trades_path = training_paths(round, day, names)
+    return cached_prices_window(prices_path, start_time, end_time), cached_trades_window(trades_path, start_time, end_time)
+
+
+class Simulation:
+    """
+    Config and state of one backtest: the day, the trader, the matching engine, the position
+    limits, the profiler and budget, and the states, mid prices and ledger of the run. The
+    backtester functions take it instead of reading module state, so several simulations can
+    run in one process, one after another or at once in threads. The messages of the run are
+    printed to output, sys.stdout by default.
+    The run covers the timestamps from start_time to time_limit.
+    The run is checkpointed right before the states at the timestamps of checkpoints. Given
+    a checkpoint to resume, the run continues from it with its trader instead of the one
+    passed in; a loaded checkpoint resumes one run, the run goes on with its objects.
+    """
+    def __init__(self,
+                 round: int,
+                 day: int,
+                 trader,
+                 time_limit=999900,
+                 names=True,
+                 fill_model='exact',
+                 position_limits: Optional[dict[str, int]] = None,
+                 profiler: Profiler = NULL_PROFILER,
+                 budget: Optional[TickBudget] = None,
+                 activities_path: Optional[str] = None,
+                 monkey_names: Optional[list[str]] = None,
+                 output=None,
+                 checkpoints: Optional[list[int]] = None,
+                 checkpoint_directory=CHECKPOINT_DIRECTORY,
+                 resume: Optional[Checkpoint] = None,
+                 start_time=0):
+        self.round = round
+        self.day = day
+        self.trader = trader
+        self.time_limit = time_limit
+        self.start_time = start_time
+        self.names = names
+        self.output = output
+        self.engine = MatchingEngine(fill_model, output)
+        self.fill_model = self.engine.fill_model.name
+        self.position_limits = dict(current_limits if position_limits is None else position_limits)
+        self.symbols = SYMBOLS_BY_ROUND[round]
+        self.positionable = SYMBOLS_BY_ROUND_POSITIONABLE[round]
+        self.profiler = profiler
+        self.budget = budget
+        self.activities_path = activities_path
+        self.monkey_names = monkey_names
+        self.log_path: Optional[str] = None
+        self.states: dict[int, TradingState] = {}
+        self.mid_prices: Optional[MidPrices] = None
+        self.ledger: Optional[Ledger] = None
+        self.merged_orders = 0
+        self.checkpoints = set(checkpoints or [])
+        self.checkpoint_directory = checkpoint_directory
+        self.resume = resume
+        if resume is not None:
+            run = (round, day, names, start_time, time_limit, self.fill_model)
+            checkpointed = (resume.round, resume.day, resume.names, resume.start_time, resume.time_limit, resume.fill_model)
+            if run != checkpointed:
+                raise ValueError(f'The checkpoint is of a run of (round, day, names, start_time, time_limit, fill_model) {checkpointed}, not {run}')
+            self.trader = resume.trader
+
+    def print(self, *objects):
+        print(*objects, file=self.output)
+
+    def save_checkpoint(self, tick: int, state: TradingState) -> str:
+        """
+        Checkpoints the run right before the tick-th state and returns the path of the checkpoint
+        """
+        path = checkpoint_path(self.round, self.day, self.names, state.timestamp, self.checkpoint_directory)
+        # the timed methods of the profiler do not pickle, the trader is saved without them
+        instrumented = len(self.profiler.instrumented) > 0
+        self.profiler.restore()
+        try:
+            save_checkpoint(path, Checkpoint(self.round, self.day, self.names, self.time_limit, self.fill_model, state.timestamp, tick,
+                                             self.trader, state.position, state.own_trades, self.ledger, self.merged_orders, start_time=self.start_time))
+        finally:
+            if instrumented:
+                self.profiler.instrument(self.trader)
+        self.print(f'Checkpoint at {state.timestamp} written to {path}')
+        return path
+
+    def restore(self, state: TradingState):
+        """
+        Hands the position and own trades of the checkpoint to the state it was taken at and continues its ledger
+        """
+        state.position = dict(self.resume.position)
+        state.own_trades = self.resume.own_trades
+        self.ledger = self.resume.ledger
+        self.merged_orders = self.resume.merged_orders
+        self.resume.restore_random_state()
+
+    def run(self) -> dict[str, float]:
+        """
+        Simulates the day, writes its log and returns the final profit by symbol
+        """
+        trader, profiler, budget = self.trader, self.profiler, self.budget
+        self.log_path = new_log_path()
+        profiler.instrument(trader)
+        with profiler.stage('simulation'):
+            with profiler.stage('load_day'):
+                book, tape = load_window(self.round, self.day, self.names, self.start_time, self.time_limit)
+            if len(book) == 0:
+                profiler.restore()
+                raise ValueError(f'No tick from {self.start_time} to {self.time_limit} on round {self.round} day {self.day}')
+            with open(self.log_path, 'w', encoding="utf-8", newline='\n') as f:
+                f.writelines(log_header)
+                f.write('\n')
+                with sandbox_log(trader, f) as sandbox:
+                    backtest_day(self, book, tape, sandbox)
+                with profiler.stage('activities_log'):
+                    activities = activities_table(book, self.symbols, self.day, self.time_limit, self.ledger)
+                    write_activities_log(f, self.round, self.day, activities, self.output)
+        profiler.restore()
+        if budget is not None:
+            budget.close()
+            budget.print_summary(self.output)
+        if profiler.enabled:
+            # NULL_PROFILER is shared by every run, only a run's own profiler takes its budget report
+            if budget is not None:
+                profiler.meta['budget'] = budget.report()
+            write_profile(profiler, self.log_path, self.output, round=self.round, day=self.day, names=self.names, fill_model=self.fill_model)
+        if self.activities_path is not None:
+            activities.save(self.activities_path)
+        if self.monkey_names is not None:
+            monkey_pnl = final_pnl(counterparty_pnl(tape, self.mid_prices, self.time_limit, self.monkey_names))
+            self.print("End of monkey simulation reached.")
+            self.print(f'PNL monkeys\n{monkey_pnl.to_string()}')
+        if hasattr(trader, 'after_last_round'):
+            if callable(trader.after_last_round): #type: ignore
+                profits_by_symbol, balance_by_symbol = self.ledger.as_dicts(self.mid_prices.timestamps.tolist())
+                trader.after_last_round(profits_by_symbol, balance_by_symbol) #type: ignore
+        return self.ledger.final_profit()
+
+
+# Runs the trader of the simulation over one day without writing any log, the book and tape are only read.
+# A resumed simulation only builds the states from its checkpoint on.
+def backtest_day(simulation: Simulation, book: PriceBook, tape: TradeTape, sandbox: Optional[LogSink] = None) -> tuple[dict[int, TradingState], MidPrices, Ledger]:
+    profiler = simulation.profiler
+    resume = simulation.resume
+    day_book = book
+    if resume is not None:
+        book = book.rows(int(np.searchsorted(book.timestamps, resume.timestamp, 'left')), len(book))
+        tape = tape.rows(int(np.searchsorted(tape.timestamps, resume.timestamp, 'left')), len(tape))
+    with profiler.stage('build_states'):
+        states = build_states(book, simulation.positionable, simulation.time_limit)
+    with profiler.stage('add_market_trades'):
+        states = add_market_trades(states, tape, simulation.time_limit)
+        simulation.engine.load_trades(tape, np.fromiter(states.keys(), dtype=np.int64, count=len(states)), simulation.time_limit)
+    first_state = next(iter(states.values()), None)
+    if first_state is None:
+        raise ValueError(f'No state from {int(book.timestamps[0]) if len(book) > 0 else simulation.start_time} to {simulation.time_limit}')
+    missing = sorted(simulation.checkpoints.difference(states))
+    if len(missing) > 0:
+        raise ValueError(f'No state to checkpoint at {missing}')
+    if resume is not None:
+        if first_state.timestamp != resume.timestamp:
+            raise ValueError(f'No state at the checkpoint timestamp {resume.timestamp}')
+        # before ref_symbols, the symbols of a later state can come in another order than those of the ledger
+        simulation.restore(first_state)
+    ref_symbols = list(first_state.position.keys())
+    with profiler.stage('mid_prices'):
+        mid_prices = mid_prices_from_book(day_book, ref_symbols, simulation.time_limit)
+    simulation.mid_prices = mid_prices
+    if resume is None:
+        simulation.ledger = Ledger(ref_symbols, len(states))
+    trades_position_pnl_run(simulation, states, mid_prices, sandbox)
+    return states, mid_prices, simulation.ledger
 
 
 # Setting a high time_limit can be harder to visualize
@@ -174,267 +302,104 @@ def simulate_alternative(
         names=True,
         halfway=False,
         monkeys=False,
-        monkey_names=['Caesar', 'Camilla', 'Peter']
+        monkey_names=['Caesar', 'Camilla', 'Peter'],
+        fill_model=None,
+        activities_path=None,
+        profiler: Profiler = NULL_PROFILER,
+        budget: Optional[TickBudget] = None,
+        checkpoints: Optional[list[int]] = None,
+        resume: Optional[Checkpoint] = None,
+        start_time=0
     ):
-    prices_path = os.path.join(TRAINING_DATA_PREFIX, f'prices_round_{round}_day_{day}.csv')
-    trades_path = os.path.join(TRAINING_DATA_PREFIX, f'trades_round_{round}_day_{day}_wn.csv')
-    if not names:
-        trades_path = os.path.join(TRAINING_DATA_PREFIX, f'trades_round_{round}_day_{day}_nn.csv')
-    df_prices = pd.read_csv(prices_path, sep=';')
-    df_trades = pd.read_csv(trades_path, sep=';', dtype={ 'seller': str, 'buyer': str })
-
-    states = process_prices(df_prices, round, time_limit)
-    states = process_trades(df_trades, states, time_limit, names)
-    ref_symbols = list(states[0].position.keys())
-    max_time = max(list(states.keys()))
-
-    # handling these four is rather tricky
-    profits_by_symbol: dict[int, dict[str, float]] = { 0: dict(zip(ref_symbols, [0.0]*len(ref_symbols))) }
-    balance_by_symbol: dict[int, dict[str, float]] = { 0: copy.deepcopy(profits_by_symbol[0]) }
-    credit_by_symbol: dict[int, dict[str, float]] = { 0: copy.deepcopy(profits_by_symbol[0]) }
-    unrealized_by_symbol: dict[int, dict[str, float]] = { 0: copy.deepcopy(profits_by_symbol[0]) }
-
-    states, trader, profits_by_symbol, balance_by_symbol = trades_position_pnl_run(states, max_time, profits_by_symbol, balance_by_symbol, credit_by_symbol, unrealized_by_symbol)
-    create_log_file(round, day, states, profits_by_symbol, balance_by_symbol, trader)
-    profit_balance_monkeys = {}
-    trades_monkeys = {}
-    if monkeys:
-        profit_balance_monkeys, trades_monkeys, profit_monkeys, balance_monkeys, monkey_positions_by_timestamp = monkey_positions(monkey_names, states, round)
-        print("End of monkey simulation reached.")
-        print(f'PNL + BALANCE monkeys {profit_balance_monkeys[max_time]}')
-        print(f'Trades monkeys {trades_monkeys[max_time]}')
-    if hasattr(trader, 'after_last_round'):
-        if callable(trader.after_last_round): #type: ignore
-            trader.after_last_round(profits_by_symbol, balance_by_symbol) #type: ignore
+    # fill_model overrides halfway, see matching.py for the available models
+    # activities_path additionally saves the activities log as a .npz or .parquet table
+    # an enabled profiler times the run and writes its report next to the log
+    # a budget times every Trader.run call against its limit and prints the violations
+    # checkpoints are timestamps to checkpoint the run at, resume a checkpoint to continue from
+    # start_time skips the timestamps before it, the run starts flat with a new trader there
+    if fill_model is None:
+        fill_model = 'halfway' if halfway else 'exact'
+    simulation = Simulation(round, day, trader, time_limit, names, fill_model, profiler=profiler, budget=budget,
+                            activities_path=activities_path, monkey_names=monkey_names if monkeys else None,
+                            checkpoints=checkpoints, resume=resume, start_time=start_time)
+    return simulation.run()
 
 
 def trades_position_pnl_run(
+        simulation: Simulation,
         states: dict[int, TradingState],
-        max_time: int,
-        profits_by_symbol: dict[int, dict[str, float]],
-        balance_by_symbol: dict[int, dict[str, float]],
-        credit_by_symbol: dict[int, dict[str, float]],
-        unrealized_by_symbol: dict[int, dict[str, float]],
+        mid_prices: MidPrices,
+        sandbox: Optional[LogSink] = None,
         ):
-        for time, state in states.items():
-            position = copy.deepcopy(state.position)
-            orders = trader.run(state)
-            trades = clear_order_book(orders, state.order_depths, time, halfway)
-            mids = calc_mid(states, round, time, max_time)
-            if profits_by_symbol.get(time + TIME_DELTA) == None and time != max_time:
-                profits_by_symbol[time + TIME_DELTA] = copy.deepcopy(profits_by_symbol[time])
-            if credit_by_symbol.get(time + TIME_DELTA) == None and time != max_time:
-                credit_by_symbol[time + TIME_DELTA] = copy.deepcopy(credit_by_symbol[time])
-            if balance_by_symbol.get(time + TIME_DELTA) == None and time != max_time:
-                balance_by_symbol[time + TIME_DELTA] = copy.deepcopy(balance_by_symbol[time])
-            if unrealized_by_symbol.get(time + TIME_DELTA) == None and time != max_time:
-                unrealized_by_symbol[time + TIME_DELTA] = copy.deepcopy(unrealized_by_symbol[time])
-                for psymbol in SYMBOLS_BY_ROUND_POSITIONABLE[round]:
-                    unrealized_by_symbol[time + TIME_DELTA][psymbol] = mids[psymbol]*position[psymbol]
-            valid_trades = []
-            failed_symbol = []
-            grouped_by_symbol = {}
-            if len(trades) > 0:
-                for trade in trades:
-                    if trade.symbol in failed_symbol:
-                        continue
-                    n_position = position[trade.symbol] + trade.quantity
-                    if abs(n_position) > current_limits[trade.symbol]:
-                        print('ILLEGAL TRADE, WOULD EXCEED POSITION LIMIT, KILLING ALL REMAINING ORDERS')
-                        trade_vars = vars(trade)
-                        trade_str = ', '.join("%s: %s" % item for item in trade_vars.items())
-                        print(f'Stopped at the following trade: {trade_str}')
-                        print(f"All trades that were sent:")
-                        for trade in trades:
-                            trade_vars = vars(trade)
-                            trades_str = ', '.join("%s: %s" % item for item in trade_vars.items())
-                            print(trades_str)
-                        failed_symbol.append(trade.symbol)
-                    else:
-                        valid_trades.append(trade)
-                        position[trade.symbol] += trade.quantity
-            FLEX_TIME_DELTA = TIME_DELTA
-            if time == max_time:
-                FLEX_TIME_DELTA = 0
-            for valid_trade in valid_trades:
-                    if grouped_by_symbol.get(valid_trade.symbol) == None:
-                        grouped_by_symbol[valid_trade.symbol] = []
-                    grouped_by_symbol[valid_trade.symbol].append(valid_trade)
-                    credit_by_symbol[time + FLEX_TIME_DELTA][valid_trade.symbol] += -valid_trade.price * valid_trade.quantity
-            if states.get(time + FLEX_TIME_DELTA) != None:
-                states[time + FLEX_TIME_DELTA].own_trades = grouped_by_symbol
-                for psymbol in SYMBOLS_BY_ROUND_POSITIONABLE[round]:
-                    unrealized_by_symbol[time + FLEX_TIME_DELTA][psymbol] = mids[psymbol]*position[psymbol]
-                    if position[psymbol] == 0 and states[time].position[psymbol] != 0:
-                        profits_by_symbol[time + FLEX_TIME_DELTA][psymbol] += credit_by_symbol[time + FLEX_TIME_DELTA][psymbol] #+unrealized_by_symbol[time + FLEX_TIME_DELTA][psymbol]
-                        credit_by_symbol[time + FLEX_TIME_DELTA][psymbol] = 0
-                        balance_by_symbol[time + FLEX_TIME_DELTA][psymbol] = 0
-                    else:
-                        balance_by_symbol[time + FLEX_TIME_DELTA][psymbol] = credit_by_symbol[time + FLEX_TIME_DELTA][psymbol] + unrealized_by_symbol[time + FLEX_TIME_DELTA][psymbol]
-
-            if time == max_time:
-                print("End of simulation reached. All positions left are liquidated")
-                # i have the feeling this already has been done, and only repeats the same values as before
-                for osymbol in position.keys():
-                    profits_by_symbol[time + FLEX_TIME_DELTA][osymbol] += credit_by_symbol[time + FLEX_TIME_DELTA][osymbol] + unrealized_by_symbol[time + FLEX_TIME_DELTA][osymbol]
-                    balance_by_symbol[time + FLEX_TIME_DELTA][osymbol] = 0
-            if states.get(time + FLEX_TIME_DELTA) != None:
-                states[time + FLEX_TIME_DELTA].position = copy.deepcopy(position)
-        return states, trader, profits_by_symbol, balance_by_symbol
-
-def monkey_positions(monkey_names: list[str], states: dict[int, TradingState], round):
-    profits_by_symbol: dict[int, dict[str, dict[str, float]]] = { 0: {} }
-    balance_by_symbol: dict[int, dict[str, dict[str, float]]] =  { 0: {} }
-    credit_by_symbol: dict[int, dict[str, dict[str, float]]] = { 0: {} }
-    unrealized_by_symbol: dict[int, dict[str, dict[str, float]]] = { 0: {} }
-    prev_monkey_positions: dict[str, dict[str, int]] = {}
-    monkey_positions: dict[str, dict[str, int]] = {}
-    trades_by_round: dict[int, dict[str, list[Trade]]]  = { 0: dict(zip(monkey_names,  [[] for x in range(len(monkey_names))])) }
-    profit_balance: dict[int, dict[str, dict[str, float]]] = { 0: {} }
-
-    monkey_positions_by_timestamp: dict[int, dict[str, dict[str, int]]] = {}
-
-    for monkey in monkey_names:
-        ref_symbols = list(states[0].position.keys())
-        profits_by_symbol[0][monkey] = dict(zip(ref_symbols, [0.0]*len(ref_symbols)))
-        balance_by_symbol[0][monkey] = copy.deepcopy(profits_by_symbol[0][monkey])
-        credit_by_symbol[0][monkey] = copy.deepcopy(profits_by_symbol[0][monkey])
-        unrealized_by_symbol[0][monkey] = copy.deepcopy(profits_by_symbol[0][monkey])
-        profit_balance[0][monkey] = copy.deepcopy(profits_by_symbol[0][monkey])
-        monkey_positions[monkey] = dict(zip(SYMBOLS_BY_ROUND_POSITIONABLE[round], [0]*len(SYMBOLS_BY_ROUND_POSITIONABLE[round])))
-        prev_monkey_positions[monkey] = copy.deepcopy(monkey_positions[monkey])
-
-    for time, state in states.items():
-        already_calculated = False
-        for monkey in monkey_names:
-            position = copy.deepcopy(monkey_positions[monkey])
-            mids = calc_mid(states, round, time, max_time)
-            if trades_by_round.get(time + TIME_DELTA) == None:
-                trades_by_round[time + TIME_DELTA] =  copy.deepcopy(trades_by_round[time])
-
-            for psymbol in POSITIONABLE_SYMBOLS:
-                if already_calculated:
-                    break
-                if state.market_trades.get(psymbol):
-                    for market_trade in state.market_trades[psymbol]:
-                        if trades_by_round[time].get(market_trade.buyer) != None:
-                            trades_by_round[time][market_trade.buyer].append(Trade(psymbol, market_trade.price, market_trade.quantity))
-                        if trades_by_round[time].get(market_trade.seller) != None:
-                            trades_by_round[time][market_trade.seller].append(Trade(psymbol, market_trade.price, -market_trade.quantity))
-            already_calculated = True
-
-            if profit_balance.get(time + TIME_DELTA) == None and time != max_time:
-                profit_balance[time + TIME_DELTA] = copy.deepcopy(profit_balance[time])
-            if profits_by_symbol.get(time + TIME_DELTA) == None and time != max_time:
-                profits_by_symbol[time + TIME_DELTA] = copy.deepcopy(profits_by_symbol[time])
-            if credit_by_symbol.get(time + TIME_DELTA) == None and time != max_time:
-                credit_by_symbol[time + TIME_DELTA] = copy.deepcopy(credit_by_symbol[time])
-            if balance_by_symbol.get(time + TIME_DELTA) == None and time != max_time:
-                balance_by_symbol[time + TIME_DELTA] = copy.deepcopy(balance_by_symbol[time])
-            if unrealized_by_symbol.get(time + TIME_DELTA) == None and time != max_time:
-                unrealized_by_symbol[time + TIME_DELTA] = copy.deepcopy(unrealized_by_symbol[time])
-                for psymbol in SYMBOLS_BY_ROUND_POSITIONABLE[round]:
-                    unrealized_by_symbol[time + TIME_DELTA][monkey][psymbol] = mids[psymbol]*position[psymbol]
-            valid_trades = []
-            if trades_by_round[time].get(monkey) != None:
-                valid_trades = trades_by_round[time][monkey]
-            FLEX_TIME_DELTA = TIME_DELTA
-            if time == max_time:
-                FLEX_TIME_DELTA = 0
-            for valid_trade in valid_trades:
-                    position[valid_trade.symbol] += valid_trade.quantity
-                    credit_by_symbol[time + FLEX_TIME_DELTA][monkey][valid_trade.symbol] += -valid_trade.price * valid_trade.quantity
-            if states.get(time + FLEX_TIME_DELTA) != None:
-                for psymbol in SYMBOLS_BY_ROUND_POSITIONABLE[round]:
-                    unrealized_by_symbol[time + FLEX_TIME_DELTA][monkey][psymbol] = mids[psymbol]*position[psymbol]
-                    if position[psymbol] == 0 and prev_monkey_positions[monkey][psymbol] != 0:
-                        profits_by_symbol[time + FLEX_TIME_DELTA][monkey][psymbol] += credit_by_symbol[time + FLEX_TIME_DELTA][monkey][psymbol]
-                        credit_by_symbol[time + FLEX_TIME_DELTA][monkey][psymbol] = 0
-                        balance_by_symbol[time + FLEX_TIME_DELTA][monkey][psymbol] = 0
-                    else:
-                        balance_by_symbol[time + FLEX_TIME_DELTA][monkey][psymbol] = credit_by_symbol[time + FLEX_TIME_DELTA][monkey][psymbol] + unrealized_by_symbol[time + FLEX_TIME_DELTA][monkey][psymbol]
-                    profit_balance[time + FLEX_TIME_DELTA][monkey][psymbol] = profits_by_symbol[time + FLEX_TIME_DELTA][monkey][psymbol] + balance_by_symbol[time + FLEX_TIME_DELTA][monkey][psymbol]
-            prev_monkey_positions[monkey] = copy.deepcopy(monkey_positions[monkey])
-            monkey_positions[monkey] = position
-            if time == max_time:
-                # i have the feeling this already has been done, and only repeats the same values as before
-                for osymbol in position.keys():
-                    profits_by_symbol[time + FLEX_TIME_DELTA][monkey][osymbol] += credit_by_symbol[time + FLEX_TIME_DELTA][monkey][osymbol] + unrealized_by_symbol[time + FLEX_TIME_DELTA][monkey][osymbol]
-                    balance_by_symbol[time + FLEX_TIME_DELTA][monkey][osymbol] = 0
-        monkey_positions_by_timestamp[time] = copy.deepcopy(monkey_positions)
-    return profit_balance, trades_by_round, profits_by_symbol, balance_by_symbol, monkey_positions_by_timestamp
-
-
-def cleanup_order_volumes(org_orders: List[Order]) -> List[Order]:
-    orders = []
-    for order_1 in org_orders:
-        final_order = copy.copy(order_1)
-        for order_2 in org_orders:
-            if order_1.price == order_2.price and order_1.quantity == order_2.quantity:
-               continue
-            if order_1.price == order_2.price:
-                final_order.quantity += order_2.quantity
-        orders.append(final_order)
-    return orders
+        simulation.states = states
+        timestamps = list(states.keys())
+        # a resumed run starts at the tick of its checkpoint, the ticks index the mid prices of the whole day
+        first_tick = 0 if simulation.resume is None else simulation.resume.tick
+        max_tick = first_tick + len(timestamps) - 1
+        tick_timer = simulation.profiler.stage('tick')
+        for tick, (time, state) in enumerate(states.items(), first_tick):
+            if time in simulation.checkpoints:
+                simulation.save_checkpoint(tick, state)
+            with tick_timer:
+                grouped_by_symbol, position, merged = run_tick(simulation, state, tick, mid_prices.mids[tick], tick == max_tick)
+            simulation.merged_orders += merged
+            if sandbox is not None and time != 0:
+                sandbox.write(time, None)
+
+            if tick == max_tick:
+                simulation.print("End of simulation reached. All positions left are liquidated")
+                simulation.print(f'{simulation.merged_orders} orders were merged into an order at the same price level')
+            # the last state receives its own trades and position, like the dicts used to
+            next_state = states[timestamps[min(tick + 1, max_tick) - first_tick]]
+            next_state.own_trades = grouped_by_symbol
+            next_state.position = position
+        return states, simulation.trader, simulation.ledger
+
+# Runs the trader on one state, matches its orders and books the fills into the ledger of the simulation.
+# Returns the own trades and the position for the next state, and the number of merged orders.
+def run_tick(simulation: Simulation, state: TradingState, tick: int, mids: np.ndarray, last: bool) -> tuple[dict[str, List[Trade]], dict[str, int], int]:
+    profiler, budget, ledger = simulation.profiler, simulation.budget, simulation.ledger
+    position = dict(state.position)
+    previous_position = np.array([position[symbol] for symbol in ledger.symbols])
+    with profiler.stage('trader.run'):
+        trader_orders = simulation.trader.run(state) if budget is None else budget.run(simulation.trader, state)
+    with profiler.stage('net_orders'):
+        orders, merged = net_orders(trader_orders, position, simulation.position_limits, simulation.output)
+    with profiler.stage('matching'):
+        trades = simulation.engine.match(orders, state.order_depths, state.timestamp)
+    with profiler.stage('ledger'):
+        grouped_by_symbol = {}
+        for trade in trades:
+            position[trade.symbol] += trade.quantity
+            if grouped_by_symbol.get(trade.symbol) == None:
+                grouped_by_symbol[trade.symbol] = []
+            grouped_by_symbol[trade.symbol].append(trade)
+        ledger.book_trades(trades)
+        ledger.close_tick(tick, mids, previous_position, np.array([position[symbol] for symbol in ledger.symbols]), last)
+    return grouped_by_symbol, position, merged
+
+def net_orders(trader_orders: dict[str, List[Order]], position: dict[str, int], limits: dict[str, int] = current_limits, output=None) -> tuple[dict[str, List[Order]], int]:
+    netted = {}
+    merged = 0
+    for symbol, symbol_orders in trader_orders.items():
+        orders, symbol_merged = aggregate_orders(symbol_orders)
+        merged += symbol_merged
+        # like the exchange: if all buy (or all sell) orders filling would breach the limit, every order of the
+        # symbol is cancelled, where the old check after matching only dropped the trades past the limit
+        if exceeds_position_limit(orders, position.get(symbol, 0), limits.get(symbol, 0)):
+            print(f'ILLEGAL ORDERS, WOULD EXCEED POSITION LIMIT, CANCELLING ALL ORDERS FOR {symbol}', file=output)
+            print(f'Position {position.get(symbol, 0)}, limit {limits.get(symbol, 0)}, orders sent: {orders}', file=output)
+            continue
+        netted[symbol] = orders
+    return netted, merged
 
 def clear_order_book(trader_orders: dict[str, List[Order]], order_depth: dict[str, OrderDepth], time: int, halfway: bool) -> list[Trade]:
-        trades = []
-        for symbol in trader_orders.keys():
-            if order_depth.get(symbol) != None:
-                symbol_order_depth = copy.deepcopy(order_depth[symbol])
-                t_orders = cleanup_order_volumes(trader_orders[symbol])
-                for order in t_orders:
-                    if order.quantity < 0:
-                        if halfway:
-                            bids = symbol_order_depth.buy_orders.keys()
-                            asks = symbol_order_depth.sell_orders.keys()
-                            max_bid = max(bids)
-                            min_ask = min(asks)
-                            if order.price <= statistics.median([max_bid, min_ask]):
-                                trades.append(Trade(symbol, order.price, order.quantity, "BOT", "YOU", time))
-                            else:
-                                print(f'No matches for order {order} at time {time}')
-                                print(f'Order depth is {order_depth[order.symbol].__dict__}')
-                        else:
-                            potential_matches = list(filter(lambda o: o[0] == order.price, symbol_order_depth.buy_orders.items()))
-                            if len(potential_matches) > 0:
-                                match = potential_matches[0]
-                                final_volume = 0
-                                if abs(match[1]) > abs(order.quantity):
-                                    final_volume = order.quantity
-                                else:
-                                    #this should be negative
-                                    final_volume = -match[1]
-                                trades.append(Trade(symbol, order.price, final_volume, "BOT", "YOU", time))
-                            else:
-                                print(f'No matches for order {order} at time {time}')
-                                print(f'Order depth is {order_depth[order.symbol].__dict__}')
-                    if order.quantity > 0:
-                        if halfway:
-                            bids = symbol_order_depth.buy_orders.keys()
-                            asks = symbol_order_depth.sell_orders.keys()
-                            max_bid = max(bids)
-                            min_ask = min(asks)
-                            if order.price >= statistics.median([max_bid, min_ask]):
-                                trades.append(Trade(symbol, order.price, order.quantity, "YOU", "BOT", time))
-                            else:
-                                print(f'No matches for order {order} at time {time}')
-                                print(f'Order depth is {order_depth[order.symbol].__dict__}')
-                        else:
-                            potential_matches = list(filter(lambda o: o[0] == order.price, symbol_order_depth.sell_orders.items()))
-                            if len(potential_matches) > 0:
-                                match = potential_matches[0]
-                                final_volume = 0
-                                #Match[1] will be negative so needs to be changed to work here
-                                if abs(match[1]) > abs(order.quantity):
-                                    final_volume = order.quantity
-                                else:
-                                    final_volume = abs(match[1])
-                                trades.append(Trade(symbol, order.price, final_volume, "YOU", "BOT", time))
-                            else:
-                                print(f'No matches for order {order} at time {time}')
-                                print(f'Order depth is {order_depth[order.symbol].__dict__}')
-        return trades
+    engine = MatchingEngine('halfway' if halfway else 'exact')
+    return match_orders(engine, trader_orders, order_depth, time)
+
+def match_orders(engine: MatchingEngine, trader_orders: dict[str, List[Order]], order_depth: dict[str, OrderDepth], time: int) -> list[Trade]:
+    orders = { symbol: aggregate_orders(symbol_orders)[0] for symbol, symbol_orders in trader_orders.items() }
+    return engine.match(orders, order_depth, time)
 
 csv_header = "day;timestamp;product;bid_price_1;bid_volume_1;bid_price_2;bid_volume_2;bid_price_3;bid_volume_3;ask_price_1;ask_volume_1;ask_price_2;ask_volume_2;ask_price_3;ask_volume_3;mid_price;profit_and_loss\n"
 log_header = [
@@ -445,75 +410,112 @@ log_header = [
     'REPORT RequestId: 8ab36ff8-b4e6-42d4-b012-e6ad69c42085	Duration: 18.73 ms	Billed Duration: 19 ms	Memory Size: 128 MB	Max Memory Used: 94 MB	Init Duration: 1574.09 ms\n',
 ]
 
-def create_log_file(round: int, day: int, states: dict[int, TradingState], profits_by_symbol: dict[int, dict[str, float]], balance_by_symbol: dict[int, dict[str, float]], trader: Trader):
+def new_log_path() -> str:
     file_name = uuid.uuid4()
     timest = datetime.timestamp(datetime.now())
-    max_time = max(list(states.keys()))
-    log_path = os.path.join('logs', f'{timest}_{file_name}.log')
-    with open(log_path, 'w', encoding="utf-8", newline='\n') as f:
-        f.writelines(log_header)
-        f.write('\n')
-        for time, state in states.items():
-            if hasattr(trader, 'logger'):
-                if hasattr(trader.logger, 'local_logs') != None:
-                    if trader.logger.local_logs.get(time) != None:
-                        f.write(f'{time} {trader.logger.local_logs[time]}\n')
-                        continue
-            if time != 0:
-                f.write(f'{time}\n')
-
-        f.write(f'\n\n')
-        f.write('Submission logs:\n\n\n')
-        f.write('Activities log:\n')
-        f.write(csv_header)
-        total_profit = 0
-        for time, state in states.items():
-            for symbol in SYMBOLS_BY_ROUND[round]:
-                f.write(f'{day};{time};{symbol};')
-                bids_length = len(state.order_depths[symbol].buy_orders)
-                bids = list(state.order_depths[symbol].buy_orders.items())
-                bids_prices = list(state.order_depths[symbol].buy_orders.keys())
-                bids_prices.sort()
-                asks_length = len(state.order_depths[symbol].sell_orders)
-                asks_prices = list(state.order_depths[symbol].sell_orders.keys())
-                asks_prices.sort()
-                asks = list(state.order_depths[symbol].sell_orders.items())
-                if bids_length >= 3:
-                    f.write(f'{bids[0][0]};{bids[0][1]};{bids[1][0]};{bids[1][1]};{bids[2][0]};{bids[2][1]};')
-                elif bids_length == 2:
-                    f.write(f'{bids[0][0]};{bids[0][1]};{bids[1][0]};{bids[1][1]};;;')
-                elif bids_length == 1:
-                    f.write(f'{bids[0][0]};{bids[0][1]};;;;;')
-                else:
-                    f.write(f';;;;;;')
-                if asks_length >= 3:
-                    f.write(f'{asks[0][0]};{asks[0][1]};{asks[1][0]};{asks[1][1]};{asks[2][0]};{asks[2][1]};')
-                elif asks_length == 2:
-                    f.write(f'{asks[0][0]};{asks[0][1]};{asks[1][0]};{asks[1][1]};;;')
-                elif asks_length == 1:
-                    f.write(f'{asks[0][0]};{asks[0][1]};;;;;')
-                else:
-                    f.write(f';;;;;;')
-                if len(asks_prices) == 0 or max(bids_prices) == 0:
-                    if symbol == 'DOLPHIN_SIGHTINGS':
-                        dolphin_sightings = state.observations['DOLPHIN_SIGHTINGS']
-                        f.write(f'{dolphin_sightings};{0.0}\n')
-                    else:
-                        f.write(f'{0};{0.0}\n')
-                else:
-                    actual_profit = 0.0
-                    if symbol in SYMBOLS_BY_ROUND_POSITIONABLE[round]:
-                            actual_profit = profits_by_symbol[time][symbol] + balance_by_symbol[time][symbol]
-                    min_ask = min(asks_prices)
-                    max_bid = max(bids_prices)
-                    median_price = statistics.median([min_ask, max_bid])
-                    f.write(f'{median_price};{actual_profit}\n')
-                    if time == max_time:
-                        if profits_by_symbol[time].get(symbol) != None:
-                            print(f'Final profit for {symbol} = {actual_profit}')
-                            total_profit += actual_profit
-        print(f'Total profit = {total_profit}')
-        print(f"\nSimulation on round {round} day {day} for time {max_time} complete")
+    return os.path.join('logs', f'{timest}_{file_name}.log')
+
+# Points the Logger of the trader, if it has one, at sink for the with block and yields
+# whether it did. The Logger prints to stdout otherwise, as it does on the exchange.
+@contextlib.contextmanager
+def attached_sink(trader, sink: LogSink):
+    logger = getattr(trader, 'logger', None)
+    attached = hasattr(logger, 'sink')
+    if attached:
+        previous = logger.sink
+        logger.sink = sink
+    try:
+        yield attached
+    finally:
+        if attached:
+            logger.sink = previous
+
+# Streams the sandbox section of the log into f from a background thread while the day runs.
+# A trader with a Logger flushes into it directly. Otherwise the returned sink takes a bare
+# timestamp line per tick from the backtester.
+@contextlib.contextmanager
+def sandbox_log(trader, f):
+    sink = BackgroundSink(FileSink(f))
+    try:
+        with attached_sink(trader, sink) as attached:
+            yield None if attached else sink
+    finally:
+        sink.close()
+
+# Saves the report of a profiled run next to its log and prints the stages
+def write_profile(profiler: Profiler, log_path: str, output=None, **meta):
+    profiler.meta.update(meta, log=log_path)
+    report_path = os.path.splitext(log_path)[0] + '.profile.json'
+    profiler.save(report_path)
+    print(file=output)
+    profiler.print_summary(output)
+    print(f'Profile written to {report_path}', file=output)
+
+# Writes the activities log rows of one timestamp and returns the profit of the positionable symbols
+def write_activities(f, day: int, time: int, state: TradingState, symbols: list[str], pnl: dict[str, float], last: bool, output=None) -> float:
+    total_profit = 0
+    for symbol in symbols:
+        f.write(f'{day};{time};{symbol};')
+        bids_length = len(state.order_depths[symbol].buy_orders)
+        bids = list(state.order_depths[symbol].buy_orders.items())
+        bids_prices = list(state.order_depths[symbol].buy_orders.keys())
+        bids_prices.sort()
+        asks_length = len(state.order_depths[symbol].sell_orders)
+        asks_prices = list(state.order_depths[symbol].sell_orders.keys())
+        asks_prices.sort()
+        asks = list(state.order_depths[symbol].sell_orders.items())
+        if bids_length >= 3:
+            f.write(f'{bids[0][0]};{bids[0][1]};{bids[1][0]};{bids[1][1]};{bids[2][0]};{bids[2][1]};')
+        elif bids_length == 2:
+            f.write(f'{bids[0][0]};{bids[0][1]};{bids[1][0]};{bids[1][1]};;;')
+        elif bids_length == 1:
+            f.write(f'{bids[0][0]};{bids[0][1]};;;;;')
+        else:
+            f.write(';;;;;;')
+        if asks_length >= 3:
+            f.write(f'{asks[0][0]};{asks[0][1]};{asks[1][0]};{asks[1][1]};{asks[2][0]};{asks[2][1]};')
+        elif asks_length == 2:
+            f.write(f'{asks[0][0]};{asks[0][1]};{asks[1][0]};{asks[1][1]};;;')
+        elif asks_length == 1:
+            f.write(f'{asks[0][0]};{asks[0][1]};;;;;')
+        else:
+            f.write(';;;;;;')
+        if len(asks_prices) == 0 or max(bids_prices) == 0:
+            if symbol == 'DOLPHIN_SIGHTINGS':
+                dolphin_sightings = state.observations['DOLPHIN_SIGHTINGS']
+                f.write(f'{dolphin_sightings};{0.0}\n')
+            else:
+                f.write(f'{0};{0.0}\n')
+        else:
+            actual_profit = 0.0
+            if symbol in pnl:
+                    actual_profit = pnl[symbol]
+            min_ask = min(asks_prices)
+            max_bid = max(bids_prices)
+            median_price = statistics.median([min_ask, max_bid])
+            f.write(f'{median_price};{actual_profit}\n')
+            if last:
+                if symbol in pnl:
+                    print(f'Final profit for {symbol} = {actual_profit}', file=output)
+                    total_profit += actual_profit
+    return total_profit
+
+def write_activities_header(f):
+    f.write('\n\n')
+    f.write('Submission logs:\n\n\n')
+    f.write('Activities log:\n')
+    f.write(csv_header)
+
+def write_activities_log(f, round: int, day: int, activities: ActivitiesTable, output=None):
+    max_time = int(activities.timestamps.max())
+    write_activities_header(f)
+    activities.write_csv(f)
+    total_profit = 0
+    for symbol, profit in activities.final_profits().items():
+        print(f'Final profit for {symbol} = {profit}', file=output)
+        total_profit += profit
+    print(f'Total profit = {total_profit}', file=output)
+    print(f"\nSimulation on round {round} day {day} for time {max_time} complete", file=output)
 
 
 # Adjust accordingly the round and day to your needs
@@ -534,9 +536,68 @@ if __name__ == "__main__":
     #     halfway = True
     # print(f"Running simulation on round {round} day {day} for time {max_time}")
     # print("Remember to change the trader import")
-    round = int(sys.argv[1])
-    day = int(sys.argv[2])
-    max_time = 999000
+    parser = argparse.ArgumentParser(description='Backtest trader.py on a training day')
+    parser.add_argument('round', type=int, nargs='?')
+    parser.add_argument('day', type=int, nargs='?')
+    parser.add_argument('--fill-model', choices=FILL_MODELS.keys(), default='halfway', help='how orders are matched against the book (default: halfway)')
+    parser.add_argument('--queue-ahead', type=float, metavar='SHARE', help=f'with --fill-model passive, the share of the displayed volume ahead of a resting order (default: {PASSIVE_QUEUE_AHEAD})')
+    parser.add_argument('--build-cache', action='store_true', help=f'prebuild the binary cache of every file in {TRAINING_DATA_PREFIX} and exit')
+    parser.add_argument('--stream', action='store_true', help='read the day in chunks instead of loading it whole, keeping memory bounded')
+    parser.add_argument('--profile', action='store_true', help='time the stages and strategy methods, the report is written next to the log')
+    parser.add_argument('--budget', type=float, metavar='MS', help='time every Trader.run call and flag the ticks over MS milliseconds')
+    parser.add_argument('--budget-timeout', action='store_true', help='drop the orders of the ticks over the budget, like a timed out call')
+    parser.add_argument('--budget-memory', action='store_true', help='also record the peak allocation of every tick (slow, uses tracemalloc)')
+    parser.add_argument('--activities', metavar='PATH', help='also save the activities log as a table, .npz or .parquet (needs pyarrow)')
+    parser.add_argument('--start', type=int, metavar='TIMESTAMP', help='start the run at this timestamp instead of 0, only the rows from it on are read')
+    parser.add_argument('--end', type=int, default=999000, metavar='TIMESTAMP', help='end the run at this timestamp (default: 999000)')
+    parser.add_argument('--days', type=int, nargs='+', metavar='DAY', help='run these days of the round as one timeline, carrying the trader and positions over')
+    parser.add_argument('--checkpoint', type=int, nargs='+', metavar='TIMESTAMP', help=f'checkpoint the run right before these timestamps into {CHECKPOINT_DIRECTORY}')
+    parser.add_argument('--resume', metavar='PATH', help='continue the run of a checkpoint, round and day default to its own')
+    args = parser.parse_args()
+    if args.build_cache:
+        build_caches(TRAINING_DATA_PREFIX)
+        sys.exit(0)
+    resume = None
+    if args.resume is not None:
+        resume = load_checkpoint(args.resume)
+        args.round = resume.round if args.round is None else args.round
+        args.day = resume.day if args.day is None else args.day
+    if args.days is not None:
+        if args.round is None or args.day is not None:
+            parser.error('--days takes the round and no day')
+        if args.stream or args.checkpoint or resume or args.start or args.activities:
+            parser.error('--days does not work with --stream, --checkpoint, --resume, --start or --activities')
+    elif args.round is None or args.day is None:
+        parser.error('round and day are required')
+    if args.stream and (args.checkpoint or resume):
+        parser.error('--checkpoint and --resume do not work with --stream')
+    round = args.round
+    day = args.day
+    start_time = args.start if args.start is not None else resume.start_time if resume is not None else 0
+    max_time = args.end
+    if start_time > max_time:
+        parser.error('--start is after --end')
     names = True
-    halfway = True
-    simulate_alternative(round, day, trader, max_time, names, halfway, False)
+    if args.days is None and not args.stream and len(load_window(round, day, names, start_time, max_time)[0]) == 0:
+        parser.error(f'no tick from --start {start_time} to --end {max_time} on round {round} day {day}')
+    halfway = args.fill_model == 'halfway'
+    profiler = Profiler() if args.profile else NULL_PROFILER
+    budget = None
+    if args.budget is not None:
+        budget = TickBudget(args.budget, args.budget_timeout, args.budget_memory)
+    elif args.budget_timeout or args.budget_memory:
+        parser.error('--budget-timeout and --budget-memory need --budget')
+    fill_model = args.fill_model
+    if args.queue_ahead is not None:
+        if fill_model != PassiveFill.name:
+            parser.error('--queue-ahead needs --fill-model passive')
+        fill_model = PassiveFill(args.queue_ahead)
+    if args.days is not None:
+        from multiday import simulate_days
+        simulate_days(round, args.days, trader, max_time, names, fill_model=fill_model, profiler=profiler, budget=budget)
+    elif args.stream:
+        from streaming import simulate_streaming
+        simulate_streaming(round, day, trader, max_time, names, fill_model=fill_model, profiler=profiler, budget=budget, start_time=start_time)
+    else:
+        simulate_alternative(round, day, trader, max_time, names, halfway, False, fill_model=fill_model, activities_path=args.activities, profiler=profiler, budget=budget,
+                             checkpoints=args.checkpoint, resume=resume, start_time=start_time)
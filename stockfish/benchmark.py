@@ -0,0 +1,1419 @@
+"""
+Benchmarks of the backtester stages against the implementations they replaced
+Sample command to compare the price loaders on round 2 day 0:
+python3 benchmark.py loader 2 0
+The netting benchmark takes the orders per price level and the number of levels instead:
+python3 benchmark.py netting 200 5
+The streaming benchmark compares the peak memory of a full and a streaming run of a day:
+python3 benchmark.py streaming 2 0
+The mids benchmark compares calc_mid against the mid price table on a day, and on empty book sides put into its first ticks:
+python3 benchmark.py mids 2 0
+The indicators benchmark checks the rolling indicators against list slices on the mid prices of a day:
+python3 benchmark.py indicators 2 0
+The datamodel benchmark compares the memory the states of a day keep with the old and the slotted classes:
+python3 benchmark.py datamodel 2 0
+The logger benchmark compares the flush serializers on the states and orders of a day:
+python3 benchmark.py logger 2 0
+The sinks benchmark times a day of flush output written to every log sink:
+python3 benchmark.py sinks 2 0
+The activities benchmark compares the per-state and the columnar writers of the activities log:
+python3 benchmark.py activities 2 0
+The profiler benchmark measures what profiling, and the disabled profiler, add to a backtest of a day:
+python3 benchmark.py profiler 2 0
+The shared benchmark compares the memory of sweep workers loading a day themselves and attaching to it in shared memory:
+python3 benchmark.py shared 2 0
+The counterparties benchmark times the monkey loop against counterparty_pnl and checks the pnl of every named trader against a Ledger:
+python3 benchmark.py counterparties 2 0
+The threads benchmark runs simulations of a day at once in a thread pool and checks they match the same simulations run one by one:
+python3 benchmark.py threads 2 0
+The interleaved benchmark runs two simulations in threads whose traders take turns tick by tick, and checks they match the same simulations run one by one:
+python3 benchmark.py interleaved 2 0
+The passive benchmark checks the passive fill model against a loop over the market trades of the next state, and times it per tick:
+python3 benchmark.py passive 2 0
+The checkpoint benchmark checkpoints a run of a day at 90% of it and checks a run resumed from there gives the same log and profits:
+python3 benchmark.py checkpoint 2 0
+The window benchmark parses ticks 400000-600000 of a day through the CSV index against a whole-file parse, and runs that window:
+python3 benchmark.py window 2 0
+The days benchmark chains the days of a round with and without preparing the next day in the background, against the days run one by one,
+and checks the seasonal strategy of Round5 places its orders at the same times of day in a chain as on the days run one by one:
+python3 benchmark.py days 2 0
+"""
+import contextlib
+import copy
+import gc
+import io
+import json
+import multiprocessing
+import os
+import sys
+import time
+import tracemalloc
+import statistics
+from concurrent.futures import ThreadPoolExecutor
+import tempfile
+import threading
+from typing import Optional
+import numpy as np
+import pandas as pd
+from datamodel import *
+from market_data import MidPrices, PriceBook, add_market_trades, build_states, load_prices, load_trades, mid_prices_from_book
+from cache import build_csv_index, cached_prices, cached_trades, load_prices_window, load_trades_window
+from activities import activities_table
+from counterparties import counterparty_pnl, counterparty_trades
+from indicators import ExponentialMovingAverage, RateOfChange, RollingExtremes, RollingStatistics, RollingVWAP, SimpleMovingAverage
+from ledger import Ledger
+from logger import BackgroundSink, FileSink, GzipSink, Logger, NullSink, RingBufferSink, StdoutSink
+from matching import DepthFill, MatchingEngine, PassiveFill, SymbolBook, aggregate_orders
+from profiler import NULL_PROFILER, Profiler
+from budget import TickBudget
+from trader import Trader
+from utils import get_moving_average
+from checkpoint import load_checkpoint
+from backtester import POSITIONABLE_SYMBOLS, SYMBOLS_BY_ROUND, Simulation, SYMBOLS_BY_ROUND_POSITIONABLE, TIME_DELTA, TRAINING_DATA_PREFIX, attached_sink, backtest_day, current_limits, load_day, match_orders, simulate_alternative, trades_position_pnl_run, training_paths, write_activities
+from streaming import simulate_streaming
+from multiday import DAY_LENGTH, simulate_days
+from shared_data import MarketDataService, SharedDay, backtest_views
+
+
+class DictListing:
+    """
+    The datamodel classes before __slots__, one __dict__ per instance
+    """
+    def __init__(self, symbol: Symbol, product: Product, denomination: Product):
+        self.symbol = symbol
+        self.product = product
+        self.denomination = denomination
+
+
+class DictOrderDepth:
+    def __init__(self):
+        self.buy_orders: Dict[int, int] = {}
+        self.sell_orders: Dict[int, int] = {}
+
+
+class DictTrade:
+    def __init__(self, symbol: Symbol, price: int, quantity: int, buyer: UserId = None, seller: UserId = None, timestamp: int = 0) -> None:
+        self.symbol = symbol
+        self.price: int = price
+        self.quantity: int = quantity
+        self.buyer = buyer
+        self.seller = seller
+        self.timestamp = timestamp
+
+
+class DictTradingState(object):
+    def __init__(self, timestamp, listings, order_depths, own_trades, market_trades, position, observations):
+        self.timestamp = timestamp
+        self.listings = listings
+        self.order_depths = order_depths
+        self.own_trades = own_trades
+        self.market_trades = market_trades
+        self.position = position
+        self.observations = observations
+
+
+def legacy_process_prices(df_prices, round, time_limit) -> dict[int, TradingState]:
+    """
+    The original row by row loader, kept as the reference for the columnar one
+    """
+    states = {}
+    for _, row in df_prices.iterrows():
+        time: int = int(row["timestamp"])
+        if time > time_limit:
+            break
+        product: str = row["product"]
+        if states.get(time) == None:
+            position: Dict[Product, Position] = {}
+            own_trades: Dict[Symbol, List[Trade]] = {}
+            market_trades: Dict[Symbol, List[Trade]] = {}
+            observations: Dict[Product, Observation] = {}
+            listings = {}
+            depths = {}
+            states[time] = DictTradingState(time, listings, depths, own_trades, market_trades, position, observations)
+
+        if product not in states[time].position and product in SYMBOLS_BY_ROUND_POSITIONABLE[round]:
+            states[time].position[product] = 0
+            states[time].own_trades[product] = []
+            states[time].market_trades[product] = []
+
+        states[time].listings[product] = DictListing(product, product, "1")
+
+        if product == "DOLPHIN_SIGHTINGS":
+            states[time].observations["DOLPHIN_SIGHTINGS"] = row['mid_price']
+
+        depth = DictOrderDepth()
+        if row["bid_price_1"]> 0:
+            depth.buy_orders[row["bid_price_1"]] = int(row["bid_volume_1"])
+        if row["bid_price_2"]> 0:
+            depth.buy_orders[row["bid_price_2"]] = int(row["bid_volume_2"])
+        if row["bid_price_3"]> 0:
+            depth.buy_orders[row["bid_price_3"]] = int(row["bid_volume_3"])
+        if row["ask_price_1"]> 0:
+            depth.sell_orders[row["ask_price_1"]] = -int(row["ask_volume_1"])
+        if row["ask_price_2"]> 0:
+            depth.sell_orders[row["ask_price_2"]] = -int(row["ask_volume_2"])
+        if row["ask_price_3"]> 0:
+            depth.sell_orders[row["ask_price_3"]] = -int(row["ask_volume_3"])
+        states[time].order_depths[product] = depth
+
+    return states
+
+
+def legacy_process_trades(df_trades, states: dict[int, TradingState], time_limit, names=True):
+    """
+    The original row by row trades loader
+    """
+    for _, trade in df_trades.iterrows():
+        time: int = trade['timestamp']
+        if time > time_limit:
+            break
+        symbol = trade['symbol']
+        if symbol not in states[time].market_trades:
+            states[time].market_trades[symbol] = []
+        t = DictTrade(
+                symbol,
+                trade['price'],
+                trade['quantity'],
+                str(trade['buyer']),
+                str(trade['seller']),
+                time)
+        states[time].market_trades[symbol].append(t)
+    return states
+
+
+def legacy_calc_mid(states: dict[int, TradingState], round: int, time: int, max_time: int) -> dict[str, float]:
+    """
+    The original mid price search, walking back (or forward at time 0) over empty book sides
+    """
+    medians_by_symbol = {}
+    non_empty_time = time
+    for psymbol in SYMBOLS_BY_ROUND_POSITIONABLE[round]:
+        hitted_zero = False
+        while len(states[non_empty_time].order_depths[psymbol].sell_orders.keys()) == 0 or len(states[non_empty_time].order_depths[psymbol].buy_orders.keys()) == 0:
+            # little hack
+            if time == 0 or hitted_zero and time != max_time:
+                hitted_zero = True
+                non_empty_time += TIME_DELTA
+            else:
+                non_empty_time -= TIME_DELTA
+        min_ask = min(states[non_empty_time].order_depths[psymbol].sell_orders.keys())
+        max_bid = max(states[non_empty_time].order_depths[psymbol].buy_orders.keys())
+        median_price = statistics.median([min_ask, max_bid])
+        medians_by_symbol[psymbol] = median_price
+    return medians_by_symbol
+
+
+def legacy_cleanup_order_volumes(org_orders: List[Order]) -> List[Order]:
+    """
+    The original pairwise merge of same-price orders
+    """
+    orders = []
+    for order_1 in org_orders:
+        final_order = copy.copy(order_1)
+        for order_2 in org_orders:
+            if order_1.price == order_2.price and order_1.quantity == order_2.quantity:
+               continue
+            if order_1.price == order_2.price:
+                final_order.quantity += order_2.quantity
+        orders.append(final_order)
+    return orders
+
+
+def legacy_clear_order_book(trader_orders: dict[str, List[Order]], order_depth: dict[str, OrderDepth], time: int, halfway: bool) -> list[Trade]:
+        """
+        The original matching, deep-copying every book and scanning it for each order
+        """
+        trades = []
+        for symbol in trader_orders.keys():
+            if order_depth.get(symbol) != None:
+                symbol_order_depth = copy.deepcopy(order_depth[symbol])
+                t_orders = legacy_cleanup_order_volumes(trader_orders[symbol])
+                for order in t_orders:
+                    if order.quantity < 0:
+                        if halfway:
+                            bids = symbol_order_depth.buy_orders.keys()
+                            asks = symbol_order_depth.sell_orders.keys()
+                            max_bid = max(bids)
+                            min_ask = min(asks)
+                            if order.price <= statistics.median([max_bid, min_ask]):
+                                trades.append(Trade(symbol, order.price, order.quantity, "BOT", "YOU", time))
+                            else:
+                                print(f'No matches for order {order} at time {time}')
+                                print(f'Order depth is {order_depth[order.symbol].__dict__}')
+                        else:
+                            potential_matches = list(filter(lambda o: o[0] == order.price, symbol_order_depth.buy_orders.items()))
+                            if len(potential_matches) > 0:
+                                match = potential_matches[0]
+                                final_volume = 0
+                                if abs(match[1]) > abs(order.quantity):
+                                    final_volume = order.quantity
+                                else:
+                                    #this should be negative
+                                    final_volume = -match[1]
+                                trades.append(Trade(symbol, order.price, final_volume, "BOT", "YOU", time))
+                            else:
+                                print(f'No matches for order {order} at time {time}')
+                                print(f'Order depth is {order_depth[order.symbol].__dict__}')
+                    if order.quantity > 0:
+                        if halfway:
+                            bids = symbol_order_depth.buy_orders.keys()
+                            asks = symbol_order_depth.sell_orders.keys()
+                            max_bid = max(bids)
+                            min_ask = min(asks)
+                            if order.price >= statistics.median([max_bid, min_ask]):
+                                trades.append(Trade(symbol, order.price, order.quantity, "YOU", "BOT", time))
+                            else:
+                                print(f'No matches for order {order} at time {time}')
+                                print(f'Order depth is {order_depth[order.symbol].__dict__}')
+                        else:
+                            potential_matches = list(filter(lambda o: o[0] == order.price, symbol_order_depth.sell_orders.items()))
+                            if len(potential_matches) > 0:
+                                match = potential_matches[0]
+                                final_volume = 0
+                                #Match[1] will be negative so needs to be changed to work here
+                                if abs(match[1]) > abs(order.quantity):
+                                    final_volume = order.quantity
+                                else:
+                                    final_volume = abs(match[1])
+                                trades.append(Trade(symbol, order.price, final_volume, "YOU", "BOT", time))
+                            else:
+                                print(f'No matches for order {order} at time {time}')
+                                print(f'Order depth is {order_depth[order.symbol].__dict__}')
+        return trades
+
+
+def legacy_trades_position_pnl_run(states, mid_prices, max_time, profits_by_symbol, balance_by_symbol, credit_by_symbol, unrealized_by_symbol, trader, round, halfway):
+    """
+    The original PnL bookkeeping with a dict copy of every account per timestamp,
+    taking trader, round and halfway as arguments instead of reading the module globals
+    """
+    for tick, (timestamp, state) in enumerate(states.items()):
+        position = copy.deepcopy(state.position)
+        orders = trader.run(state)
+        trades = legacy_clear_order_book(orders, state.order_depths, timestamp, halfway)
+        mids = mid_prices.at(tick)
+        if profits_by_symbol.get(timestamp + TIME_DELTA) == None and timestamp != max_time:
+            profits_by_symbol[timestamp + TIME_DELTA] = copy.deepcopy(profits_by_symbol[timestamp])
+        if credit_by_symbol.get(timestamp + TIME_DELTA) == None and timestamp != max_time:
+            credit_by_symbol[timestamp + TIME_DELTA] = copy.deepcopy(credit_by_symbol[timestamp])
+        if balance_by_symbol.get(timestamp + TIME_DELTA) == None and timestamp != max_time:
+            balance_by_symbol[timestamp + TIME_DELTA] = copy.deepcopy(balance_by_symbol[timestamp])
+        if unrealized_by_symbol.get(timestamp + TIME_DELTA) == None and timestamp != max_time:
+            unrealized_by_symbol[timestamp + TIME_DELTA] = copy.deepcopy(unrealized_by_symbol[timestamp])
+            for psymbol in SYMBOLS_BY_ROUND_POSITIONABLE[round]:
+                unrealized_by_symbol[timestamp + TIME_DELTA][psymbol] = mids[psymbol]*position[psymbol]
+        valid_trades = []
+        failed_symbol = []
+        grouped_by_symbol = {}
+        for trade in trades:
+            if trade.symbol in failed_symbol:
+                continue
+            n_position = position[trade.symbol] + trade.quantity
+            if abs(n_position) > current_limits[trade.symbol]:
+                failed_symbol.append(trade.symbol)
+            else:
+                valid_trades.append(trade)
+                position[trade.symbol] += trade.quantity
+        FLEX_TIME_DELTA = TIME_DELTA
+        if timestamp == max_time:
+            FLEX_TIME_DELTA = 0
+        for valid_trade in valid_trades:
+            if grouped_by_symbol.get(valid_trade.symbol) == None:
+                grouped_by_symbol[valid_trade.symbol] = []
+            grouped_by_symbol[valid_trade.symbol].append(valid_trade)
+            credit_by_symbol[timestamp + FLEX_TIME_DELTA][valid_trade.symbol] += -valid_trade.price * valid_trade.quantity
+        if states.get(timestamp + FLEX_TIME_DELTA) != None:
+            states[timestamp + FLEX_TIME_DELTA].own_trades = grouped_by_symbol
+            for psymbol in SYMBOLS_BY_ROUND_POSITIONABLE[round]:
+                unrealized_by_symbol[timestamp + FLEX_TIME_DELTA][psymbol] = mids[psymbol]*position[psymbol]
+                if position[psymbol] == 0 and states[timestamp].position[psymbol] != 0:
+                    profits_by_symbol[timestamp + FLEX_TIME_DELTA][psymbol] += credit_by_symbol[timestamp + FLEX_TIME_DELTA][psymbol]
+                    credit_by_symbol[timestamp + FLEX_TIME_DELTA][psymbol] = 0
+                    balance_by_symbol[timestamp + FLEX_TIME_DELTA][psymbol] = 0
+                else:
+                    balance_by_symbol[timestamp + FLEX_TIME_DELTA][psymbol] = credit_by_symbol[timestamp + FLEX_TIME_DELTA][psymbol] + unrealized_by_symbol[timestamp + FLEX_TIME_DELTA][psymbol]
+        if timestamp == max_time:
+            for osymbol in position.keys():
+                profits_by_symbol[timestamp + FLEX_TIME_DELTA][osymbol] += credit_by_symbol[timestamp + FLEX_TIME_DELTA][osymbol] + unrealized_by_symbol[timestamp + FLEX_TIME_DELTA][osymbol]
+                balance_by_symbol[timestamp + FLEX_TIME_DELTA][osymbol] = 0
+        if states.get(timestamp + FLEX_TIME_DELTA) != None:
+            states[timestamp + FLEX_TIME_DELTA].position = copy.deepcopy(position)
+    return states, trader, profits_by_symbol, balance_by_symbol
+
+
+class ReplayTrader:
+    """
+    Sends the orders a trader sent during an earlier run again, so only the bookkeeping is timed
+    """
+    def __init__(self, orders_by_time):
+        self.orders_by_time = orders_by_time
+
+    def run(self, state):
+        return self.orders_by_time[state.timestamp]
+
+
+def record_orders(states: dict[int, TradingState], mid_prices, halfway: bool, round: int, day: int):
+    """
+    Runs Trader once over the states and returns the orders it sent by timestamp
+    """
+    trader = Trader()
+    orders_by_time = {}
+
+    def run(state):
+        orders_by_time[state.timestamp] = trader.run(state)
+        return orders_by_time[state.timestamp]
+
+    recorder = ReplayTrader(orders_by_time)
+    recorder.run = run
+    simulation = Simulation(round, day, recorder, fill_model='halfway' if halfway else 'exact', output=io.StringIO())
+    simulation.ledger = Ledger(mid_prices.symbols, len(states))
+    with attached_sink(trader, NullSink()):
+        trades_position_pnl_run(simulation, states, mid_prices)
+    return orders_by_time
+
+
+def peak_memory(f):
+    """
+    Returns the result, wall time and peak traced allocation of f()
+    """
+    tracemalloc.start()
+    try:
+        result, elapsed = timed(f)
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+    return result, elapsed, peak
+
+
+def retained_memory(f):
+    """
+    Returns the result of f() with the traced memory and number of blocks it still holds
+    """
+    gc.collect()
+    tracemalloc.start()
+    try:
+        result = f()
+        gc.collect()
+        statistics = tracemalloc.take_snapshot().statistics('filename')
+    finally:
+        tracemalloc.stop()
+    return result, sum(stat.size for stat in statistics), sum(stat.count for stat in statistics)
+
+
+def state_fingerprint(state: TradingState):
+    """
+    Everything a strategy can read from a state, with the key types kept
+    """
+    def typed(d):
+        return [(type(k).__name__, k, type(v).__name__, v) for k, v in d.items()]
+    return (
+        state.timestamp,
+        [(s, l.symbol, l.product, l.denomination) for s, l in state.listings.items()],
+        [(s, typed(d.buy_orders), typed(d.sell_orders)) for s, d in state.order_depths.items()],
+        list(state.position.items()),
+        list(state.own_trades.items()),
+        [(s, [vars(t) for t in ts]) for s, ts in state.market_trades.items()],
+        typed(state.observations),
+    )
+
+
+def timed(f, *args):
+    start = time.perf_counter()
+    result = f(*args)
+    return result, time.perf_counter() - start
+
+
+def bench_loader(round: int, day: int, time_limit=999900):
+    prices_path = os.path.join(TRAINING_DATA_PREFIX, f'prices_round_{round}_day_{day}.csv')
+    legacy, legacy_time = timed(lambda: legacy_process_prices(pd.read_csv(prices_path, sep=';'), round, time_limit))
+    columnar, columnar_time = timed(lambda: build_states(load_prices(prices_path), SYMBOLS_BY_ROUND_POSITIONABLE[round], time_limit))
+    same = list(legacy.keys()) == list(columnar.keys()) and all(
+        state_fingerprint(legacy[t]) == state_fingerprint(columnar[t]) for t in legacy)
+    print(f'iterrows loader: {legacy_time:.3f}s')
+    print(f'columnar loader: {columnar_time:.3f}s ({legacy_time / columnar_time:.1f}x)')
+    print(f'identical states: {same}')
+    return same
+
+
+def bench_cache(round: int, day: int, time_limit=999900):
+    prices_path = os.path.join(TRAINING_DATA_PREFIX, f'prices_round_{round}_day_{day}.csv')
+    trades_path = os.path.join(TRAINING_DATA_PREFIX, f'trades_round_{round}_day_{day}_wn.csv')
+    symbols = SYMBOLS_BY_ROUND_POSITIONABLE[round]
+
+    def from_csv():
+        states = legacy_process_prices(pd.read_csv(prices_path, sep=';'), round, time_limit)
+        df_trades = pd.read_csv(trades_path, sep=';', dtype={ 'seller': str, 'buyer': str })
+        return legacy_process_trades(df_trades, states, time_limit)
+
+    def from_cache():
+        states = build_states(cached_prices(prices_path), symbols, time_limit)
+        return add_market_trades(states, cached_trades(trades_path), time_limit)
+
+    def parse_only():
+        return load_prices(prices_path), load_trades(trades_path)
+
+    def map_only():
+        return cached_prices(prices_path), cached_trades(trades_path)
+
+    legacy, legacy_time = timed(from_csv)
+    timed(from_cache)
+    cached, cached_time = timed(from_cache)
+    _, parse_time = timed(parse_only)
+    _, map_time = timed(map_only)
+    same = list(legacy.keys()) == list(cached.keys()) and all(
+        state_fingerprint(legacy[t]) == state_fingerprint(cached[t]) for t in legacy)
+    print(f'csv + iterrows states: {legacy_time:.3f}s')
+    print(f'cache + columnar states: {cached_time:.3f}s ({legacy_time / cached_time:.1f}x)')
+    print(f'csv parse only: {parse_time * 1000:.1f}ms, cache map only: {map_time * 1000:.1f}ms')
+    print(f'identical states: {same}')
+    return same
+
+
+def emptied_side(book: PriceBook, symbol: str, ticks: np.ndarray, side: str) -> PriceBook:
+    """
+    Returns a copy of book with the bid or ask side of symbol empty at the ticks (indices of the timestamps)
+    """
+    rows = (book.product_codes == book.products.index(symbol)) & np.isin(np.unique(book.timestamps, return_inverse=True)[1], ticks)
+    prices = { 'bid': book.bid_prices.copy(), 'ask': book.ask_prices.copy() }
+    volumes = { 'bid': book.bid_volumes.copy(), 'ask': book.ask_volumes.copy() }
+    prices[side][rows] = np.nan
+    volumes[side][rows] = 0
+    return PriceBook(book.timestamps, book.product_codes, book.products, prices['bid'], volumes['bid'], prices['ask'], volumes['ask'],
+                     book.mid_prices, book.integral_bids, book.integral_asks)
+
+
+def reference_mids(states: dict[int, TradingState], symbol: str) -> np.ndarray:
+    """
+    The mid price of symbol at every state, from the last state before with both sides, else the first one after, else NaN
+    """
+    depths = [state.order_depths[symbol] for state in states.values()]
+    valid = [(max(depth.buy_orders) + min(depth.sell_orders)) / 2 if depth.buy_orders and depth.sell_orders else None for depth in depths]
+    mids = []
+    for tick in range(len(valid)):
+        earlier = [mid for mid in valid[tick::-1] if mid is not None]
+        later = [mid for mid in valid[tick:] if mid is not None]
+        mids.append(earlier[0] if earlier else later[0] if later else np.nan)
+    return np.array(mids)
+
+
+def check_mid_gaps(round: int, book: PriceBook, ticks=300) -> bool:
+    """
+    Empties book sides of the last positionable symbol in the first ticks of book and checks the
+    gap-filled mid prices against reference_mids and, where its search does not run off the day,
+    against calc_mid
+    """
+    symbols = SYMBOLS_BY_ROUND_POSITIONABLE[round]
+    # calc_mid does not reset its search between symbols, so only the last one is checked against it
+    symbol = symbols[-1]
+    time_limit = int(np.unique(book.timestamps)[ticks - 1])
+    cases = [
+        ('leading gap of one tick', np.arange(1), 'bid'),
+        ('leading gap', np.arange(10), 'ask'),
+        ('gap in the middle', np.arange(100, 120), 'bid'),
+        ('trailing gap', np.arange(ticks - 20, ticks), 'ask'),
+        ('side always empty', np.arange(ticks), 'bid'),
+    ]
+    all_same = True
+    for name, empty_ticks, side in cases:
+        gapped = emptied_side(book, symbol, empty_ticks, side)
+        states = build_states(gapped, symbols, time_limit)
+        table = mid_prices_from_book(gapped, symbols, time_limit).of(symbol)
+        same = np.array_equal(table, reference_mids(states, symbol), equal_nan=True)
+        max_time = max(states.keys())
+        try:
+            legacy = np.array([legacy_calc_mid(states, round, time, max_time)[symbol] for time in states])
+            legacy_same = str(np.array_equal(table, legacy))
+        except KeyError:
+            # the search walks back from a later leading gap, or never finds a valid side, past the first tick
+            legacy_same = 'its search runs off the day'
+        print(f'{name} ({side}s of {symbol} empty at {len(empty_ticks)} ticks): same as the reference: {same}, as calc_mid: {legacy_same}')
+        all_same = all_same and same and legacy_same != 'False'
+    return all_same
+
+
+def bench_mids(round: int, day: int, time_limit=999900):
+    prices_path = os.path.join(TRAINING_DATA_PREFIX, f'prices_round_{round}_day_{day}.csv')
+    symbols = SYMBOLS_BY_ROUND_POSITIONABLE[round]
+    book = cached_prices(prices_path)
+    states = build_states(book, symbols, time_limit)
+    max_time = max(states.keys())
+    legacy, legacy_time = timed(lambda: [legacy_calc_mid(states, round, time, max_time) for time in states])
+    table, table_time = timed(lambda: mid_prices_from_book(book, symbols, time_limit))
+    lookup, lookup_time = timed(lambda: [table.at(tick) for tick in range(len(states))])
+    # The old search did not reset its position between symbols, so a symbol after one
+    # with an empty side could be priced at an earlier tick. Only those ticks may differ.
+    differing = [time for tick, time in enumerate(states) if legacy[tick] != lookup[tick]]
+    gaps = sum(1 for state in states.values() for symbol in symbols
+               if not state.order_depths[symbol].buy_orders or not state.order_depths[symbol].sell_orders)
+    print(f'calc_mid per tick: {legacy_time:.3f}s')
+    print(f'mid price table: {table_time * 1000:.1f}ms to build, {lookup_time * 1000:.1f}ms for every lookup')
+    print(f'book sides empty: {gaps}, ticks with differing mids: {len(differing)}')
+    print(f'gap-filled mid prices right with synthetic empty book sides: {check_mid_gaps(round, book)}')
+    return differing
+
+
+def bench_ledger(round: int, day: int, time_limit=999900, halfway=True):
+    prices_path = os.path.join(TRAINING_DATA_PREFIX, f'prices_round_{round}_day_{day}.csv')
+    trades_path = os.path.join(TRAINING_DATA_PREFIX, f'trades_round_{round}_day_{day}_wn.csv')
+    book = cached_prices(prices_path)
+    tape = cached_trades(trades_path)
+
+    def fresh_states():
+        states = build_states(book, SYMBOLS_BY_ROUND_POSITIONABLE[round], time_limit)
+        return add_market_trades(states, tape, time_limit)
+
+    states = fresh_states()
+    symbols = list(next(iter(states.values())).position.keys())
+    mid_prices = mid_prices_from_book(book, symbols, time_limit)
+    replay = ReplayTrader(record_orders(states, mid_prices, halfway, round, day))
+
+    # the states are built before each run and the columns read after it, so only the run itself
+    # is timed and the peak is what the run allocates on top of the states
+    def legacy_run(states):
+        max_time = max(states.keys())
+        zeros = dict(zip(symbols, [0.0] * len(symbols)))
+        with contextlib.redirect_stdout(io.StringIO()):
+            _, _, profits, balances = legacy_trades_position_pnl_run(
+                states, mid_prices, max_time, { 0: dict(zeros) }, { 0: dict(zeros) }, { 0: dict(zeros) }, { 0: dict(zeros) },
+                replay, round, halfway)
+        return profits, balances
+
+    def ledger_run(states, profiler=NULL_PROFILER):
+        simulation = Simulation(round, day, replay, fill_model='halfway' if halfway else 'exact', profiler=profiler, output=io.StringIO())
+        simulation.ledger = Ledger(symbols, len(states))
+        return trades_position_pnl_run(simulation, states, mid_prices)[2]
+
+    states = fresh_states()
+    (profits, balances), _, legacy_peak = peak_memory(lambda: legacy_run(states))
+    legacy = [[profits[t][s] + balances[t][s] for s in symbols] for t in states]
+    states = fresh_states()
+    ledger, _, new_peak = peak_memory(lambda: ledger_run(states))
+    new = (ledger.profits + ledger.balances).tolist()
+    # without tracemalloc slowing both down
+    states = fresh_states()
+    _, legacy_time = timed(legacy_run, states)
+    states = fresh_states()
+    _, new_time = timed(ledger_run, states)
+    profiler = Profiler()
+    ledger_run(fresh_states(), profiler)
+    print(f'dict copies: {legacy_time:.3f}s, peak {legacy_peak / 2**20:.1f} MiB over the states')
+    print(f'ledger: {new_time:.3f}s, peak {new_peak / 2**20:.1f} MiB over the states, of that {profiler.report()["stages"]["ledger"]["total_s"]:.3f}s in the ledger stage, the rest matching and netting')
+    print(f'final profit: {dict(zip(symbols, new[-1]))}')
+    print(f'identical profit_and_loss column: {legacy == new}')
+    return legacy == new
+
+
+def bench_matching(round: int, day: int, time_limit=999900):
+    prices_path = os.path.join(TRAINING_DATA_PREFIX, f'prices_round_{round}_day_{day}.csv')
+    trades_path = os.path.join(TRAINING_DATA_PREFIX, f'trades_round_{round}_day_{day}_wn.csv')
+    book = cached_prices(prices_path)
+    states = add_market_trades(build_states(book, SYMBOLS_BY_ROUND_POSITIONABLE[round], time_limit), cached_trades(trades_path), time_limit)
+    symbols = list(next(iter(states.values())).position.keys())
+    mid_prices = mid_prices_from_book(book, symbols, time_limit)
+    for fill_model, halfway in [('exact', False), ('halfway', True)]:
+        orders_by_time = record_orders(states, mid_prices, halfway, round, day)
+        engine = MatchingEngine(fill_model)
+
+        def legacy_matching():
+            return [legacy_clear_order_book(orders_by_time[t], states[t].order_depths, t, halfway) for t in states]
+
+        def engine_matching():
+            return [match_orders(engine, orders_by_time[t], states[t].order_depths, t) for t in states]
+
+        with contextlib.redirect_stdout(io.StringIO()):
+            legacy, legacy_time = timed(legacy_matching)
+            new, new_time = timed(engine_matching)
+        same = [[vars(t) for t in ts] for ts in legacy] == [[vars(t) for t in ts] for ts in new]
+        print(f'{fill_model}: deep copy matching {legacy_time:.3f}s, matching engine {new_time:.3f}s, identical trades: {same}')
+
+
+def bench_netting(orders_per_level: int, levels: int):
+    orders = [Order('PEARLS', 10000 + level, 1 + i % 3) for i in range(orders_per_level) for level in range(levels)]
+    legacy, legacy_time = timed(legacy_cleanup_order_volumes, orders)
+    (netted, merged), netting_time = timed(aggregate_orders, orders)
+    print(f'{len(orders)} orders on {levels} levels')
+    print(f'pairwise merge: {legacy_time * 1000:.1f}ms, {len(legacy)} orders out, {sum(o.quantity for o in legacy)} total quantity')
+    print(f'netting: {netting_time * 1000:.1f}ms, {len(netted)} orders out, {sum(o.quantity for o in netted)} total quantity, {merged} merged')
+
+
+def bench_streaming(round: int, day: int, time_limit=999900):
+    # stdout goes to devnull, a StringIO would hold every line the trader prints
+    def full_run():
+        with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+            return simulate_alternative(round, day, Trader(), time_limit, True, True, fill_model='halfway')
+
+    def streaming_run():
+        with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+            return simulate_streaming(round, day, Trader(), time_limit, True, 'halfway')
+
+    full, full_time, full_peak = peak_memory(full_run)
+    streamed, streamed_time, streamed_peak = peak_memory(streaming_run)
+    print(f'full run: {full_time:.3f}s, peak {full_peak / 2**20:.1f} MiB')
+    print(f'streaming run: {streamed_time:.3f}s, peak {streamed_peak / 2**20:.1f} MiB')
+    print(f'identical final profit: {full == streamed}')
+    return full == streamed
+
+
+def bench_indicators(round: int, day: int, window=20):
+    prices_path = os.path.join(TRAINING_DATA_PREFIX, f'prices_round_{round}_day_{day}.csv')
+    trades_path = os.path.join(TRAINING_DATA_PREFIX, f'trades_round_{round}_day_{day}_wn.csv')
+    symbol = SYMBOLS_BY_ROUND_POSITIONABLE[round][-1]
+    book = cached_prices(prices_path)
+    prices = mid_prices_from_book(book, [symbol], 999900).of(symbol).tolist()
+    tape = cached_trades(trades_path)
+    code = list(tape.symbols).index(symbol)
+    trades = [(p, q) for p, q, c in zip(tape.prices.tolist(), tape.quantities.tolist(), tape.symbol_codes.tolist()) if c == code]
+
+    def lists():
+        history = []
+        rows = []
+        for price in prices:
+            history.append(price)
+            last = history[-window:]
+            roc = (price - history[-window - 1]) / history[-window - 1] if len(history) > window else None
+            rows.append((get_moving_average(history, window), np.mean(last), np.std(last), min(last), max(last), roc))
+        return rows
+
+    def rolling():
+        sma, stats, extremes, roc = SimpleMovingAverage(window), RollingStatistics(window), RollingExtremes(window), RateOfChange(window)
+        rows = []
+        for price in prices:
+            stats.update(price)
+            low, high = extremes.update(price)
+            rows.append((sma.update(price), stats.mean(), stats.std(), low, high, roc.update(price)))
+        return rows
+
+    legacy, legacy_time = timed(lists)
+    new, new_time = timed(rolling)
+    names = ['sma', 'mean', 'std', 'min', 'max', 'rate of change']
+    for i, name in enumerate(names):
+        error = max((abs(a[i] - b[i]) for a, b in zip(legacy, new) if a[i] is not None), default=0.0)
+        same_gaps = all((a[i] is None) == (b[i] is None) for a, b in zip(legacy, new))
+        print(f'{name}: max difference {error:.3g}{"" if same_gaps else ", differing warm-up"}')
+
+    ema = ExponentialMovingAverage(window)
+    ema_error = max(abs(ema.update(p) - e) for p, e in zip(prices, pd.Series(prices).ewm(span=window, adjust=False).mean()))
+    vwap = RollingVWAP(window)
+    vwap_error = 0.0
+    for i, (price, quantity) in enumerate(trades):
+        last = trades[max(0, i + 1 - window):i + 1]
+        expected = sum(p * abs(q) for p, q in last) / sum(abs(q) for _, q in last)
+        vwap_error = max(vwap_error, abs(vwap.update(price, quantity) - expected))
+    print(f'ema: max difference {ema_error:.3g} to pandas ewm, vwap: max difference {vwap_error:.3g} over {len(trades)} trades')
+    print(f'{symbol}, window {window}, {len(prices)} ticks: list slices {legacy_time * 1000:.1f}ms, rolling {new_time * 1000:.1f}ms')
+
+
+def bench_datamodel(round: int, day: int, time_limit=999900):
+    prices_path = os.path.join(TRAINING_DATA_PREFIX, f'prices_round_{round}_day_{day}.csv')
+    trades_path = os.path.join(TRAINING_DATA_PREFIX, f'trades_round_{round}_day_{day}_wn.csv')
+
+    def dict_classes():
+        states = legacy_process_prices(pd.read_csv(prices_path, sep=';'), round, time_limit)
+        return legacy_process_trades(pd.read_csv(trades_path, sep=';', dtype={ 'seller': str, 'buyer': str }), states, time_limit)
+
+    def slotted_classes():
+        states = build_states(cached_prices(prices_path), SYMBOLS_BY_ROUND_POSITIONABLE[round], time_limit)
+        return add_market_trades(states, cached_trades(trades_path), time_limit)
+
+    cached_prices(prices_path), cached_trades(trades_path)
+    legacy, legacy_size, legacy_blocks = retained_memory(dict_classes)
+    new, new_size, new_blocks = retained_memory(slotted_classes)
+    trades = sum(len(ts) for state in new.values() for ts in state.market_trades.values())
+    # a trader editing the listings of a state must not change those of another one
+    listings = [listing for state in new.values() for listing in [state.listings, *state.listings.values()]]
+    own_listings = len({ id(listing) for listing in listings }) == len(listings)
+    same = list(legacy.keys()) == list(new.keys()) and all(
+        state_fingerprint(legacy[t]) == state_fingerprint(new[t]) for t in legacy)
+    sample = DictTrade('A', 1.0, 1, 'a', 'b', 0)
+    print(f'{len(new)} states, {trades} market trades, listings of their own in every state: {own_listings}')
+    print(f'dict classes: {legacy_size / 2**20:.1f} MiB in {legacy_blocks} blocks')
+    print(f'slotted classes: {new_size / 2**20:.1f} MiB in {new_blocks} blocks (trade columns memory-mapped)')
+    print(f'one trade: {sys.getsizeof(sample) + sys.getsizeof(sample.__dict__)} bytes with __dict__, '
+          f'{sys.getsizeof(Trade("A", 1.0, 1, "a", "b", 0))} slotted, {sys.getsizeof(next(t for state in new.values() for ts in state.market_trades.values() for t in ts))} as a view')
+    print(f'identical states: {same}')
+    return same and own_listings
+
+
+def bench_logger(round: int, day: int, time_limit=999900):
+    prices_path = os.path.join(TRAINING_DATA_PREFIX, f'prices_round_{round}_day_{day}.csv')
+    trades_path = os.path.join(TRAINING_DATA_PREFIX, f'trades_round_{round}_day_{day}_wn.csv')
+    book = cached_prices(prices_path)
+    states = add_market_trades(build_states(book, SYMBOLS_BY_ROUND_POSITIONABLE[round], time_limit), cached_trades(trades_path), time_limit)
+    symbols = list(next(iter(states.values())).position.keys())
+    orders_by_time = record_orders(states, mid_prices_from_book(book, symbols, time_limit), True, round, day)
+    # own trades as the matching engine would report them on the next tick
+    engine = MatchingEngine('halfway')
+    previous = None
+    with contextlib.redirect_stdout(io.StringIO()):
+        for timestamp, state in states.items():
+            if previous is not None:
+                for trade in match_orders(engine, orders_by_time[previous.timestamp], previous.order_depths, previous.timestamp):
+                    state.own_trades.setdefault(trade.symbol, []).append(trade)
+            previous = state
+    logger = Logger()
+    logger.print('acceptable price', 4950.5, '"quoted"')
+
+    def full():
+        return [json.dumps({ "state": state, "orders": orders_by_time[t], "logs": logger.logs }, cls=ProsperityEncoder, separators=(",", ":"), sort_keys=True)
+                for t, state in states.items()]
+
+    def compressed():
+        return [json.dumps({ "state": logger.compress_state(state), "orders": logger.compress_orders(orders_by_time[t]), "logs": logger.logs }, cls=ProsperityEncoder, separators=(",", ":"), sort_keys=True)
+                for t, state in states.items()]
+
+    def serialized():
+        return [logger.serialize(state, orders_by_time[t]) for t, state in states.items()]
+
+    # best of several interleaved runs, the machine and the collector of the day's objects add noise
+    runs: dict = { full: [], compressed: [], serialized: [] }
+    for _ in range(5):
+        for serializer, results in runs.items():
+            results.append(timed(serializer))
+            # only the fastest run is kept alive, a growing heap would slow the later runs down
+            results[:] = [min(results, key=lambda run: run[1])]
+    (full_output, full_time), (compressed_output, compressed_time), (serialized_output, serialized_time) = (results[0] for results in runs.values())
+    ticks = len(states)
+    print(f'json.dumps of the state: {full_time / ticks * 1e6:.1f}us per flush, {sum(map(len, full_output)) / ticks:.0f} bytes')
+    print(f'json.dumps of the compressed state: {compressed_time / ticks * 1e6:.1f}us per flush, {sum(map(len, compressed_output)) / ticks:.0f} bytes')
+    print(f'Logger.serialize: {serialized_time / ticks * 1e6:.1f}us per flush ({full_time / serialized_time:.1f}x), {sum(map(len, serialized_output)) / ticks:.0f} bytes')
+    print(f'identical to the compressed json.dumps: {compressed_output == serialized_output}')
+    return compressed_output == serialized_output
+
+
+def bench_sinks(round: int, day: int, time_limit=999900):
+    prices_path = os.path.join(TRAINING_DATA_PREFIX, f'prices_round_{round}_day_{day}.csv')
+    trades_path = os.path.join(TRAINING_DATA_PREFIX, f'trades_round_{round}_day_{day}_wn.csv')
+    book = cached_prices(prices_path)
+    states = add_market_trades(build_states(book, SYMBOLS_BY_ROUND_POSITIONABLE[round], time_limit), cached_trades(trades_path), time_limit)
+    symbols = list(next(iter(states.values())).position.keys())
+    orders_by_time = record_orders(states, mid_prices_from_book(book, symbols, time_limit), True, round, day)
+    logger = Logger()
+    lines = [(t, logger.serialize(state, orders_by_time[t])) for t, state in states.items()]
+    directory = tempfile.mkdtemp()
+
+    def write_day(sink):
+        # the time flush spends handing the lines over, and the total until the sink is closed
+        start = time.perf_counter()
+        for timestamp, output in lines:
+            sink.write(timestamp, output)
+        handed = time.perf_counter() - start
+        sink.close()
+        return handed, time.perf_counter() - start
+
+    # what flush used to keep (every output of the day) against a ring buffer of the last ticks
+    def local_logs_dict():
+        local_logs = {}
+        for t, state in states.items():
+            local_logs[t] = logger.serialize(state, orders_by_time[t])
+        return local_logs
+
+    def ring_buffer():
+        sink = RingBufferSink()
+        for t, state in states.items():
+            sink.write(t, logger.serialize(state, orders_by_time[t]))
+        return sink
+
+    with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+        sinks = [
+            ('stdout (to devnull)', lambda: StdoutSink()),
+            ('null', lambda: NullSink()),
+            ('ring buffer of 1000', lambda: RingBufferSink()),
+            ('file', lambda: FileSink(os.path.join(directory, 'sink.log'))),
+            ('file, background', lambda: BackgroundSink(FileSink(os.path.join(directory, 'sink.log')))),
+            ('gzip', lambda: GzipSink(os.path.join(directory, 'sink.log.gz'))),
+            ('gzip, background', lambda: BackgroundSink(GzipSink(os.path.join(directory, 'sink.log.gz')))),
+        ]
+        results = [(name, write_day(make())) for name, make in sinks]
+    for name, (handed, total) in results:
+        print(f'{name}: {handed / len(lines) * 1e6:.2f}us per flush in the trader, {total:.3f}s until closed')
+    _, dict_size, _ = retained_memory(local_logs_dict)
+    _, ring_size, _ = retained_memory(ring_buffer)
+    print(f'{len(lines)} ticks, {sum(len(output) for _, output in lines) / 2**20:.1f} MiB of output')
+    print(f'kept in memory: local_logs dict {dict_size / 2**20:.1f} MiB, ring buffer {ring_size / 2**20:.1f} MiB')
+    print(f'gzip file {os.path.getsize(os.path.join(directory, "sink.log.gz")) / 2**20:.1f} MiB')
+
+
+def bench_activities(round: int, day: int, time_limit=999900):
+    prices_path = os.path.join(TRAINING_DATA_PREFIX, f'prices_round_{round}_day_{day}.csv')
+    book = cached_prices(prices_path)
+    states = build_states(book, SYMBOLS_BY_ROUND_POSITIONABLE[round], time_limit)
+    symbols = list(next(iter(states.values())).position.keys())
+    ledger = Ledger(symbols, len(states))
+    # any recorded values do, the writers only format them
+    rng = np.random.default_rng(0)
+    ledger.profits[:] = rng.normal(0, 1000, ledger.profits.shape)
+    ledger.balances[:] = rng.normal(0, 1000, ledger.balances.shape)
+    max_time = max(states.keys())
+
+    def per_state():
+        f = io.StringIO()
+        for tick, (t, state) in enumerate(states.items()):
+            write_activities(f, day, t, state, SYMBOLS_BY_ROUND[round], ledger.pnl(tick), t == max_time)
+        return f.getvalue()
+
+    def columnar():
+        f = io.StringIO()
+        activities_table(book, SYMBOLS_BY_ROUND[round], day, time_limit, ledger).write_csv(f)
+        return f.getvalue()
+
+    with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+        legacy, legacy_time = min((timed(per_state) for _ in range(3)), key=lambda run: run[1])
+    table, table_time = min((timed(columnar) for _ in range(3)), key=lambda run: run[1])
+    print(f'{legacy.count(chr(10))} rows, {len(legacy) / 2**20:.1f} MiB')
+    print(f'write_activities per state: {legacy_time:.3f}s')
+    print(f'columnar activities table: {table_time:.3f}s ({legacy_time / table_time:.1f}x)')
+    print(f'identical log: {legacy == table}')
+    return legacy == table
+
+
+def bench_profiler(round: int, day: int, time_limit=999900):
+    book, tape = load_day(round, day)
+
+    def run(profiler):
+        trader = Trader()
+        profiler.instrument(trader)
+        with open(os.devnull, 'w') as devnull, attached_sink(trader, NullSink()):
+            _, _, ledger = backtest_day(Simulation(round, day, trader, time_limit, fill_model='halfway', profiler=profiler, output=devnull), book, tape)
+        profiler.restore()
+        return sum(ledger.final_profit().values())
+
+    runs = [('disabled', lambda: NULL_PROFILER), ('enabled', Profiler)] * 3
+    times = {}
+    profits = set()
+    for name, make in runs:
+        profit, elapsed = timed(run, make())
+        profits.add(profit)
+        times[name] = min(times.get(name, elapsed), elapsed)
+    # what a disabled stage costs, against the same loop without it
+    def null_stages(n=10**6):
+        for _ in range(n):
+            with NULL_PROFILER.stage('tick'):
+                pass
+
+    def empty_loop(n=10**6):
+        for _ in range(n):
+            pass
+
+    _, null_time = timed(null_stages)
+    _, empty_time = timed(empty_loop)
+    stage_cost = (null_time - empty_time) / 10**6
+    ticks = len(np.unique(book.timestamps[:book.cutoff(time_limit)]))
+    print(f'backtest with the profiler disabled: {times["disabled"]:.3f}s, enabled: {times["enabled"]:.3f}s ({times["enabled"] / times["disabled"] - 1:+.1%})')
+    print(f'disabled stage: {stage_cost * 1e9:.0f}ns, {5 * ticks * stage_cost * 1000:.1f}ms over the {ticks} ticks of the day ({5 * ticks * stage_cost / times["disabled"]:.2%})')
+    print(f'same profit: {len(profits) == 1}')
+    return len(profits) == 1
+
+
+def legacy_monkey_positions(monkey_names: list[str], states: dict[int, TradingState], mid_prices: MidPrices, round):
+    """
+    The per-tick monkey loop counterparty_pnl replaced, kept for timing. It compares with the
+    max_time global of the backtester script and re-applies the trades of earlier ticks.
+    """
+    max_time = max(states)
+    profits_by_symbol: dict[int, dict[str, dict[str, float]]] = { 0: {} }
+    balance_by_symbol: dict[int, dict[str, dict[str, float]]] =  { 0: {} }
+    credit_by_symbol: dict[int, dict[str, dict[str, float]]] = { 0: {} }
+    unrealized_by_symbol: dict[int, dict[str, dict[str, float]]] = { 0: {} }
+    prev_monkey_positions: dict[str, dict[str, int]] = {}
+    monkey_positions: dict[str, dict[str, int]] = {}
+    trades_by_round: dict[int, dict[str, list[Trade]]]  = { 0: dict(zip(monkey_names,  [[] for x in range(len(monkey_names))])) }
+    profit_balance: dict[int, dict[str, dict[str, float]]] = { 0: {} }
+
+    monkey_positions_by_timestamp: dict[int, dict[str, dict[str, int]]] = {}
+
+    for monkey in monkey_names:
+        ref_symbols = list(states[0].position.keys())
+        profits_by_symbol[0][monkey] = dict(zip(ref_symbols, [0.0]*len(ref_symbols)))
+        balance_by_symbol[0][monkey] = copy.deepcopy(profits_by_symbol[0][monkey])
+        credit_by_symbol[0][monkey] = copy.deepcopy(profits_by_symbol[0][monkey])
+        unrealized_by_symbol[0][monkey] = copy.deepcopy(profits_by_symbol[0][monkey])
+        profit_balance[0][monkey] = copy.deepcopy(profits_by_symbol[0][monkey])
+        monkey_positions[monkey] = dict(zip(SYMBOLS_BY_ROUND_POSITIONABLE[round], [0]*len(SYMBOLS_BY_ROUND_POSITIONABLE[round])))
+        prev_monkey_positions[monkey] = copy.deepcopy(monkey_positions[monkey])
+
+    for tick, (timestamp, state) in enumerate(states.items()):
+        already_calculated = False
+        mids = mid_prices.at(tick)
+        for monkey in monkey_names:
+            position = copy.deepcopy(monkey_positions[monkey])
+            if trades_by_round.get(timestamp + TIME_DELTA) == None:
+                trades_by_round[timestamp + TIME_DELTA] =  copy.deepcopy(trades_by_round[timestamp])
+
+            for psymbol in POSITIONABLE_SYMBOLS:
+                if already_calculated:
+                    break
+                if state.market_trades.get(psymbol):
+                    for market_trade in state.market_trades[psymbol]:
+                        if trades_by_round[timestamp].get(market_trade.buyer) != None:
+                            trades_by_round[timestamp][market_trade.buyer].append(Trade(psymbol, market_trade.price, market_trade.quantity))
+                        if trades_by_round[timestamp].get(market_trade.seller) != None:
+                            trades_by_round[timestamp][market_trade.seller].append(Trade(psymbol, market_trade.price, -market_trade.quantity))
+            already_calculated = True
+
+            if profit_balance.get(timestamp + TIME_DELTA) == None and timestamp != max_time:
+                profit_balance[timestamp + TIME_DELTA] = copy.deepcopy(profit_balance[timestamp])
+            if profits_by_symbol.get(timestamp + TIME_DELTA) == None and timestamp != max_time:
+                profits_by_symbol[timestamp + TIME_DELTA] = copy.deepcopy(profits_by_symbol[timestamp])
+            if credit_by_symbol.get(timestamp + TIME_DELTA) == None and timestamp != max_time:
+                credit_by_symbol[timestamp + TIME_DELTA] = copy.deepcopy(credit_by_symbol[timestamp])
+            if balance_by_symbol.get(timestamp + TIME_DELTA) == None and timestamp != max_time:
+                balance_by_symbol[timestamp + TIME_DELTA] = copy.deepcopy(balance_by_symbol[timestamp])
+            if unrealized_by_symbol.get(timestamp + TIME_DELTA) == None and timestamp != max_time:
+                unrealized_by_symbol[timestamp + TIME_DELTA] = copy.deepcopy(unrealized_by_symbol[timestamp])
+                for psymbol in SYMBOLS_BY_ROUND_POSITIONABLE[round]:
+                    unrealized_by_symbol[timestamp + TIME_DELTA][monkey][psymbol] = mids[psymbol]*position[psymbol]
+            valid_trades = []
+            if trades_by_round[timestamp].get(monkey) != None:
+                valid_trades = trades_by_round[timestamp][monkey]
+            FLEX_TIME_DELTA = TIME_DELTA
+            if timestamp == max_time:
+                FLEX_TIME_DELTA = 0
+            for valid_trade in valid_trades:
+                    position[valid_trade.symbol] += valid_trade.quantity
+                    credit_by_symbol[timestamp + FLEX_TIME_DELTA][monkey][valid_trade.symbol] += -valid_trade.price * valid_trade.quantity
+            if states.get(timestamp + FLEX_TIME_DELTA) != None:
+                for psymbol in SYMBOLS_BY_ROUND_POSITIONABLE[round]:
+                    unrealized_by_symbol[timestamp + FLEX_TIME_DELTA][monkey][psymbol] = mids[psymbol]*position[psymbol]
+                    if position[psymbol] == 0 and prev_monkey_positions[monkey][psymbol] != 0:
+                        profits_by_symbol[timestamp + FLEX_TIME_DELTA][monkey][psymbol] += credit_by_symbol[timestamp + FLEX_TIME_DELTA][monkey][psymbol]
+                        credit_by_symbol[timestamp + FLEX_TIME_DELTA][monkey][psymbol] = 0
+                        balance_by_symbol[timestamp + FLEX_TIME_DELTA][monkey][psymbol] = 0
+                    else:
+                        balance_by_symbol[timestamp + FLEX_TIME_DELTA][monkey][psymbol] = credit_by_symbol[timestamp + FLEX_TIME_DELTA][monkey][psymbol] + unrealized_by_symbol[timestamp + FLEX_TIME_DELTA][monkey][psymbol]
+                    profit_balance[timestamp + FLEX_TIME_DELTA][monkey][psymbol] = profits_by_symbol[timestamp + FLEX_TIME_DELTA][monkey][psymbol] + balance_by_symbol[timestamp + FLEX_TIME_DELTA][monkey][psymbol]
+            prev_monkey_positions[monkey] = copy.deepcopy(monkey_positions[monkey])
+            monkey_positions[monkey] = position
+            if timestamp == max_time:
+                # i have the feeling this already has been done, and only repeats the same values as before
+                for osymbol in position.keys():
+                    profits_by_symbol[timestamp + FLEX_TIME_DELTA][monkey][osymbol] += credit_by_symbol[timestamp + FLEX_TIME_DELTA][monkey][osymbol] + unrealized_by_symbol[timestamp + FLEX_TIME_DELTA][monkey][osymbol]
+                    balance_by_symbol[timestamp + FLEX_TIME_DELTA][monkey][osymbol] = 0
+        monkey_positions_by_timestamp[timestamp] = copy.deepcopy(monkey_positions)
+    return profit_balance, trades_by_round, profits_by_symbol, balance_by_symbol, monkey_positions_by_timestamp
+
+
+def process_memory() -> dict[str, int]:
+    """
+    Returns the proportional (shared pages split between their processes) and private memory in KiB, Linux only
+    """
+    memory = {}
+    with open('/proc/self/smaps_rollup') as f:
+        for line in f:
+            name, _, value = line.partition(':')
+            if name in ('Pss', 'Private_Clean', 'Private_Dirty'):
+                memory[name] = int(value.split()[0])
+    return { 'pss': memory['Pss'], 'private': memory['Private_Clean'] + memory['Private_Dirty'] }
+
+
+def memory_worker(results, round: int, day: int, shared: Optional[SharedDay], time_limit: int):
+    # a sweep worker after a run, still holding what the run kept
+    with open(os.devnull, 'w') as devnull:
+        simulation = Simulation(round, day, Trader(), time_limit, fill_model='halfway', output=devnull)
+        if shared is None:
+            with attached_sink(simulation.trader, NullSink()):
+                held = backtest_day(simulation, *load_day(round, day))
+            ledger = held[2]
+        else:
+            held = shared.attach()
+            ledger = backtest_views(simulation, *held)
+    results.put((sum(ledger.final_profit().values()), process_memory()))
+
+
+def bench_shared(round: int, day: int, time_limit=999900):
+    context = multiprocessing.get_context('fork')
+    profits = set()
+    with MarketDataService([(round, day, True)]) as service:
+        print(f'shared block: {service.size / 2**20:.1f} MiB')
+        for name, shared in (('load_day + backtest_day', None), ('shared + backtest_views', service.days[0])):
+            for workers in (1, 2, 4):
+                results = context.Queue()
+                processes = [context.Process(target=memory_worker, args=(results, round, day, shared, time_limit)) for _ in range(workers)]
+                for process in processes:
+                    process.start()
+                measured = [results.get() for _ in processes]
+                for process in processes:
+                    process.join()
+                profits.update(profit for profit, _ in measured)
+                pss = sum(memory['pss'] for _, memory in measured) / 1024
+                private = max(memory['private'] for _, memory in measured) / 1024
+                print(f'{name}, {workers} workers: {pss:.1f} MiB proportional in total, {private:.1f} MiB private per worker')
+    print(f'same profit: {len(profits) == 1}')
+    return len(profits) == 1
+
+
+def bench_counterparties(round: int, day: int, time_limit=999900):
+    book, tape = load_day(round, day, names=True)
+    states = add_market_trades(build_states(book, SYMBOLS_BY_ROUND_POSITIONABLE[round], time_limit), tape, time_limit)
+    mid_prices = mid_prices_from_book(book, list(states[0].position.keys()), time_limit)
+    monkeys = ['Caesar', 'Camilla', 'Peter']
+    _, legacy_time = timed(legacy_monkey_positions, monkeys, states, mid_prices, round)
+    series, time_all = timed(counterparty_pnl, tape, mid_prices, time_limit)
+    _, time_monkeys = timed(counterparty_pnl, tape, mid_prices, time_limit, monkeys)
+    print(f'monkey_positions, {len(monkeys)} traders: {legacy_time:.3f}s')
+    print(f'counterparty_pnl, {len(monkeys)} traders: {time_monkeys:.3f}s ({legacy_time / time_monkeys:.0f}x), '
+          f'all {series.trader.nunique()} traders: {time_all:.3f}s')
+
+    # every trader replayed through a Ledger, which keeps the value after tick i in slot i + 1 and overwrites
+    # the value after the second to last tick with the liquidated last one
+    ticks = len(mid_prices.timestamps)
+    tick_of = { timestamp: tick for tick, timestamp in enumerate(mid_prices.timestamps.tolist()) }
+    same = True
+    for trader, trades in counterparty_trades(tape, time_limit).groupby('trader', observed=True):
+        ledger = Ledger(mid_prices.symbols, ticks)
+        trades_by_tick = [[] for _ in range(ticks)]
+        for trade in trades.itertuples():
+            if trade.symbol in ledger.columns:
+                trades_by_tick[tick_of[trade.timestamp]].append(Trade(trade.symbol, trade.price, trade.quantity))
+        position = np.zeros(len(ledger.symbols), dtype=np.int64)
+        for tick in range(ticks):
+            previous = position.copy()
+            for trade in trades_by_tick[tick]:
+                position[ledger.columns[trade.symbol]] += trade.quantity
+            ledger.book_trades(trades_by_tick[tick])
+            ledger.close_tick(tick, mid_prices.mids[tick], previous, position.copy())
+        pnl = ledger.profits + ledger.balances
+        for symbol, rows in series[series.trader == trader].groupby('symbol'):
+            column = ledger.columns[symbol]
+            expected = np.append(pnl[1:-1, column], pnl[-1, column])
+            same &= bool(np.allclose(np.delete(rows.pnl.to_numpy(), -2), expected))
+    print(f'same pnl as a Ledger per trader: {same}')
+    return same
+
+
+def bench_threads(round: int, day: int, time_limit=999900, workers=4):
+    # every fill model with and without names, twice, so equal simulations also run at the same time
+    configs = [(fill_model, names) for fill_model in ('halfway', 'exact') for names in (True, False)] * 2
+
+    def run(config):
+        fill_model, names = config
+        simulation = Simulation(round, day, Trader(), time_limit, names, fill_model, output=io.StringIO())
+        profits = simulation.run()
+        with open(simulation.log_path, encoding="utf-8") as f:
+            log = f.read()
+        os.remove(simulation.log_path)
+        return profits, simulation.output.getvalue(), log
+
+    one_by_one, sequential_time = timed(lambda: [run(config) for config in configs])
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        concurrent, concurrent_time = timed(lambda: list(executor.map(run, configs)))
+    print(f'{len(configs)} simulations one after another: {sequential_time:.2f}s, in {workers} threads: {concurrent_time:.2f}s')
+    same = one_by_one == concurrent
+    print(f'same profits, output and logs: {same}')
+    return same
+
+
+class Turns:
+    """
+    Lets the traders of simulations in threads run their ticks strictly one after another, in a ring
+    """
+    def __init__(self, players: int):
+        self.condition = threading.Condition()
+        self.playing = list(range(players))
+        self.current = 0
+
+    def take(self, player: int):
+        with self.condition:
+            self.condition.wait_for(lambda: self.current == player)
+
+    def pass_on(self, player: int):
+        with self.condition:
+            self.current = self.playing[(self.playing.index(player) + 1) % len(self.playing)]
+            self.condition.notify_all()
+
+    def leave(self, player: int):
+        with self.condition:
+            if self.current == player and len(self.playing) > 1:
+                self.current = self.playing[(self.playing.index(player) + 1) % len(self.playing)]
+            self.playing.remove(player)
+            self.condition.notify_all()
+
+
+class TurnTrader:
+    """
+    Runs trader on its turn only, every other attribute is the trader's
+    """
+    def __init__(self, trader, turns: Turns, player: int):
+        self.trader = trader
+        self.turns = turns
+        self.player = player
+
+    def __getattr__(self, name):
+        return getattr(self.trader, name)
+
+    def run(self, state):
+        self.turns.take(self.player)
+        try:
+            return self.trader.run(state)
+        finally:
+            self.turns.pass_on(self.player)
+
+
+def bench_interleaved(round: int, day: int, time_limit=999900):
+    # different fill models and names, both with a budget and without a profiler, so both share NULL_PROFILER
+    configs = [('halfway', True), ('exact', False)]
+
+    def run(trader, fill_model: str, names: bool):
+        simulation = Simulation(round, day, trader, time_limit, names, fill_model, budget=TickBudget(1000), output=io.StringIO())
+        profits = simulation.run()
+        with open(simulation.log_path, encoding="utf-8") as f:
+            log = f.read()
+        os.remove(simulation.log_path)
+        # the budget summary at the end holds the measured times
+        return profits, simulation.output.getvalue().split('\nTrader.run over')[0], log
+
+    one_by_one = [run(Trader(), *config) for config in configs]
+    turns = Turns(len(configs))
+    interleaved: list = [None] * len(configs)
+
+    def play(player: int):
+        try:
+            interleaved[player] = run(TurnTrader(Trader(), turns, player), *configs[player])
+        finally:
+            turns.leave(player)
+
+    threads = [threading.Thread(target=play, args=(player,)) for player in range(len(configs))]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    same = interleaved == one_by_one
+    untouched = NULL_PROFILER.meta == {} and NULL_PROFILER.timers == {}
+    print(f'{len(configs)} simulations taking turns tick by tick give the same profits, output and logs as one by one: {same}')
+    print(f'NULL_PROFILER left untouched: {untouched}')
+    return same and untouched
+
+
+class LoopPassiveFill(DepthFill):
+    """
+    PassiveFill reading the market trades of the next state one by one
+    """
+    name = 'passive'
+
+    def __init__(self, states: dict[int, TradingState], queue_ahead: float):
+        self.states = states
+        times = sorted(states)
+        self.next_time = dict(zip(times, times[1:]))
+        self.queue_ahead = queue_ahead
+
+    def fill(self, order: Order, book: SymbolBook) -> list[tuple[float, int]]:
+        fills = super().fill(order, book)
+        remaining = abs(order.quantity) - sum(volume for _, volume in fills)
+        next_time = self.next_time.get(book.time)
+        if remaining == 0 or next_time is None:
+            return fills
+        buy = order.quantity > 0
+        through = at = 0
+        for trade in self.states[next_time].market_trades.get(book.symbol, []):
+            if trade.price == order.price:
+                at += trade.quantity
+            elif trade.price < order.price if buy else trade.price > order.price:
+                through += trade.quantity
+        displayed = abs(book.order_depth.buy_orders.get(order.price, 0) if buy else book.order_depth.sell_orders.get(order.price, 0))
+        volume = min(remaining, through + max(0, at - int(self.queue_ahead * displayed)) - book.tape_taken[buy])
+        if volume > 0:
+            book.tape_taken[buy] += volume
+            fills.append((order.price, volume))
+        return fills
+
+
+def bench_passive(round: int, day: int, time_limit=999900):
+    book, tape = load_day(round, day)
+    states = add_market_trades(build_states(book, SYMBOLS_BY_ROUND_POSITIONABLE[round], time_limit), tape, time_limit)
+    symbols = list(next(iter(states.values())).position.keys())
+    orders_by_time = record_orders(states, mid_prices_from_book(book, symbols, time_limit), False, round, day)
+    timestamps = np.fromiter(states.keys(), dtype=np.int64, count=len(states))
+    depth = MatchingEngine('depth', io.StringIO())
+    depth_trades, depth_time = timed(lambda: [match_orders(depth, orders_by_time[t], states[t].order_depths, t) for t in states])
+    print(f'depth: {depth_time / len(states) * 1e6:.1f}us per tick, {sum(abs(t.quantity) for ts in depth_trades for t in ts)} traded')
+    same = True
+    for queue_ahead in (0.0, 0.5, 1.0):
+        engine = MatchingEngine(PassiveFill(queue_ahead), io.StringIO())
+        _, index_time = timed(lambda: engine.load_trades(tape, timestamps, time_limit))
+        trades, passive_time = timed(lambda: [match_orders(engine, orders_by_time[t], states[t].order_depths, t) for t in states])
+        loop = MatchingEngine(LoopPassiveFill(states, queue_ahead), io.StringIO())
+        reference, loop_time = timed(lambda: [match_orders(loop, orders_by_time[t], states[t].order_depths, t) for t in states])
+        same_trades = [[vars(t) for t in ts] for ts in trades] == [[vars(t) for t in ts] for ts in reference]
+        same = same and same_trades
+        print(f'passive, queue_ahead {queue_ahead}: index {index_time:.3f}s, {passive_time / len(states) * 1e6:.1f}us per tick '
+              f'(loop over market trades {loop_time / len(states) * 1e6:.1f}us), {sum(abs(t.quantity) for ts in trades for t in ts)} traded, same trades: {same_trades}')
+    return same
+
+
+def log_sections(path: str, timestamp: int) -> tuple[list[str], str]:
+    """
+    Returns the sandbox lines of a log from timestamp on and its activities log, and removes the log
+    """
+    with open(path, encoding="utf-8") as f:
+        sandbox, activities = f.read().split('\n\n\nActivities log:\n')
+    os.remove(path)
+    lines = sandbox.split('\n')
+    first = next(i for i, line in enumerate(lines) if line.split(' ', 1)[0] == str(timestamp))
+    return lines[first:], activities
+
+
+def bench_checkpoint(round: int, day: int, time_limit=999900):
+    book, _ = load_day(round, day)
+    timestamps = np.unique(book.timestamps[:book.cutoff(time_limit)])
+    timestamp = int(timestamps[int(len(timestamps) * 0.9)])
+    with tempfile.TemporaryDirectory() as directory:
+        full = Simulation(round, day, Trader(), time_limit, fill_model='halfway', output=io.StringIO(), checkpoints=[timestamp], checkpoint_directory=directory)
+        full_profit, full_time = timed(full.run)
+        path = os.path.join(directory, os.listdir(directory)[0])
+        checkpoint, load_time = timed(load_checkpoint, path)
+        resumed = Simulation(round, day, Trader(), time_limit, fill_model='halfway', output=io.StringIO(), resume=checkpoint)
+        resumed_profit, resumed_time = timed(resumed.run)
+        size = os.path.getsize(path)
+    print(f'full run {full_time:.2f}s, checkpoint at {timestamp} of {size / 1024:.1f}KiB loaded in {load_time * 1000:.1f}ms, resumed run {resumed_time:.2f}s')
+    same = (full_profit == resumed_profit and np.array_equal(full.ledger.profits, resumed.ledger.profits)
+            and np.array_equal(full.ledger.balances, resumed.ledger.balances)
+            and log_sections(full.log_path, timestamp) == log_sections(resumed.log_path, timestamp))
+    print(f'same profits, ledger and log from the checkpoint on: {same}')
+    return same
+
+
+def bench_window(round: int, day: int, start_time=400000, end_time=600000):
+    prices_path, trades_path = training_paths(round, day, True)
+    _, index_time = timed(lambda: (build_csv_index(prices_path), build_csv_index(trades_path)))
+    (book, tape), full_time = timed(lambda: (load_prices(prices_path), load_trades(trades_path)))
+    (window_book, window_tape), window_time = timed(lambda: (load_prices_window(prices_path, start_time, end_time), load_trades_window(trades_path, start_time, end_time)))
+    book, tape = book.window(start_time, end_time), tape.window(start_time, end_time)
+    same = (np.array_equal(book.timestamps, window_book.timestamps) and np.array_equal(tape.timestamps, window_tape.timestamps)
+            and np.array_equal(book.bid_prices, window_book.bid_prices, equal_nan=True) and np.array_equal(book.ask_volumes, window_book.ask_volumes)
+            and np.array_equal(tape.prices, window_tape.prices) and np.array_equal(tape.quantities, window_tape.quantities))
+    print(f'building the index {index_time * 1000:.1f}ms, parsing the whole day {full_time * 1000:.1f}ms, '
+          f'the rows {start_time}-{end_time} through the index {window_time * 1000:.1f}ms, same rows: {same}')
+    day_run = Simulation(round, day, Trader(), end_time, fill_model='halfway', output=io.StringIO())
+    window_run = Simulation(round, day, Trader(), end_time, fill_model='halfway', output=io.StringIO(), start_time=start_time)
+    _, day_time = timed(day_run.run)
+    _, run_time = timed(window_run.run)
+    for simulation in (day_run, window_run):
+        os.remove(simulation.log_path)
+    print(f'backtest from 0 to {end_time} {day_time:.2f}s, from {start_time} {run_time:.2f}s')
+    return same
+
+
+def chained_days(round: int, days: list[int], time_limit: int, prefetch=True, trader=None) -> tuple[dict[str, float], str, dict, float]:
+    """
+    Runs simulate_days profiled, by default with a new Trader, returns the profits, the log, the
+    profile and the wall time, and removes the log
+    """
+    profiler = Profiler()
+    trader = Trader() if trader is None else trader
+    profits, elapsed = timed(lambda: simulate_days(round, days, trader, time_limit, fill_model='halfway', profiler=profiler, output=io.StringIO(), prefetch=prefetch))
+    report = profiler.report()
+    with open(report['log'], encoding="utf-8") as f:
+        log = f.read()
+    os.remove(report['log'])
+    os.remove(os.path.splitext(report['log'])[0] + '.profile.json')
+    return profits, log, report, elapsed
+
+
+class SeasonalTrader(Trader):
+    """
+    Runs only the seasonal strategy of Trader on product, recording the day, the time of day and
+    the side of its orders
+    """
+    def __init__(self, product: str):
+        super().__init__()
+        self.product = product
+        self.sides: list[tuple[int, int, int]] = []
+
+    def run(self, state):
+        result = {}
+        windows = [self.params[f'seasonal_{name}'] for name in ('trough_start', 'trough_end', 'peak_start', 'peak_end')]
+        self.trade_seasonal(state, result, self.product, *windows)
+        day, time = divmod(state.timestamp, DAY_LENGTH)
+        self.sides += [(day, time, 1 if order.quantity > 0 else -1) for order in result[self.product]]
+        return result
+
+
+def seasonal_sides(round: int, days: list[int], time_limit: int) -> tuple[list[tuple[int, int, int]], list[tuple[int, int, int]]]:
+    """
+    Returns the orders of SeasonalTrader in a chain of days and on the days run one by one, with
+    the index of the day in days
+    """
+    product = SYMBOLS_BY_ROUND_POSITIONABLE[round][0]
+    chained = SeasonalTrader(product)
+    chained_days(round, days, time_limit, trader=chained)
+    separate = []
+    for i, separate_day in enumerate(days):
+        trader = SeasonalTrader(product)
+        simulation = Simulation(round, separate_day, trader, time_limit, fill_model='halfway', output=io.StringIO())
+        simulation.run()
+        os.remove(simulation.log_path)
+        separate += [(i, time, side) for _, time, side in trader.sides]
+    return chained.sides, separate
+
+
+def separate_days(round: int, days: list[int], time_limit: int) -> float:
+    """
+    Runs every day on its own, profiled like chained_days, returns the wall time of the runs and removes their logs
+    """
+    elapsed = 0.0
+    for day in days:
+        simulation = Simulation(round, day, Trader(), time_limit, fill_model='halfway', profiler=Profiler(), output=io.StringIO())
+        elapsed += timed(simulation.run)[1]
+        os.remove(simulation.log_path)
+        os.remove(os.path.splitext(simulation.log_path)[0] + '.profile.json')
+    return elapsed
+
+
+def bench_days(round: int, day: int, time_limit=999000, repeats=3):
+    # every day of the round with a prices file; day is the one a chain of one day is compared on
+    days = sorted(int(name[len(f'prices_round_{round}_day_'):-len('.csv')]) for name in os.listdir(TRAINING_DATA_PREFIX)
+                  if name.startswith(f'prices_round_{round}_day_') and name.endswith('.csv'))
+    single = Simulation(round, day, Trader(), time_limit, fill_model='halfway', output=io.StringIO())
+    same = single.run() == chained_days(round, [day], time_limit)[0]
+    os.remove(single.log_path)
+    # both sides profiled, interleaved and the best of repeats, the runs of a day vary by a second on a busy machine
+    separate_times = []
+    chained_runs: dict[bool, list] = { False: [], True: [] }
+    for _ in range(repeats):
+        separate_times.append(separate_days(round, days, time_limit))
+        for prefetch in (False, True):
+            chained_runs[prefetch].append(chained_days(round, days, time_limit, prefetch))
+    separate_time = min(separate_times)
+    print(f'days {", ".join(map(str, days))} run one by one: {separate_time:.2f}s, best of {repeats}')
+    results = []
+    for prefetch, runs in chained_runs.items():
+        profits, log, report, elapsed = min(runs, key=lambda run: run[3])
+        results += [(run[0], run[1]) for run in runs]
+        stages = report['stages']
+        print(f'chained, prefetch {prefetch}: {elapsed:.2f}s ({elapsed / separate_time - 1:+.1%}), {stages["prepare_day"]["total_s"]:.2f}s waiting for prepared days, {stages["tick"]["total_s"]:.2f}s in the ticks')
+    same = same and all(result == results[0] for result in results)
+    print(f'same profits and log with and without prefetch, a chain of day {day} alone equals a run of it: {same}')
+    chained, separate = seasonal_sides(round, days, time_limit)
+    seasonal_same = chained == separate and len({ day for day, _, _ in chained }) == len(days)
+    print(f'seasonal orders at the same times of day in the chain as on the days run one by one, on every day: {seasonal_same} ({len(chained)} orders)')
+    return same and seasonal_same
+
+
+BENCHMARKS = {
+    'loader': bench_loader,
+    'cache': bench_cache,
+    'mids': bench_mids,
+    'ledger': bench_ledger,
+    'matching': bench_matching,
+    'netting': bench_netting,
+    'streaming': bench_streaming,
+    'indicators': bench_indicators,
+    'datamodel': bench_datamodel,
+    'logger': bench_logger,
+    'sinks': bench_sinks,
+    'activities': bench_activities,
+    'profiler': bench_profiler,
+    'shared': bench_shared,
+    'counterparties': bench_counterparties,
+    'threads': bench_threads,
+    'interleaved': bench_interleaved,
+    'passive': bench_passive,
+    'checkpoint': bench_checkpoint,
+    'window': bench_window,
+    'days': bench_days,
+}
+
+if __name__ == "__main__":
+    if len(sys.argv) < 4 or sys.argv[1] not in BENCHMARKS:
+        print(f'Usage: python3 benchmark.py {{{"|".join(BENCHMARKS)}}} round day (netting: orders_per_level levels)')
+        sys.exit(1)
+    BENCHMARKS[sys.argv[1]](int(sys.argv[2]), int(sys.argv[3]))
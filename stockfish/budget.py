@@ -0,0 +1,109 @@
+"""
+Time budget of Trader.run
+The exchange stops a Trader.run call that runs over its time limit. TickBudget runs every
+call of a backtest through a timer, recording the wall time, the CPU time of the calling
+thread and optionally the peak allocation (with tracemalloc, which slows the trader down)
+of every tick. Ticks over the budget are flagged, and with drop_late their orders are
+dropped as if the call had timed out. A summary of the violations is printed at the end.
+Sample command, a 100ms budget with timeouts:
+python3 backtester.py 2 0 --budget 100 --budget-timeout
+"""
+import time
+import tracemalloc
+from typing import Optional
+import numpy as np
+from datamodel import Order, Symbol, TradingState
+
+
+class TickBudget:
+    def __init__(self, limit_ms: float, drop_late=False, memory=False):
+        self.limit_ms = limit_ms
+        self.limit = limit_ms / 1000
+        self.drop_late = drop_late
+        self.memory = memory
+        self.started_tracing = False
+        self.timestamps: list[int] = []
+        self.wall: list[float] = []
+        self.cpu: list[float] = []
+        self.peak: list[int] = []
+        self.late: list[int] = []
+
+    def run(self, trader, state: TradingState) -> dict[Symbol, list[Order]]:
+        """
+        Calls trader.run(state) and records the tick, returns no orders for a late tick with drop_late
+        """
+        if self.memory:
+            if not tracemalloc.is_tracing():
+                tracemalloc.start()
+                self.started_tracing = True
+            tracemalloc.reset_peak()
+            traced = tracemalloc.get_traced_memory()[0]
+        wall_start = time.perf_counter()
+        cpu_start = time.thread_time()
+        orders = trader.run(state)
+        cpu = time.thread_time() - cpu_start
+        wall = time.perf_counter() - wall_start
+        if self.memory:
+            self.peak.append(tracemalloc.get_traced_memory()[1] - traced)
+        self.timestamps.append(state.timestamp)
+        self.wall.append(wall)
+        self.cpu.append(cpu)
+        if wall > self.limit:
+            self.late.append(state.timestamp)
+            if self.drop_late:
+                return {}
+        return orders
+
+    def close(self):
+        """
+        Stops tracemalloc if the budget started it
+        """
+        if self.started_tracing:
+            tracemalloc.stop()
+            self.started_tracing = False
+
+    def report(self, worst=5) -> dict:
+        """
+        Returns the latency percentiles, the peak allocation and the ticks over the budget
+        """
+        wall = np.array(self.wall) * 1000
+        cpu = np.array(self.cpu) * 1000
+        slowest = np.argsort(wall)[::-1][:worst]
+        return {
+            'limit_ms': self.limit_ms,
+            'ticks': len(wall),
+            'wall_ms': self.percentiles(wall),
+            'cpu_ms': self.percentiles(cpu),
+            'peak_allocation_kib': self.percentiles(np.array(self.peak) / 1024) if self.peak else None,
+            'over_budget': len(self.late),
+            'orders_dropped': len(self.late) if self.drop_late else 0,
+            'slowest': [{ 'timestamp': self.timestamps[i], 'wall_ms': float(wall[i]), 'cpu_ms': float(cpu[i]) } for i in slowest.tolist()],
+        }
+
+    def percentiles(self, values: np.ndarray) -> Optional[dict[str, float]]:
+        if len(values) == 0:
+            return None
+        return {
+            'p50': float(np.percentile(values, 50)),
+            'p99': float(np.percentile(values, 99)),
+            'max': float(values.max()),
+        }
+
+    def print_summary(self, file=None):
+        report = self.report()
+        if report['ticks'] == 0:
+            return
+        wall, cpu = report['wall_ms'], report['cpu_ms']
+        print(f'\nTrader.run over {report["ticks"]} ticks: wall p50 {wall["p50"]:.2f}ms, p99 {wall["p99"]:.2f}ms, max {wall["max"]:.2f}ms; '
+              f'cpu p50 {cpu["p50"]:.2f}ms, p99 {cpu["p99"]:.2f}ms, max {cpu["max"]:.2f}ms', file=file)
+        if report['peak_allocation_kib'] is not None:
+            peak = report['peak_allocation_kib']
+            print(f'Peak allocation per tick: p50 {peak["p50"]:.1f}KiB, p99 {peak["p99"]:.1f}KiB, max {peak["max"]:.1f}KiB', file=file)
+        if report['over_budget'] == 0:
+            print(f'No tick went over the budget of {self.limit_ms}ms', file=file)
+            return
+        dropped = ', their orders were dropped' if self.drop_late else ''
+        print(f'{report["over_budget"]} ticks went over the budget of {self.limit_ms}ms{dropped}, the slowest:', file=file)
+        for tick in report['slowest']:
+            if tick['wall_ms'] > self.limit_ms:
+                print(f'  timestamp {tick["timestamp"]}: {tick["wall_ms"]:.2f}ms wall, {tick["cpu_ms"]:.2f}ms cpu', file=file)
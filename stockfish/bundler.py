@@ -0,0 +1,396 @@
+"""
+Trader bundler
+Compiles an algorithm file into the single trader.py the exchange takes. The algorithm and the
+local modules it imports (logger.py, indicators.py, utils.py, constants.py, ...) are parsed with
+ast, the stockfish.* imports are resolved to their definitions, and only the definitions the
+trader class reaches are copied, in an order where everything a definition needs when it is
+executed is defined before it. Imports of other modules are kept only when a copied definition
+uses them, so the bundle never imports numpy for a helper it does not contain. datamodel is
+provided by the exchange and stays an import.
+The class with the run method is renamed to Trader. If it keeps a self.logger, the logger is
+flushed before every return of run, like bash.py used to insert.
+Sample command, via bash.py:
+python3 bash.py algorithms/round5.py
+"""
+import ast
+import heapq
+import os
+import subprocess
+import sys
+from typing import Optional
+
+BUNDLER_DIRECTORY = os.path.dirname(os.path.abspath(__file__))
+# Modules the exchange provides next to the submitted file
+EXCHANGE_MODULES = {'datamodel'}
+PACKAGE_PREFIX = 'stockfish.'
+TRADER_CLASS = 'Trader'
+HEAVY_MODULES = ['numpy', 'pandas', 'scipy', 'statistics', 'jsonpickle']
+# The modules bash.py pasted into every trader.py
+PASTED_MODULES = ['constants', 'utils', 'logger', 'indicators']
+
+
+class Binding:
+    """
+    A name bound by an import statement, name is None for import module
+    """
+    def __init__(self, module: str, name: Optional[str], alias: str):
+        self.module = module
+        self.name = name
+        self.alias = alias
+
+    def statement(self) -> str:
+        if self.name is None:
+            return f'import {self.module}' if self.alias == self.module else f'import {self.module} as {self.alias}'
+        return self.name if self.alias == self.name else f'{self.name} as {self.alias}'
+
+
+class Definition:
+    """
+    A top-level statement of a module that binds names: a class, a function or an assignment
+    """
+    def __init__(self, module: 'Module', node: ast.stmt, index: int, names: list[str]):
+        self.module = module
+        self.node = node
+        self.index = index
+        self.names = names
+        # definitions used when the statement is executed, and when it is called
+        self.requires: set['Definition'] = set()
+        self.uses: set['Definition'] = set()
+
+    def key(self) -> tuple[int, int]:
+        return self.module.rank, self.index
+
+
+class Module:
+    def __init__(self, name: str, path: str, rank: int):
+        self.name = name
+        self.path = path
+        self.rank = rank
+        with open(path, 'r', encoding='utf-8') as f:
+            self.source = f.read()
+        self.lines = self.source.splitlines(keepends=True)
+        self.tree = ast.parse(self.source, filename=path)
+        self.definitions: dict[str, Definition] = {}
+        self.imports: dict[str, Binding] = {}
+        self.star_imports: list[str] = []
+        for index, node in enumerate(self.tree.body):
+            if isinstance(node, ast.Import):
+                for alias in node.names:
+                    bound = alias.asname or alias.name.split('.')[0]
+                    self.imports[bound] = Binding(alias.name if alias.asname else bound, None, bound)
+            elif isinstance(node, ast.ImportFrom):
+                for alias in node.names:
+                    if alias.name == '*':
+                        self.star_imports.append(node.module)
+                    else:
+                        self.imports[alias.asname or alias.name] = Binding(node.module, alias.name, alias.asname or alias.name)
+            else:
+                names = bound_names(node)
+                if names:
+                    definition = Definition(self, node, index, names)
+                    for name in names:
+                        self.definitions[name] = definition
+
+    def source_of(self, node: ast.stmt) -> tuple[int, list[str]]:
+        """
+        Returns the first line number and the lines of a statement, with its decorators and
+        the comment lines right above it
+        """
+        start = min([node.lineno] + [decorator.lineno for decorator in getattr(node, 'decorator_list', [])])
+        while start > 1 and self.lines[start - 2].lstrip().startswith('#'):
+            start -= 1
+        return start, self.lines[start - 1:node.end_lineno]
+
+
+def bound_names(node: ast.stmt) -> list[str]:
+    if isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef)):
+        return [node.name]
+    targets = []
+    if isinstance(node, ast.Assign):
+        targets = node.targets
+    elif isinstance(node, (ast.AnnAssign, ast.AugAssign)):
+        targets = [node.target]
+    return [name.id for target in targets for name in ast.walk(target) if isinstance(name, ast.Name)]
+
+
+def names_in(nodes) -> set[str]:
+    return { node.id for root in nodes if root is not None for node in ast.walk(root) if isinstance(node, ast.Name) }
+
+
+def executed_names(node: ast.stmt) -> set[str]:
+    """
+    Names a statement looks up while it is executed: for functions only the decorators,
+    defaults and annotations, for classes also their bases and body, but no function bodies
+    """
+    if isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef)):
+        arguments = node.args
+        annotations = [arg.annotation for arg in arguments.posonlyargs + arguments.args + arguments.kwonlyargs]
+        annotations += [arguments.vararg and arguments.vararg.annotation, arguments.kwarg and arguments.kwarg.annotation, node.returns]
+        return names_in(node.decorator_list + arguments.defaults + arguments.kw_defaults + annotations)
+    if isinstance(node, ast.ClassDef):
+        names = names_in(node.decorator_list + node.bases + [keyword.value for keyword in node.keywords])
+        for statement in node.body:
+            names |= executed_names(statement)
+        return names
+    return names_in([node])
+
+
+class Bundle:
+    def __init__(self, source: str, definitions: list[Definition], available: int, imports: list[str], notes: list[str]):
+        self.source = source
+        self.definitions = definitions
+        self.available = available
+        self.imports = imports
+        self.notes = notes
+
+
+class Bundler:
+    def __init__(self, directory=BUNDLER_DIRECTORY):
+        self.directory = directory
+        self.modules: dict[str, Module] = {}
+        self.included: dict[Definition, None] = {}
+        self.external: dict[str, Binding] = {}
+        self.extras: list[Module] = []
+        self.fallbacks: dict[tuple[str, str], list[str]] = {}
+
+    def local_module(self, name: Optional[str]) -> Optional[Module]:
+        """
+        Returns the parsed local module name (with or without the stockfish. prefix), None for
+        exchange and third party modules
+        """
+        if name is None:
+            return None
+        if name.startswith(PACKAGE_PREFIX):
+            name = name[len(PACKAGE_PREFIX):]
+        path = os.path.join(self.directory, f'{name}.py')
+        if name in EXCHANGE_MODULES or '.' in name or not os.path.exists(path):
+            return None
+        if name not in self.modules:
+            self.modules[name] = Module(name, path, len(self.modules) + 1)
+        return self.modules[name]
+
+    def resolve(self, module: Module, name: str) -> Optional[Definition]:
+        """
+        Includes the definition name refers to in module and returns it, None for builtins,
+        local variables and names imported from other modules (whose import is kept)
+        """
+        definition = module.definitions.get(name)
+        if definition is not None:
+            self.include(definition)
+            return definition
+        binding = module.imports.get(name)
+        if binding is not None:
+            source = self.local_module(binding.module)
+            if source is None:
+                self.keep_import(binding)
+                return None
+            if binding.name is None or binding.alias != binding.name:
+                raise ValueError(f'{module.path}: only from {binding.module} import {binding.name or "..."} without renaming can be bundled')
+            definition = self.lookup(source, binding.name)
+            if definition is None:
+                definition = self.fallback(source, binding.name)
+            if definition is None:
+                raise ValueError(f'{module.path}: {binding.name} is not defined in {source.name}.py')
+            self.include(definition)
+            return definition
+        for star in module.star_imports:
+            source = self.local_module(star)
+            if source is None:
+                self.keep_import(Binding(star, '*', '*'))
+            elif self.lookup(source, name) is not None:
+                return self.resolve(source, name)
+        for extra in self.extras:
+            if extra is not module and name in extra.definitions:
+                return self.resolve(extra, name)
+        return None
+
+    def lookup(self, module: Module, name: str) -> Optional[Definition]:
+        if name in module.definitions:
+            return module.definitions[name]
+        binding = module.imports.get(name)
+        source = self.local_module(binding.module) if binding is not None else None
+        if source is not None and binding.name == name:
+            return self.lookup(source, name)
+        return None
+
+    def fallback(self, module: Module, name: str) -> Optional[Definition]:
+        # bash.py pasted the helper modules into one file, so the round files may import a
+        # name from the wrong one of them
+        for pasted in PASTED_MODULES:
+            other = self.local_module(pasted)
+            if other is not None and other is not module and name in other.definitions:
+                self.fallbacks.setdefault((module.name, other.name), []).append(name)
+                return other.definitions[name]
+        return None
+
+    def keep_import(self, binding: Binding):
+        if binding.module.startswith(PACKAGE_PREFIX) and binding.module[len(PACKAGE_PREFIX):] in EXCHANGE_MODULES:
+            binding = Binding(binding.module[len(PACKAGE_PREFIX):], binding.name, binding.alias)
+        kept = self.external.get(binding.alias)
+        if kept is not None and (kept.module, kept.name) != (binding.module, binding.name):
+            raise ValueError(f'{binding.alias} is imported from both {kept.module} and {binding.module}')
+        self.external[binding.alias] = binding
+
+    def include(self, definition: Definition):
+        if definition in self.included:
+            return
+        self.included[definition] = None
+        executed = executed_names(definition.node)
+        for name in sorted(names_in([definition.node]) - set(definition.names)):
+            used = self.resolve(definition.module, name)
+            if used is None:
+                continue
+            definition.uses.add(used)
+            if name in executed:
+                definition.requires.add(used)
+
+    def ordered(self) -> list[Definition]:
+        """
+        The included definitions, each after the ones its execution requires, otherwise by
+        module and position in the module
+        """
+        waiting = { definition: len(definition.requires - {definition}) for definition in self.included }
+        required_by: dict[Definition, list[Definition]] = {}
+        for definition in self.included:
+            for required in definition.requires - {definition}:
+                required_by.setdefault(required, []).append(definition)
+        ready = [(definition.key(), id(definition), definition) for definition, count in waiting.items() if count == 0]
+        heapq.heapify(ready)
+        order = []
+        while ready:
+            _, _, definition = heapq.heappop(ready)
+            order.append(definition)
+            for dependent in required_by.get(definition, []):
+                waiting[dependent] -= 1
+                if waiting[dependent] == 0:
+                    heapq.heappush(ready, (dependent.key(), id(dependent), dependent))
+        return order
+
+    def bundle(self, algorithm_path: str, extra_paths: list[str] = [], header: str = '"""\nSubmitted file\n"""\n') -> Bundle:
+        """
+        Bundles the trader class of algorithm_path. The definitions of the extra files are
+        available to every module without an import, like when bash.py pasted them.
+        """
+        algorithm = Module('algorithm', algorithm_path, 0)
+        self.extras = [Module(f'extra_{i}', path, -len(extra_paths) + i) for i, path in enumerate(extra_paths)]
+        entry = next((node for node in algorithm.tree.body if isinstance(node, ast.ClassDef)
+                      and any(isinstance(item, ast.FunctionDef) and item.name == 'run' for item in node.body)), None)
+        if entry is None:
+            raise ValueError(f'{algorithm_path} has no class with a run method')
+        self.include(algorithm.definitions[entry.name])
+
+        definitions = self.ordered()
+        by_name: dict[str, Definition] = {}
+        for definition in definitions:
+            for name in definition.names:
+                if name == entry.name and definition.module is algorithm:
+                    name = TRADER_CLASS
+                other = by_name.get(name)
+                if other is not None and other is not definition:
+                    raise ValueError(f'{name} is defined in both {other.module.path} and {definition.module.path}')
+                by_name[name] = definition
+        for alias in self.external:
+            if alias in by_name:
+                raise ValueError(f'{alias} is both imported and defined in {by_name[alias].module.path}')
+
+        imports = self.import_lines()
+        parts = [header] + [line + '\n' for line in imports]
+        previous = None
+        for definition in definitions:
+            # consecutive assignments of a module stay together, like the constants
+            adjacent = (previous is not None and previous.module is definition.module and previous.index + 1 == definition.index
+                        and not isinstance(previous.node, (ast.ClassDef, ast.FunctionDef, ast.AsyncFunctionDef))
+                        and not isinstance(definition.node, (ast.ClassDef, ast.FunctionDef, ast.AsyncFunctionDef)))
+            parts.append('' if adjacent else '\n\n')
+            previous = definition
+            parts.append(self.render(definition, entry if definition.module is algorithm else None))
+        available = len({ id(d) for module in [algorithm, *self.extras, *self.modules.values()] for d in module.definitions.values() })
+        notes = [f'{", ".join(sorted(names))} not defined in {module}.py, taken from {other}.py' for (module, other), names in self.fallbacks.items()]
+        return Bundle(''.join(parts), definitions, available, imports, notes)
+
+    def import_lines(self) -> list[str]:
+        plain = sorted(binding.statement() for binding in self.external.values() if binding.name is None)
+        grouped: dict[str, list[str]] = {}
+        for binding in self.external.values():
+            if binding.name is not None:
+                grouped.setdefault(binding.module, []).append(binding.statement())
+        modules = sorted(grouped, key=lambda module: (module in EXCHANGE_MODULES, module))
+        return plain + [f'from {module} import {", ".join(sorted(grouped[module]))}' for module in modules]
+
+    def render(self, definition: Definition, entry: Optional[ast.ClassDef]) -> str:
+        start, lines = definition.module.source_of(definition.node)
+        lines = list(lines)
+        if entry is None:
+            return ''.join(lines)
+        # rename the trader class and its references, right to left within a line
+        renames = sorted(((node.lineno, node.col_offset, node.end_col_offset) for node in ast.walk(definition.node)
+                          if isinstance(node, ast.Name) and node.id == entry.name), reverse=True)
+        for lineno, begin, end in renames:
+            line = lines[lineno - start]
+            lines[lineno - start] = line[:begin] + TRADER_CLASS + line[end:]
+        if definition.node is entry:
+            header = lines[entry.lineno - start]
+            lines[entry.lineno - start] = header.replace(f'class {entry.name}', f'class {TRADER_CLASS}', 1)
+            for lineno, text in sorted(logger_flushes(entry), reverse=True):
+                lines.insert(lineno - start, text)
+        return ''.join(lines)
+
+
+def returns_of(function: ast.FunctionDef) -> list[ast.Return]:
+    found = []
+    pending = list(function.body)
+    while pending:
+        node = pending.pop()
+        if isinstance(node, ast.Return):
+            found.append(node)
+        elif not isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef, ast.Lambda, ast.ClassDef)):
+            pending.extend(ast.iter_child_nodes(node))
+    return found
+
+
+def logger_flushes(entry: ast.ClassDef) -> list[tuple[int, str]]:
+    """
+    Returns the lines flushing self.logger to insert before the returns of run, if the class
+    keeps a logger and run does not flush it itself
+    """
+    keeps_logger = any(isinstance(node, ast.Attribute) and node.attr == 'logger' and isinstance(node.ctx, ast.Store)
+                       and isinstance(node.value, ast.Name) and node.value.id == 'self' for node in ast.walk(entry))
+    run = next(item for item in entry.body if isinstance(item, ast.FunctionDef) and item.name == 'run')
+    flushes = any(isinstance(node, ast.Attribute) and node.attr == 'flush' for node in ast.walk(run))
+    if not keeps_logger or flushes or len(run.args.args) < 2:
+        return []
+    state = run.args.args[1].arg
+    inserted = []
+    for node in returns_of(run):
+        if not isinstance(node.value, ast.Name):
+            raise ValueError(f'run of {entry.name} returns an expression at line {node.lineno}, return a variable so the logger can be flushed')
+        inserted.append((node.lineno, f'{" " * node.col_offset}self.logger.flush({state}, {node.value.id})\n'))
+    return inserted
+
+
+def measure_import(path: str) -> tuple[float, list[str]]:
+    """
+    Imports the bundle in a fresh interpreter, returns the import time and the modules it loaded
+    """
+    module = os.path.splitext(os.path.basename(path))[0]
+    code = ('import sys, time\n'
+            'before = set(sys.modules)\n'
+            'start = time.perf_counter()\n'
+            f'import {module}\n'
+            'print(time.perf_counter() - start)\n'
+            'print(" ".join(sorted(set(sys.modules) - before)))\n')
+    result = subprocess.run([sys.executable, '-c', code], cwd=os.path.dirname(os.path.abspath(path)),
+                            capture_output=True, text=True, check=True)
+    elapsed, loaded = result.stdout.splitlines()[-2:]
+    return float(elapsed), loaded.split()
+
+
+def report(bundle: Bundle, path: str):
+    elapsed, loaded = measure_import(path)
+    heavy = [module for module in HEAVY_MODULES if module in loaded]
+    print(f'Wrote {path}: {bundle.source.count(chr(10))} lines, {len(bundle.source.encode("utf-8")) / 1024:.1f} KiB, '
+          f'{len(bundle.definitions)} of {bundle.available} definitions')
+    print(f'Imports: {", ".join(bundle.imports) if bundle.imports else "none"}')
+    print(f'Import time {elapsed * 1000:.1f}ms, {len(loaded)} modules loaded, heavy modules: {", ".join(heavy) if heavy else "none"}')
+    for note in bundle.notes:
+        print(f'Note: {note}')
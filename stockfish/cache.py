@@ -0,0 +1,249 @@
+"""
+Binary on-disk cache of parsed training files
+Every CSV gets one cache file holding a JSON header followed by the raw NumPy columns.
+The header records the source path, size and mtime; a mismatch means the CSV changed
+and the cache file is rebuilt. Valid cache files are memory-mapped instead of read.
+Next to them, a CSV can get a sidecar index in the same format, mapping every timestamp to
+the byte offset of its first row, so a window of the day is read without parsing the rest.
+"""
+import hashlib
+import io
+import json
+import os
+from typing import BinaryIO
+import numpy as np
+import pandas as pd
+from market_data import PriceBook, TradeTape, load_prices, load_trades, price_book_from_frame, trade_tape_from_frame
+
+CACHE_DIRECTORY = '.cache'
+MAGIC = b'SFCACHE1'
+ALIGNMENT = 64
+
+PRICE_BOOK_ARRAYS = ['timestamps', 'product_codes', 'bid_prices', 'bid_volumes', 'ask_prices', 'ask_volumes', 'mid_prices', 'integral_bids', 'integral_asks']
+TRADE_TAPE_ARRAYS = ['timestamps', 'symbol_codes', 'buyer_codes', 'seller_codes', 'prices', 'quantities']
+
+
+def cache_path(csv_path: str) -> str:
+    """
+    Returns the cache file of a CSV, next to it in a .cache directory
+    """
+    csv_path = os.path.abspath(csv_path)
+    digest = hashlib.sha1(csv_path.encode('utf-8')).hexdigest()[:12]
+    name = os.path.splitext(os.path.basename(csv_path))[0]
+    return os.path.join(os.path.dirname(csv_path), CACHE_DIRECTORY, f'{name}_{digest}.bin')
+
+
+def source_key(csv_path: str) -> dict:
+    stat = os.stat(csv_path)
+    return {
+        'path': os.path.abspath(csv_path),
+        'size': stat.st_size,
+        'mtime_ns': stat.st_mtime_ns,
+    }
+
+
+def _aligned(offset: int) -> int:
+    return (offset + ALIGNMENT - 1) // ALIGNMENT * ALIGNMENT
+
+
+def write_cache(path: str, key: dict, kind: str, tables: dict, arrays: dict[str, np.ndarray]):
+    """
+    Writes the arrays and the string tables to path, replacing it atomically
+    """
+    layout = {}
+    offset = 0
+    for name, array in arrays.items():
+        layout[name] = {'dtype': array.dtype.str, 'shape': list(array.shape), 'offset': offset}
+        offset = _aligned(offset + array.nbytes)
+    header = json.dumps({'key': key, 'kind': kind, 'tables': tables, 'arrays': layout}).encode('utf-8')
+    data_start = _aligned(len(MAGIC) + 8 + len(header))
+
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = f'{path}.{os.getpid()}.tmp'
+    with open(tmp_path, 'wb') as f:
+        f.write(MAGIC)
+        f.write(len(header).to_bytes(8, 'little'))
+        f.write(header)
+        for name, array in arrays.items():
+            f.seek(data_start + layout[name]['offset'])
+            f.write(np.ascontiguousarray(array).tobytes())
+        f.truncate(data_start + offset)
+    os.replace(tmp_path, path)
+
+
+def read_cache(path: str, key: dict, kind: str):
+    """
+    Returns the string tables and memory-mapped arrays of a cache file,
+    or None if it is missing, corrupt or was built from a different version of the CSV
+    """
+    try:
+        with open(path, 'rb') as f:
+            if f.read(len(MAGIC)) != MAGIC:
+                return None
+            header_length = int.from_bytes(f.read(8), 'little')
+            header = json.loads(f.read(header_length))
+    except (OSError, ValueError):
+        return None
+    if header['key'] != key or header['kind'] != kind:
+        return None
+    data_start = _aligned(len(MAGIC) + 8 + header_length)
+    arrays = {}
+    for name, layout in header['arrays'].items():
+        shape = tuple(layout['shape'])
+        if 0 in shape:
+            arrays[name] = np.empty(shape, dtype=np.dtype(layout['dtype']))
+        else:
+            arrays[name] = np.memmap(path, dtype=np.dtype(layout['dtype']), mode='r', offset=data_start + layout['offset'], shape=shape)
+    return header['tables'], arrays
+
+
+def cached_prices(csv_path: str) -> PriceBook:
+    """
+    load_prices backed by the cache
+    """
+    path = cache_path(csv_path)
+    key = source_key(csv_path)
+    cached = read_cache(path, key, 'prices')
+    if cached is not None:
+        tables, arrays = cached
+        return PriceBook(products=tables['products'], **arrays)
+    book = load_prices(csv_path)
+    write_cache(path, key, 'prices', { 'products': book.products }, { name: getattr(book, name) for name in PRICE_BOOK_ARRAYS })
+    return book
+
+
+def cached_trades(csv_path: str) -> TradeTape:
+    """
+    load_trades backed by the cache
+    """
+    path = cache_path(csv_path)
+    key = source_key(csv_path)
+    cached = read_cache(path, key, 'trades')
+    if cached is not None:
+        tables, arrays = cached
+        return TradeTape(symbols=tables['symbols'], names=tables['names'], **arrays)
+    tape = load_trades(csv_path)
+    write_cache(path, key, 'trades', { 'symbols': tape.symbols, 'names': tape.names }, { name: getattr(tape, name) for name in TRADE_TAPE_ARRAYS })
+    return tape
+
+
+def index_path(csv_path: str) -> str:
+    return os.path.splitext(cache_path(csv_path))[0] + '.idx'
+
+
+def build_csv_index(csv_path: str) -> tuple[bytes, np.ndarray, np.ndarray]:
+    """
+    Scans a CSV sorted by timestamp, returns its header line, its timestamps and the byte
+    offset of the first row of every timestamp followed by the size of the file
+    """
+    timestamps = []
+    offsets = []
+    with open(csv_path, 'rb') as f:
+        header = f.readline()
+        column = header.rstrip(b'\r\n').split(b';').index(b'timestamp')
+        offset = len(header)
+        last = None
+        for line in f:
+            if line.strip():
+                time = int(line.split(b';', column + 1)[column])
+                if time != last:
+                    if last is not None and time < last:
+                        raise ValueError(f'{csv_path} is not sorted by timestamp')
+                    timestamps.append(time)
+                    offsets.append(offset)
+                    last = time
+            offset += len(line)
+    offsets.append(offset)
+    return header, np.array(timestamps, dtype=np.int64), np.array(offsets, dtype=np.int64)
+
+
+def csv_index(csv_path: str) -> tuple[bytes, np.ndarray, np.ndarray]:
+    """
+    build_csv_index backed by the sidecar index file
+    """
+    path = index_path(csv_path)
+    key = source_key(csv_path)
+    cached = read_cache(path, key, 'csv_index')
+    if cached is not None:
+        tables, arrays = cached
+        return tables['header'].encode('utf-8'), arrays['timestamps'], arrays['offsets']
+    header, timestamps, offsets = build_csv_index(csv_path)
+    write_cache(path, key, 'csv_index', { 'header': header.decode('utf-8') }, { 'timestamps': timestamps, 'offsets': offsets })
+    return header, timestamps, offsets
+
+
+def open_csv_at(csv_path: str, start_time: int) -> tuple[BinaryIO, list[str]]:
+    """
+    Opens a CSV at its first row with a timestamp of at least start_time, returns the file
+    and the column names to parse it with (header=None, names=columns)
+    """
+    header, timestamps, offsets = csv_index(csv_path)
+    f = open(csv_path, 'rb')
+    f.seek(int(offsets[np.searchsorted(timestamps, start_time, 'left')]))
+    return f, header.decode('utf-8').rstrip('\r\n').split(';')
+
+
+def read_csv_window(csv_path: str, start_time: int, end_time: int, **kwargs) -> pd.DataFrame:
+    """
+    Parses only the rows of a CSV with a timestamp from start_time to end_time
+    """
+    header, timestamps, offsets = csv_index(csv_path)
+    begin = int(offsets[np.searchsorted(timestamps, start_time, 'left')])
+    end = int(offsets[np.searchsorted(timestamps, end_time, 'right')])
+    with open(csv_path, 'rb') as f:
+        f.seek(begin)
+        rows = f.read(end - begin)
+    return pd.read_csv(io.BytesIO(header + rows), sep=';', **kwargs)
+
+
+def load_prices_window(csv_path: str, start_time: int, end_time: int) -> PriceBook:
+    """
+    load_prices of the rows from start_time to end_time
+    """
+    return price_book_from_frame(read_csv_window(csv_path, start_time, end_time))
+
+
+def load_trades_window(csv_path: str, start_time: int, end_time: int) -> TradeTape:
+    """
+    load_trades of the rows from start_time to end_time
+    """
+    return trade_tape_from_frame(read_csv_window(csv_path, start_time, end_time, dtype={ 'seller': str, 'buyer': str }))
+
+
+def cached_prices_window(csv_path: str, start_time: int, end_time: int) -> PriceBook:
+    """
+    cached_prices from start_time to end_time, a view of the cache when it is built and
+    otherwise parsed from the rows of the window only
+    """
+    cached = read_cache(cache_path(csv_path), source_key(csv_path), 'prices')
+    if cached is None:
+        return load_prices_window(csv_path, start_time, end_time)
+    tables, arrays = cached
+    return PriceBook(products=tables['products'], **arrays).window(start_time, end_time)
+
+
+def cached_trades_window(csv_path: str, start_time: int, end_time: int) -> TradeTape:
+    """
+    cached_trades from start_time to end_time, like cached_prices_window
+    """
+    cached = read_cache(cache_path(csv_path), source_key(csv_path), 'trades')
+    if cached is None:
+        return load_trades_window(csv_path, start_time, end_time)
+    tables, arrays = cached
+    return TradeTape(symbols=tables['symbols'], names=tables['names'], **arrays).window(start_time, end_time)
+
+
+def build_caches(directory: str):
+    """
+    Builds (or refreshes) the cache and the index of every prices and trades file in directory
+    """
+    for file_name in sorted(os.listdir(directory)):
+        csv_path = os.path.join(directory, file_name)
+        if file_name.startswith('prices_') and file_name.endswith('.csv'):
+            cached_prices(csv_path)
+        elif file_name.startswith('trades_') and file_name.endswith('.csv'):
+            cached_trades(csv_path)
+        else:
+            continue
+        csv_index(csv_path)
+        print(f'Cached {csv_path} -> {cache_path(csv_path)}')
@@ -0,0 +1,105 @@
+"""
+Checkpoints of a backtest
+A checkpoint holds what a run needs to continue from a timestamp: the trader object, the
+position and own trades the state of that timestamp receives, the ledger with its history so
+far, the merged order count and the state of the random generators. It is pickled into a
+gzip file; the log sink the trader writes into during the run is not saved, the resumed run
+attaches its own. The trader is unpickled with the current code of its class, so a change to
+late-day logic can be tested by resuming before it instead of replaying the whole day.
+Sample commands, checkpoint round 2 day 0 at 500000 and resume from there:
+python3 backtester.py 2 0 --checkpoint 500000
+python3 backtester.py 2 0 --resume checkpoints/round_2_day_0_wn_500000.ckpt
+"""
+import gzip
+import os
+import pickle
+import random
+from typing import Optional
+import numpy as np
+from datamodel import Position, Symbol, Trade
+from ledger import Ledger
+from logger import LogSink, NullSink
+
+CHECKPOINT_DIRECTORY = 'checkpoints'
+CHECKPOINT_VERSION = 2
+
+
+class Checkpoint:
+    """
+    A run of round, day right before the tick-th state, the one at timestamp.
+    tick counts from start_time, where the run started.
+    """
+    def __init__(self,
+                 round: int,
+                 day: int,
+                 names: bool,
+                 time_limit: int,
+                 fill_model: str,
+                 timestamp: int,
+                 tick: int,
+                 trader,
+                 position: dict[Symbol, Position],
+                 own_trades: dict[Symbol, list[Trade]],
+                 ledger: Ledger,
+                 merged_orders: int,
+                 random_state: Optional[tuple] = None,
+                 numpy_random_state: Optional[tuple] = None,
+                 start_time=0):
+        self.version = CHECKPOINT_VERSION
+        self.round = round
+        self.day = day
+        self.names = names
+        self.time_limit = time_limit
+        self.start_time = start_time
+        self.fill_model = fill_model
+        self.timestamp = timestamp
+        self.tick = tick
+        self.trader = trader
+        self.position = position
+        self.own_trades = own_trades
+        self.ledger = ledger
+        self.merged_orders = merged_orders
+        self.random_state = random.getstate() if random_state is None else random_state
+        self.numpy_random_state = np.random.get_state() if numpy_random_state is None else numpy_random_state
+
+    def restore_random_state(self):
+        random.setstate(self.random_state)
+        np.random.set_state(self.numpy_random_state)
+
+
+def checkpoint_path(round: int, day: int, names: bool, timestamp: int, directory=CHECKPOINT_DIRECTORY) -> str:
+    return os.path.join(directory, f'round_{round}_day_{day}_{"wn" if names else "nn"}_{timestamp}.ckpt')
+
+
+class CheckpointPickler(pickle.Pickler):
+    # log sinks hold open files and threads, they are saved as a reference to a NullSink
+    def persistent_id(self, obj):
+        return 'sink' if isinstance(obj, LogSink) else None
+
+
+class CheckpointUnpickler(pickle.Unpickler):
+    def persistent_load(self, pid):
+        if pid != 'sink':
+            raise pickle.UnpicklingError(f'Unknown reference {pid} in a checkpoint')
+        return NullSink()
+
+
+def save_checkpoint(path: str, checkpoint: Checkpoint):
+    """
+    Writes the checkpoint to path, replacing it atomically
+    """
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    tmp_path = f'{path}.{os.getpid()}.tmp'
+    with gzip.open(tmp_path, 'wb', compresslevel=6) as f:
+        CheckpointPickler(f, pickle.HIGHEST_PROTOCOL).dump(checkpoint)
+    os.replace(tmp_path, path)
+
+
+def load_checkpoint(path: str) -> Checkpoint:
+    with gzip.open(path, 'rb') as f:
+        checkpoint = CheckpointUnpickler(f).load()
+    if not isinstance(checkpoint, Checkpoint) or checkpoint.version != CHECKPOINT_VERSION:
+        raise ValueError(f'{path} is not a checkpoint of version {CHECKPOINT_VERSION}')
+    return checkpoint
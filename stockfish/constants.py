@@ -1,5 +1,5 @@
 """
-Constants for product names
+Constants for product names and the length of a day
 """
 
 PEARLS = "PEARLS"
@@ -14,3 +14,6 @@ DIP = "DIP"
 UKULELE = "UKULELE"
 PICNIC_BASKET = "PICNIC_BASKET"
 OLIVIA = "Olivia"
+
+# Timestamps of a day run below DAY_LENGTH, a multi-day backtest offsets day i by i * DAY_LENGTH
+DAY_LENGTH = 1000000
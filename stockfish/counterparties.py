@@ -0,0 +1,275 @@
+"""
+Counterparty (monkey) PnL analysis
+Replays the named trades of a day (the trades_*_wn.csv files) for every trader in them at
+once. The trades are summed into [trader and symbol, tick] arrays and the running position,
+cash, realized and unrealized PnL follow from cumulative sums, with the conventions of the
+Ledger: the cash of a symbol is realized when its position goes flat during a tick, the rest
+is marked to the mid price of the tick. Values at a timestamp include the trades of that timestamp.
+mine_signals scans every named trades file, one day at a time, and measures the move of the
+reference price (the mid price, or the traded price on days without a prices file) over
+several horizons after every fill, signed by the side of the trader. The hit rates, mean moves
+and their 95% confidence intervals of every (trader, symbol) are ranked by how far the hit rate
+is from a coin flip: informed traders are right more often, contrarian ones less often.
+Sample commands, the final PnL of every trader on round 2 day 0 and the time series as CSV,
+then the informed traders of every training day 500 timestamps after their fills:
+python3 counterparties.py 2 0 --output counterparties.csv
+python3 counterparties.py --signals --horizon 500 --output signals.csv
+"""
+import argparse
+import os
+import re
+import sys
+from typing import List, Optional
+import numpy as np
+import pandas as pd
+from datamodel import Symbol
+from market_data import MidPrices, PriceBook, TradeTape, fill_gaps, mid_prices_from_book
+from cache import cached_prices, cached_trades
+
+ANONYMOUS = 'nan'
+# in timestamps, a tick is 100
+SIGNAL_HORIZONS = [100, 500, 2000, 10000]
+Z_95 = 1.959963984540054
+NAMED_TRADES_FILE = re.compile(r'trades_round_(-?\d+)_day_(-?\d+)_wn\.csv')
+
+
+def counterparty_trades(tape: TradeTape, time_limit=999900, traders: Optional[List[str]] = None) -> pd.DataFrame:
+    """
+    Returns both sides of every named trade: timestamp, trader, counterparty, symbol, price
+    and the quantity signed from the trader's side (bought is positive)
+    """
+    n = tape.cutoff(time_limit)
+    names = pd.Categorical.from_codes(np.concatenate([tape.buyer_codes[:n], tape.seller_codes[:n]]), tape.names)
+    counterparties = pd.Categorical.from_codes(np.concatenate([tape.seller_codes[:n], tape.buyer_codes[:n]]), tape.names)
+    trades = pd.DataFrame({
+        'timestamp': np.tile(tape.timestamps[:n], 2),
+        'trader': names,
+        'counterparty': counterparties,
+        'symbol': pd.Categorical.from_codes(np.tile(tape.symbol_codes[:n], 2), tape.symbols),
+        'price': np.tile(tape.prices[:n], 2),
+        'quantity': np.concatenate([tape.quantities[:n], -tape.quantities[:n]]),
+    })
+    named = (trades.trader != ANONYMOUS).to_numpy()
+    if traders is not None:
+        named = named & trades.trader.isin(traders).to_numpy()
+    return trades[named].reset_index(drop=True)
+
+
+def counterparty_pnl(tape: TradeTape, mid_prices: MidPrices, time_limit=999900, traders: Optional[List[str]] = None) -> pd.DataFrame:
+    """
+    Returns one row per trader, symbol of mid_prices the trader traded, and timestamp of
+    mid_prices with the position, cash, realized, unrealized and total pnl after the trades
+    of the timestamp
+    """
+    trades = counterparty_trades(tape, time_limit, traders)
+    trades = trades[trades.symbol.isin(mid_prices.symbols).to_numpy()]
+    ticks = np.searchsorted(mid_prices.timestamps, trades.timestamp.to_numpy())
+    if len(trades) > 0 and (ticks.max() >= len(mid_prices.timestamps) or (mid_prices.timestamps[ticks] != trades.timestamp.to_numpy()).any()):
+        raise ValueError('The trades have timestamps the mid prices do not have')
+    pairs, keys = pd.factorize(pd.MultiIndex.from_arrays([trades.trader.astype(str), trades.symbol.astype(str)]), sort=True)
+    shape = (len(keys), len(mid_prices.timestamps))
+    quantities = trades.quantity.to_numpy()
+    traded = np.zeros(shape, dtype=np.int64)
+    cash_flow = np.zeros(shape)
+    np.add.at(traded, (pairs, ticks), quantities)
+    np.add.at(cash_flow, (pairs, ticks), -trades.price.to_numpy() * quantities)
+
+    position = np.cumsum(traded, axis=1)
+    cash = np.cumsum(cash_flow, axis=1)
+    previous = np.concatenate([np.zeros((shape[0], 1), dtype=np.int64), position[:, :-1]], axis=1)
+    # the cash up to the last tick the position went flat is realized
+    flat = (position == 0) & (previous != 0)
+    last_flat = np.maximum.accumulate(np.where(flat, np.arange(shape[1]), -1), axis=1)
+    realized = np.where(last_flat >= 0, np.take_along_axis(cash, np.maximum(last_flat, 0), axis=1), 0.0)
+    columns = [mid_prices.columns[symbol] for symbol in keys.get_level_values(1)]
+    unrealized = mid_prices.mids[:, columns].T * position
+
+    return pd.DataFrame({
+        'trader': np.repeat(keys.get_level_values(0), shape[1]),
+        'symbol': np.repeat(keys.get_level_values(1), shape[1]),
+        'timestamp': np.tile(mid_prices.timestamps, shape[0]),
+        'traded': traded.reshape(-1),
+        'position': position.reshape(-1),
+        'cash': cash.reshape(-1),
+        'realized': realized.reshape(-1),
+        'unrealized': unrealized.reshape(-1),
+        'pnl': (cash + unrealized).reshape(-1),
+    })
+
+
+def final_pnl(series: pd.DataFrame) -> pd.DataFrame:
+    """
+    Returns the pnl at the last timestamp as a trader x symbol table with a total column
+    """
+    last = series[series.timestamp == series.timestamp.max()]
+    table = last.pivot(index='trader', columns='symbol', values='pnl').fillna(0.0)
+    table['total'] = table.sum(axis=1)
+    return table.sort_values('total', ascending=False)
+
+
+def named_trade_files(directory: str, rounds: Optional[List[int]] = None) -> list[tuple[int, int, str]]:
+    """
+    Returns round, day and path of every named trades file in directory, in round and day order
+    """
+    files = []
+    for file_name in os.listdir(directory):
+        match = NAMED_TRADES_FILE.fullmatch(file_name)
+        if match is None:
+            continue
+        round, day = int(match.group(1)), int(match.group(2))
+        if rounds is None or round in rounds:
+            files.append((round, day, os.path.join(directory, file_name)))
+    return sorted(files)
+
+
+def reference_prices(tape: TradeTape, book: Optional[PriceBook], time_limit=999900) -> tuple[np.ndarray, List[Symbol], np.ndarray]:
+    """
+    Returns the timestamps, the symbols and the [timestamps, symbols] reference prices of a day:
+    the gap-filled mid prices of the book, or without a book the VWAP of the trades at every
+    traded timestamp, carried forward
+    """
+    if book is not None:
+        mid_prices = mid_prices_from_book(book, book.products, time_limit)
+        return mid_prices.timestamps, mid_prices.symbols, mid_prices.mids
+    n = tape.cutoff(time_limit)
+    ticks, timestamps = pd.factorize(tape.timestamps[:n], sort=True)
+    volume = np.zeros((len(timestamps), len(tape.symbols)))
+    notional = np.zeros((len(timestamps), len(tape.symbols)))
+    np.add.at(volume, (ticks, tape.symbol_codes[:n]), tape.quantities[:n])
+    np.add.at(notional, (ticks, tape.symbol_codes[:n]), tape.prices[:n] * tape.quantities[:n])
+    with np.errstate(invalid='ignore', divide='ignore'):
+        vwap = np.where(volume > 0, notional / volume, np.nan)
+    return np.asarray(timestamps, dtype=np.int64), list(tape.symbols), fill_gaps(vwap)
+
+
+def forward_moves(tape: TradeTape, timestamps: np.ndarray, symbols: List[Symbol], prices: np.ndarray, horizons=SIGNAL_HORIZONS, time_limit=999900) -> pd.DataFrame:
+    """
+    Returns one row per fill and horizon with the move of the reference price from the fill
+    to horizon timestamps later, signed by the side of the trader (positive when it went the
+    trader's way). Trades with oneself and fills less than horizon before the end are left out.
+    """
+    fills = counterparty_trades(tape, time_limit)
+    fills = fills[(fills.trader != fills.counterparty).to_numpy() & fills.symbol.isin(symbols).to_numpy()]
+    column_of = { symbol: i for i, symbol in enumerate(symbols) }
+    columns = np.array([column_of[symbol] for symbol in fills.symbol.astype(str)], dtype=np.int64)
+    times = fills.timestamp.to_numpy()
+    # the last reference price at or before a timestamp
+    start = prices[np.searchsorted(timestamps, times, 'right') - 1, columns]
+    sides = np.sign(fills.quantity.to_numpy())
+    moves = []
+    for horizon in horizons:
+        ahead = times + horizon <= timestamps[-1]
+        end = prices[np.searchsorted(timestamps, times[ahead] + horizon, 'right') - 1, columns[ahead]]
+        moves.append(pd.DataFrame({
+            'trader': fills.trader.astype(str).to_numpy()[ahead],
+            'symbol': fills.symbol.astype(str).to_numpy()[ahead],
+            'horizon': horizon,
+            'move': sides[ahead] * (end - start[ahead]),
+        }))
+    moves = pd.concat(moves, ignore_index=True)
+    return moves[~np.isnan(moves.move.to_numpy())]
+
+
+class SignalStats:
+    """
+    Running counts and sums of the forward moves of every (trader, symbol, horizon), so days
+    are added one at a time and only the totals are kept
+    """
+    def __init__(self):
+        self.totals: Optional[pd.DataFrame] = None
+        self.days: list[tuple[int, int]] = []
+
+    def add(self, round: int, day: int, moves: pd.DataFrame):
+        day_totals = moves.assign(hits=moves.move > 0, misses=moves.move < 0, squares=moves.move ** 2).groupby(['trader', 'symbol', 'horizon']).agg(
+            fills=('move', 'size'), hits=('hits', 'sum'), misses=('misses', 'sum'), moves=('move', 'sum'), squares=('squares', 'sum'))
+        self.totals = day_totals if self.totals is None else self.totals.add(day_totals, fill_value=0)
+        self.days.append((round, day))
+
+    def table(self) -> pd.DataFrame:
+        """
+        Returns the totals with the hit rate (of the fills with a move) and the mean move, each with its 95% confidence interval
+        """
+        table = self.totals.astype({ 'fills': np.int64, 'hits': np.int64, 'misses': np.int64 }).reset_index()
+        decided = table.hits + table.misses
+        with np.errstate(invalid='ignore', divide='ignore'):
+            # Wilson score interval
+            rate = table.hits / decided
+            center = (rate + Z_95 ** 2 / (2 * decided)) / (1 + Z_95 ** 2 / decided)
+            spread = Z_95 / (1 + Z_95 ** 2 / decided) * np.sqrt(rate * (1 - rate) / decided + Z_95 ** 2 / (4 * decided ** 2))
+            mean = table.moves / table.fills
+            deviation = np.sqrt(np.maximum(table.squares / table.fills - mean ** 2, 0) * table.fills / (table.fills - 1))
+            error = Z_95 * deviation / np.sqrt(table.fills)
+        table['hit_rate'] = rate
+        table['hit_low'] = center - spread
+        table['hit_high'] = center + spread
+        table['mean_move'] = mean
+        table['move_low'] = mean - error
+        table['move_high'] = mean + error
+        return table.drop(columns=['moves', 'squares'])
+
+
+def mine_signals(directory: str, horizons=SIGNAL_HORIZONS, rounds: Optional[List[int]] = None, time_limit=999900) -> SignalStats:
+    """
+    Adds the forward moves of every named trades file in directory to a SignalStats, one day at a time
+    """
+    stats = SignalStats()
+    for round, day, trades_path in named_trade_files(directory, rounds):
+        prices_path = os.path.join(directory, f'prices_round_{round}_day_{day}.csv')
+        book = cached_prices(prices_path) if os.path.exists(prices_path) else None
+        tape = cached_trades(trades_path)
+        moves = forward_moves(tape, *reference_prices(tape, book, time_limit), horizons, time_limit)
+        stats.add(round, day, moves)
+        print(f'Round {round} day {day}: {len(moves)} fill moves ({"mid" if book is not None else "traded"} prices)')
+    return stats
+
+
+def rank_signals(table: pd.DataFrame, horizon: int, min_fills=30) -> pd.DataFrame:
+    """
+    Returns the rows of a horizon with at least min_fills fills, ranked by how far the
+    confidence interval of the hit rate is from 0.5 (positive when it excludes 0.5)
+    """
+    ranked = table[(table.horizon == horizon) & (table.fills >= min_fills)].copy()
+    ranked['edge'] = np.maximum(ranked.hit_low - 0.5, 0.5 - ranked.hit_high)
+    ranked['signal'] = np.where(ranked.edge <= 0, '', np.where(ranked.hit_rate > 0.5, 'informed', 'contrarian'))
+    ranked = ranked.sort_values('edge', ascending=False).reset_index(drop=True)
+    ranked.insert(0, 'rank', range(1, len(ranked) + 1))
+    return ranked
+
+
+if __name__ == "__main__":
+    from backtester import SYMBOLS_BY_ROUND_POSITIONABLE, TRAINING_DATA_PREFIX, load_day
+
+    parser = argparse.ArgumentParser(description='PnL of every named trader of a training day, or the informed traders of every day')
+    parser.add_argument('round', type=int, nargs='?')
+    parser.add_argument('day', type=int, nargs='?')
+    parser.add_argument('--traders', nargs='+', help='only these traders')
+    parser.add_argument('--time-limit', type=int, default=999900)
+    parser.add_argument('--signals', action='store_true', help=f'rank the traders of every named trades file in {TRAINING_DATA_PREFIX} by the price moves after their fills')
+    parser.add_argument('--horizons', type=int, nargs='+', default=SIGNAL_HORIZONS, help='timestamps after the fills the moves are measured at')
+    parser.add_argument('--horizon', type=int, help='horizon of the ranking (default: the second one)')
+    parser.add_argument('--rounds', type=int, nargs='*', help='only these rounds')
+    parser.add_argument('--min-fills', type=int, default=30, help='fewest fills a trader and symbol needs to be ranked')
+    parser.add_argument('--top', type=int, default=20, help='rows of the ranking to print')
+    parser.add_argument('--output', help='write the time series table, or the signal table of every horizon, to this CSV')
+    args = parser.parse_args()
+
+    if args.signals:
+        table = mine_signals(TRAINING_DATA_PREFIX, args.horizons, args.rounds, args.time_limit).table()
+        horizon = args.horizon if args.horizon is not None else args.horizons[min(1, len(args.horizons) - 1)]
+        ranked = rank_signals(table, horizon, args.min_fills)
+        print(f'\nTraders and symbols {horizon} timestamps after their fills, ranked by the hit rate interval:')
+        print(ranked.head(args.top).to_string(index=False))
+        if args.output is not None:
+            table.to_csv(args.output, index=False)
+            print(f'Signal table written to {args.output}')
+        sys.exit(0)
+    if args.round is None or args.day is None:
+        parser.error('round and day are required')
+
+    book, tape = load_day(args.round, args.day, names=True)
+    mid_prices = mid_prices_from_book(book, SYMBOLS_BY_ROUND_POSITIONABLE[args.round], args.time_limit)
+    series = counterparty_pnl(tape, mid_prices, args.time_limit, args.traders)
+    print(final_pnl(series).to_string())
+    if args.output is not None:
+        series.to_csv(args.output, index=False)
+        print(f'Time series written to {args.output}')
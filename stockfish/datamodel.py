@@ -1,5 +1,8 @@
 """
 TradingState model from Appendix B
+The classes use __slots__ to drop the per instance __dict__ of the hundreds of thousands of
+objects a backtest day creates. __dict__ is kept as a read-only property, so vars(), the
+encoders and pickling see the same attributes as before.
 """
 
 import json
@@ -14,14 +17,26 @@ UserId = str
 Observation = int
 
 
-class Listing:
+class Slotted:
+    __slots__ = ()
+
+    @property
+    def __dict__(self) -> dict:
+        return { name: getattr(self, name) for name in self.__slots__ }
+
+
+class Listing(Slotted):
+    __slots__ = ('symbol', 'product', 'denomination')
+
     def __init__(self, symbol: Symbol, product: Product, denomination: Product):
         self.symbol = symbol
         self.product = product
         self.denomination = denomination
 
 
-class Order:
+class Order(Slotted):
+    __slots__ = ('symbol', 'price', 'quantity')
+
     def __init__(self, symbol: Symbol, price: int, quantity: int) -> None:
         self.symbol = symbol
         self.price = price
@@ -34,13 +49,17 @@ class Order:
         return "(" + self.symbol + ", " + str(self.price) + ", " + str(self.quantity) + ")"
 
 
-class OrderDepth:
+class OrderDepth(Slotted):
+    __slots__ = ('buy_orders', 'sell_orders')
+
     def __init__(self):
         self.buy_orders: Dict[int, int] = {}
         self.sell_orders: Dict[int, int] = {}
 
 
-class Trade:
+class Trade(Slotted):
+    __slots__ = ('symbol', 'price', 'quantity', 'buyer', 'seller', 'timestamp')
+
     def __init__(self, symbol: Symbol, price: int, quantity: int, buyer: UserId = None, seller: UserId = None, timestamp: int = 0) -> None:
         self.symbol = symbol
         self.price: int = price
@@ -50,7 +69,9 @@ class Trade:
         self.timestamp = timestamp
 
 
-class TradingState(object):
+class TradingState(Slotted):
+    __slots__ = ('timestamp', 'listings', 'order_depths', 'own_trades', 'market_trades', 'position', 'observations')
+
     def __init__(self,
                  timestamp: Time,
                  listings: Dict[Symbol, Listing],
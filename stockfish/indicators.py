@@ -0,0 +1,206 @@
+"""
+Rolling window indicators
+Each indicator keeps a fixed-size ring buffer and is updated once per tick in O(1)
+(amortized for the minimum and maximum), instead of slicing and re-summing a list that
+grows for the whole day. Written without imports so bash.py can paste it into trader.py.
+"""
+
+
+class RingBuffer:
+    """
+    The last size values, oldest first
+    """
+    def __init__(self, size):
+        if size < 1:
+            raise ValueError(f'Ring buffer size must be positive, got {size}')
+        self.size = size
+        self.values = [None] * size
+        self.start = 0
+        self.count = 0
+
+    def append(self, value):
+        """
+        Adds a value and returns the value it evicted, None while the buffer is filling
+        """
+        if self.count < self.size:
+            self.values[(self.start + self.count) % self.size] = value
+            self.count += 1
+            return None
+        evicted = self.values[self.start]
+        self.values[self.start] = value
+        self.start = (self.start + 1) % self.size
+        return evicted
+
+    def full(self):
+        return self.count == self.size
+
+    def __len__(self):
+        return self.count
+
+    def __getitem__(self, i):
+        """
+        Indexes like a list of the buffered values, so -1 is the newest value
+        """
+        if i < 0:
+            i += self.count
+        if i < 0 or i >= self.count:
+            raise IndexError('ring buffer index out of range')
+        return self.values[(self.start + i) % self.size]
+
+    def __iter__(self):
+        for i in range(self.count):
+            yield self.values[(self.start + i) % self.size]
+
+
+class SimpleMovingAverage:
+    """
+    Mean of the last window values, of all values while fewer have been seen (like get_moving_average)
+    """
+    def __init__(self, window):
+        self.buffer = RingBuffer(window)
+        self.total = 0
+        self.value = None
+
+    def update(self, x):
+        evicted = self.buffer.append(x)
+        self.total += x
+        if evicted is not None:
+            self.total -= evicted
+        self.value = self.total / len(self.buffer)
+        return self.value
+
+
+class ExponentialMovingAverage:
+    """
+    Exponential moving average with smoothing 2 / (span + 1), starting at the first value
+    """
+    def __init__(self, span=None, alpha=None):
+        if alpha is None:
+            alpha = 2 / (span + 1)
+        self.alpha = alpha
+        self.value = None
+
+    def update(self, x):
+        if self.value is None:
+            self.value = x
+        else:
+            self.value += self.alpha * (x - self.value)
+        return self.value
+
+
+class RollingStatistics:
+    """
+    Rolling mean and population standard deviation (np.mean and np.std) of the last window values
+    """
+    def __init__(self, window):
+        self.buffer = RingBuffer(window)
+        # sums of the values shifted by the first one, which keeps the squares small
+        self.shift = None
+        self.total = 0
+        self.squares = 0
+
+    def update(self, x):
+        if self.shift is None:
+            self.shift = x
+        evicted = self.buffer.append(x)
+        self.total += x - self.shift
+        self.squares += (x - self.shift) * (x - self.shift)
+        if evicted is not None:
+            self.total -= evicted - self.shift
+            self.squares -= (evicted - self.shift) * (evicted - self.shift)
+        return self.mean()
+
+    def full(self):
+        return self.buffer.full()
+
+    def mean(self):
+        return self.shift + self.total / len(self.buffer)
+
+    def variance(self):
+        mean = self.total / len(self.buffer)
+        # rounding can push the difference just below zero
+        return max(self.squares / len(self.buffer) - mean * mean, 0.0)
+
+    def std(self):
+        return self.variance() ** 0.5
+
+
+class RollingVWAP:
+    """
+    Volume weighted average price of the trades in the last window updates
+    """
+    def __init__(self, window):
+        self.buffer = RingBuffer(window)
+        self.notional = 0
+        self.volume = 0
+        self.value = None
+
+    def update(self, price, volume):
+        volume = abs(volume)
+        evicted = self.buffer.append((price * volume, volume))
+        self.notional += price * volume
+        self.volume += volume
+        if evicted is not None:
+            self.notional -= evicted[0]
+            self.volume -= evicted[1]
+        if self.volume > 0:
+            self.value = self.notional / self.volume
+        return self.value
+
+
+class RollingExtremes:
+    """
+    Minimum and maximum of the last window values, kept in monotonic queues
+    """
+    def __init__(self, window):
+        self.window = window
+        self.seen = 0
+        # (index, value) pairs, values increasing in lows and decreasing in highs
+        self.lows = []
+        self.highs = []
+        self.low_start = 0
+        self.high_start = 0
+
+    def update(self, x):
+        i = self.seen
+        self.seen += 1
+        while len(self.lows) > self.low_start and self.lows[-1][1] >= x:
+            self.lows.pop()
+        self.lows.append((i, x))
+        while len(self.highs) > self.high_start and self.highs[-1][1] <= x:
+            self.highs.pop()
+        self.highs.append((i, x))
+        oldest = self.seen - self.window
+        while self.lows[self.low_start][0] < oldest:
+            self.low_start += 1
+        while self.highs[self.high_start][0] < oldest:
+            self.high_start += 1
+        # drop the expired head once it outgrows the window
+        if self.low_start > self.window:
+            del self.lows[:self.low_start]
+            self.low_start = 0
+        if self.high_start > self.window:
+            del self.highs[:self.high_start]
+            self.high_start = 0
+        return self.min(), self.max()
+
+    def min(self):
+        return self.lows[self.low_start][1]
+
+    def max(self):
+        return self.highs[self.high_start][1]
+
+
+class RateOfChange:
+    """
+    Relative change over the last period updates, None until period + 1 values were seen
+    """
+    def __init__(self, period):
+        self.buffer = RingBuffer(period + 1)
+        self.value = None
+
+    def update(self, x):
+        self.buffer.append(x)
+        if self.buffer.full() and self.buffer[0] != 0:
+            self.value = (x - self.buffer[0]) / self.buffer[0]
+        return self.value
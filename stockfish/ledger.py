@@ -0,0 +1,99 @@
+"""
+PnL ledger of a backtest
+Keeps the running credit, unrealized, profit and balance per symbol as NumPy vectors and
+records profit and balance into preallocated [ticks, symbols] arrays, replacing the
+per-timestamp dict copies of trades_position_pnl_run. Slot i + 1 holds the values after
+the trades of tick i, the last slot additionally has every open position liquidated,
+which is the layout profits_by_symbol/balance_by_symbol had.
+Without a tick count (streaming runs) nothing is recorded and only the running values are kept.
+Runs over several days keep a ledger per day: carry continues the running values of the
+previous day, whose last tick is recorded into slot 0 of the next one instead of liquidating.
+"""
+import numpy as np
+from datamodel import Symbol, Trade
+from typing import List, Optional
+
+
+class Ledger:
+    def __init__(self, symbols: List[Symbol], ticks: Optional[int], snapshots=False):
+        self.symbols = list(symbols)
+        self.columns = { symbol: i for i, symbol in enumerate(self.symbols) }
+        self.ticks = ticks
+        size = len(self.symbols)
+        self.credit = np.zeros(size)
+        self.unrealized = np.zeros(size)
+        self.profit = np.zeros(size)
+        self.balance = np.zeros(size)
+        history = ticks is not None
+        self.profits = np.zeros((ticks, size)) if history else None
+        self.balances = np.zeros((ticks, size)) if history else None
+        # Full history of the other two accounts, only kept on request
+        self.credits = np.zeros((ticks, size)) if history and snapshots else None
+        self.unrealizeds = np.zeros((ticks, size)) if history and snapshots else None
+
+    def carry(self, previous: 'Ledger'):
+        """
+        Continues the running values of the ledger of the previous day, recording them into slot 0
+        """
+        self.credit = previous.credit.copy()
+        self.unrealized = previous.unrealized.copy()
+        self.profit = previous.profit.copy()
+        self.balance = previous.balance.copy()
+        self.record(0)
+
+    def book_trades(self, trades: List[Trade]):
+        for trade in trades:
+            self.credit[self.columns[trade.symbol]] += -trade.price * trade.quantity
+
+    def close_tick(self, tick: int, mids: np.ndarray, previous_position: np.ndarray, position: np.ndarray, last: Optional[bool] = None):
+        """
+        Marks the positions to the mids of the tick, banks the credit of every symbol whose
+        position went flat during the tick, and records the result into the next slot.
+        The last tick also liquidates; last defaults to tick being the last of the ticks.
+        """
+        self.unrealized = mids * position
+        closed = (position == 0) & (previous_position != 0)
+        self.profit += np.where(closed, self.credit, 0.0)
+        self.credit[closed] = 0.0
+        self.balance = np.where(closed, 0.0, self.credit + self.unrealized)
+        if last is None:
+            last = tick == self.ticks - 1
+        if last:
+            self.profit += self.credit + self.unrealized
+            self.balance = np.zeros(len(self.symbols))
+        self.record(tick if last else tick + 1)
+
+    def record(self, slot: int):
+        # the slot after the last tick of a day that is carried over belongs to the next day
+        if self.profits is None or slot == self.ticks:
+            return
+        self.profits[slot] = self.profit
+        self.balances[slot] = self.balance
+        if self.credits is not None:
+            self.credits[slot] = self.credit
+            self.unrealizeds[slot] = self.unrealized
+
+    def pnl(self, tick: int) -> dict[Symbol, float]:
+        """
+        Returns profit plus balance by symbol at a tick, the profit_and_loss of the activities log
+        """
+        return dict(zip(self.symbols, (self.profits[tick] + self.balances[tick]).tolist()))
+
+    def running_pnl(self) -> dict[Symbol, float]:
+        """
+        Returns profit plus balance by symbol after the last closed tick
+        """
+        return dict(zip(self.symbols, (self.profit + self.balance).tolist()))
+
+    def final_profit(self) -> dict[Symbol, float]:
+        if self.profits is None:
+            return self.running_pnl()
+        return self.pnl(self.ticks - 1)
+
+    def as_dicts(self, timestamps: List[int]) -> tuple[dict[int, dict[Symbol, float]], dict[int, dict[Symbol, float]]]:
+        """
+        Returns the profits_by_symbol and balance_by_symbol dicts the ledger replaced
+        """
+        profits = { time: dict(zip(self.symbols, row)) for time, row in zip(timestamps, self.profits.tolist()) }
+        balances = { time: dict(zip(self.symbols, row)) for time, row in zip(timestamps, self.balances.tolist()) }
+        return profits, balances
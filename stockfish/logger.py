@@ -1,72 +1,205 @@
 """
 Logger class
+flush writes the compressed layout of compress_state/compress_orders (the one the visualizer
+reads) instead of the whole state, about half the size. compact=False keeps the full dump.
+Where the output goes is decided by a sink: stdout by default, which is where the exchange
+collects the logs, a ring buffer of the last ticks, or a (gzip) file written in batches by a
+background thread. The backtester attaches its own sink to the logger of the trader it runs.
 """
+import gzip
 import json
-from typing import Any
+import queue
+import threading
+from collections import deque
+from typing import Any, Optional
 from datamodel import Order, ProsperityEncoder, Symbol, TradingState, Trade
 
 
+class LogSink:
+    """
+    Receives the output of every flush with its timestamp, the base sink drops it
+    """
+    def write(self, timestamp: int, output: Optional[str]) -> None:
+        pass
+
+    def write_batch(self, lines: list[tuple[int, Optional[str]]]) -> None:
+        for timestamp, output in lines:
+            self.write(timestamp, output)
+
+    def close(self) -> None:
+        pass
+
+
+class StdoutSink(LogSink):
+    def write(self, timestamp: int, output: Optional[str]) -> None:
+        print(output)
+
+
+class NullSink(LogSink):
+    pass
+
+
+class RingBufferSink(LogSink):
+    """
+    Keeps the output of the last size ticks
+    """
+    def __init__(self, size=1000) -> None:
+        self.lines: deque[tuple[int, Optional[str]]] = deque(maxlen=size)
+
+    def write(self, timestamp: int, output: Optional[str]) -> None:
+        self.lines.append((timestamp, output))
+
+    def get(self, timestamp: int) -> Optional[str]:
+        for line_timestamp, output in reversed(self.lines):
+            if line_timestamp == timestamp:
+                return output
+        return None
+
+
+class FileSink(LogSink):
+    """
+    Writes "timestamp output" lines (a bare timestamp without output) to a path or an open
+    text file, which is then left open on close
+    """
+    def __init__(self, file, buffering=1 << 20) -> None:
+        self.owned = isinstance(file, str)
+        self.file = self.open(file, buffering) if self.owned else file
+
+    def open(self, path: str, buffering: int):
+        return open(path, 'w', encoding="utf-8", newline='\n', buffering=buffering)
+
+    def write(self, timestamp: int, output: Optional[str]) -> None:
+        self.file.write(f'{timestamp}\n' if output is None else f'{timestamp} {output}\n')
+
+    def write_batch(self, lines: list[tuple[int, Optional[str]]]) -> None:
+        self.file.write(''.join([f'{timestamp}\n' if output is None else f'{timestamp} {output}\n' for timestamp, output in lines]))
+
+    def close(self) -> None:
+        if self.owned:
+            self.file.close()
+        else:
+            self.file.flush()
+
+
+class GzipSink(FileSink):
+    def __init__(self, path: str, compresslevel=6) -> None:
+        self.compresslevel = compresslevel
+        super().__init__(path)
+
+    def open(self, path: str, buffering: int):
+        return gzip.open(path, 'wt', compresslevel=self.compresslevel, encoding="utf-8", newline='\n')
+
+
+class BackgroundSink(LogSink):
+    """
+    Collects lines into batches and hands them to sink on a background thread, so flush does
+    not wait on I/O. At most max_batches batches are queued; beyond that flush waits for the
+    thread, which keeps memory bounded when the sink is slower than the trader.
+    """
+    def __init__(self, sink: LogSink, batch_size=256, max_batches=16) -> None:
+        self.sink = sink
+        self.batch_size = batch_size
+        self.pending: list[tuple[int, Optional[str]]] = []
+        self.batches: queue.Queue = queue.Queue(max_batches)
+        self.error: Optional[BaseException] = None
+        self.thread = threading.Thread(target=self.drain, name='log-sink', daemon=True)
+        self.thread.start()
+
+    def write(self, timestamp: int, output: Optional[str]) -> None:
+        self.pending.append((timestamp, output))
+        if len(self.pending) >= self.batch_size:
+            self.batches.put(self.pending)
+            self.pending = []
+
+    def drain(self) -> None:
+        while True:
+            batch = self.batches.get()
+            if batch is None:
+                return
+            if self.error is None:
+                try:
+                    self.sink.write_batch(batch)
+                except BaseException as error:
+                    # keep taking batches so the writer never blocks, close() raises it
+                    self.error = error
+
+    def close(self) -> None:
+        if self.pending:
+            self.batches.put(self.pending)
+            self.pending = []
+        self.batches.put(None)
+        self.thread.join()
+        self.sink.close()
+        if self.error is not None:
+            raise self.error
+
+
 class Logger:
     local: bool
-    local_logs: dict[int, str] = {}
 
-    def __init__(self, local=False) -> None:
+    def __init__(self, local=False, compact=True, sink: Optional[LogSink] = None) -> None:
         self.logs = ""
         self.local = local
+        self.compact = compact
+        # stdout is where the exchange collects the logs, local or not
+        self.sink = sink if sink is not None else StdoutSink()
+        # built once instead of by every json.dumps call
+        self.encoder = ProsperityEncoder(separators=(",", ":"), sort_keys=True)
 
     def print(self, *objects: Any, sep: str = " ", end: str = "\n") -> None:
         self.logs += sep.join(map(str, objects)) + end
 
     def flush(self, state: TradingState, orders: dict[Symbol, list[Order]]) -> None:
-        output = json.dumps({
-            "state": state,
-            "orders": orders,
-            "logs": self.logs,
-        }, cls=ProsperityEncoder, separators=(",", ":"), sort_keys=True)
-        if self.local:
-            self.local_logs[state.timestamp] = output
-        print(output)
+        if self.compact:
+            output = self.serialize(state, orders)
+        else:
+            output = json.dumps({
+                "state": state,
+                "orders": orders,
+                "logs": self.logs,
+            }, cls=ProsperityEncoder, separators=(",", ":"), sort_keys=True)
+        self.sink.write(state.timestamp, output)
 
         self.logs = ""
 
-    def compress_state(self, state: TradingState) -> dict[str, Any]:
-        listings = []
-        for listing in state.listings.values():
-            listings.append([listing["symbol"], listing["product"], listing["denomination"]])
+    def close(self) -> None:
+        self.sink.close()
 
-        order_depths = {}
-        for symbol, order_depth in state.order_depths.items():
-            order_depths[symbol] = [order_depth.buy_orders, order_depth.sell_orders]
+    def serialize(self, state: TradingState, orders: dict[Symbol, list[Order]]) -> str:
+        """
+        Returns the compressed state and orders as compact JSON with sorted keys
+        """
+        return self.encoder.encode({
+            "state": self.compress_state(state),
+            "orders": self.compress_orders(orders),
+            "logs": self.logs,
+        })
 
+    def compress_state(self, state: TradingState) -> dict[str, Any]:
         return {
             "t": state.timestamp,
-            "l": listings,
-            "od": order_depths,
+            "l": self.compress_listings(state.listings),
+            "od": { symbol: [order_depth.buy_orders, order_depth.sell_orders] for symbol, order_depth in state.order_depths.items() },
             "ot": self.compress_trades(state.own_trades),
             "mt": self.compress_trades(state.market_trades),
             "p": state.position,
             "o": state.observations,
         }
 
-    def compress_trades(self, trades: dict[Symbol, list[Trade]]) -> list[list[Any]]:
+    def compress_listings(self, listings: dict) -> list[list[Any]]:
         compressed = []
-        for arr in trades.values():
-            for trade in arr:
-                compressed.append([
-                    trade.symbol,
-                    trade.buyer,
-                    trade.seller,
-                    trade.price,
-                    trade.quantity,
-                    trade.timestamp,
-                ])
-
+        for listing in listings.values():
+            if isinstance(listing, dict):
+                compressed.append([listing["symbol"], listing["product"], listing["denomination"]])
+            else:
+                compressed.append([listing.symbol, listing.product, listing.denomination])
         return compressed
 
-    def compress_orders(self, orders: dict[Symbol, list[Order]]) -> list[list[Any]]:
-        compressed = []
-        for arr in orders.values():
-            for order in arr:
-                compressed.append([order.symbol, order.price, order.quantity])
+    def compress_trades(self, trades: dict[Symbol, list[Trade]]) -> list[list[Any]]:
+        return [
+            [trade.symbol, trade.buyer, trade.seller, trade.price, trade.quantity, trade.timestamp]
+            for arr in trades.values() for trade in arr
+        ]
 
-        return compressed
+    def compress_orders(self, orders: dict[Symbol, list[Order]]) -> list[list[Any]]:
+        return [[order.symbol, order.price, order.quantity] for arr in orders.values() for order in arr]
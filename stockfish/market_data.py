@@ -0,0 +1,358 @@
+"""
+Columnar market data loader
+"""
+import sys
+import numpy as np
+import pandas as pd
+from datamodel import Listing, Observation, OrderDepth, Position, Product, Slotted, Symbol, Trade, TradingState
+from typing import Dict, List
+
+PRICE_LEVELS = 3
+BID_PRICE_COLUMNS = [f'bid_price_{level}' for level in range(1, PRICE_LEVELS + 1)]
+BID_VOLUME_COLUMNS = [f'bid_volume_{level}' for level in range(1, PRICE_LEVELS + 1)]
+ASK_PRICE_COLUMNS = [f'ask_price_{level}' for level in range(1, PRICE_LEVELS + 1)]
+ASK_VOLUME_COLUMNS = [f'ask_volume_{level}' for level in range(1, PRICE_LEVELS + 1)]
+
+
+class PriceBook:
+    """
+    Every row of a prices file as NumPy columns, sorted the way the file is (by timestamp).
+    Prices are float64 with NaN for empty levels, volumes are int64 with 0 for empty levels.
+    integral_bids/integral_asks remember which price columns pandas parsed as int64,
+    so the rebuilt order depths use the same key types as the old iterrows loader.
+    """
+    def __init__(self,
+                 timestamps: np.ndarray,
+                 product_codes: np.ndarray,
+                 products: List[Product],
+                 bid_prices: np.ndarray,
+                 bid_volumes: np.ndarray,
+                 ask_prices: np.ndarray,
+                 ask_volumes: np.ndarray,
+                 mid_prices: np.ndarray,
+                 integral_bids: np.ndarray,
+                 integral_asks: np.ndarray):
+        self.timestamps = timestamps
+        self.product_codes = product_codes
+        self.products = [sys.intern(product) for product in products]
+        self.bid_prices = bid_prices
+        self.bid_volumes = bid_volumes
+        self.ask_prices = ask_prices
+        self.ask_volumes = ask_volumes
+        self.mid_prices = mid_prices
+        self.integral_bids = integral_bids
+        self.integral_asks = integral_asks
+
+    def __len__(self) -> int:
+        return len(self.timestamps)
+
+    def cutoff(self, time_limit: int) -> int:
+        """
+        Returns the number of leading rows with a timestamp of at most time_limit
+        """
+        over = np.flatnonzero(self.timestamps > time_limit)
+        return int(over[0]) if len(over) > 0 else len(self.timestamps)
+
+    def rows(self, start: int, stop: int) -> 'PriceBook':
+        """
+        Returns rows start to stop as a PriceBook viewing the same columns
+        """
+        return PriceBook(self.timestamps[start:stop], self.product_codes[start:stop], self.products,
+                         self.bid_prices[start:stop], self.bid_volumes[start:stop], self.ask_prices[start:stop],
+                         self.ask_volumes[start:stop], self.mid_prices[start:stop], self.integral_bids, self.integral_asks)
+
+    def window(self, start_time: int, end_time: int) -> 'PriceBook':
+        """
+        Returns the rows with a timestamp from start_time to end_time, the book is sorted by timestamp
+        """
+        return self.rows(int(np.searchsorted(self.timestamps, start_time, 'left')), int(np.searchsorted(self.timestamps, end_time, 'right')))
+
+    def shifted(self, offset: int) -> 'PriceBook':
+        """
+        Returns the book with offset added to its timestamps, the other columns are shared
+        """
+        return PriceBook(self.timestamps + offset, self.product_codes, self.products, self.bid_prices, self.bid_volumes,
+                         self.ask_prices, self.ask_volumes, self.mid_prices, self.integral_bids, self.integral_asks)
+
+
+class TradeTape:
+    """
+    Every row of a trades file as NumPy columns. Symbols and trader names are stored as codes
+    into the symbols and names tables; anonymous trades carry the name "nan" like str(NaN) did.
+    """
+    def __init__(self,
+                 timestamps: np.ndarray,
+                 symbol_codes: np.ndarray,
+                 symbols: List[Symbol],
+                 buyer_codes: np.ndarray,
+                 seller_codes: np.ndarray,
+                 names: List[str],
+                 prices: np.ndarray,
+                 quantities: np.ndarray):
+        self.timestamps = timestamps
+        self.symbol_codes = symbol_codes
+        self.symbols = [sys.intern(symbol) for symbol in symbols]
+        self.buyer_codes = buyer_codes
+        self.seller_codes = seller_codes
+        self.names = [sys.intern(name) for name in names]
+        self.prices = prices
+        self.quantities = quantities
+
+    def __len__(self) -> int:
+        return len(self.timestamps)
+
+    def cutoff(self, time_limit: int) -> int:
+        """
+        Returns the number of leading rows with a timestamp of at most time_limit
+        """
+        over = np.flatnonzero(self.timestamps > time_limit)
+        return int(over[0]) if len(over) > 0 else len(self.timestamps)
+
+    def rows(self, start: int, stop: int) -> 'TradeTape':
+        """
+        Returns rows start to stop as a TradeTape viewing the same columns
+        """
+        return TradeTape(self.timestamps[start:stop], self.symbol_codes[start:stop], self.symbols, self.buyer_codes[start:stop],
+                         self.seller_codes[start:stop], self.names, self.prices[start:stop], self.quantities[start:stop])
+
+    def window(self, start_time: int, end_time: int) -> 'TradeTape':
+        """
+        Returns the rows with a timestamp from start_time to end_time, the tape is sorted by timestamp
+        """
+        return self.rows(int(np.searchsorted(self.timestamps, start_time, 'left')), int(np.searchsorted(self.timestamps, end_time, 'right')))
+
+    def shifted(self, offset: int) -> 'TradeTape':
+        """
+        Returns the tape with offset added to its timestamps, the other columns are shared
+        """
+        return TradeTape(self.timestamps + offset, self.symbol_codes, self.symbols, self.buyer_codes,
+                         self.seller_codes, self.names, self.prices, self.quantities)
+
+
+class TradeView(Slotted):
+    """
+    Read-only Trade backed by a row of a TradeTape, so the market trades of a day are stored
+    once as columns instead of as one object per trade. Copying or pickling it gives a Trade.
+    """
+    __slots__ = ('tape', 'row')
+
+    def __init__(self, tape: TradeTape, row: int):
+        self.tape = tape
+        self.row = row
+
+    @property
+    def symbol(self) -> Symbol:
+        return self.tape.symbols[self.tape.symbol_codes[self.row]]
+
+    @property
+    def price(self) -> float:
+        return float(self.tape.prices[self.row])
+
+    @property
+    def quantity(self) -> int:
+        return int(self.tape.quantities[self.row])
+
+    @property
+    def buyer(self) -> str:
+        return self.tape.names[self.tape.buyer_codes[self.row]]
+
+    @property
+    def seller(self) -> str:
+        return self.tape.names[self.tape.seller_codes[self.row]]
+
+    @property
+    def timestamp(self) -> int:
+        return int(self.tape.timestamps[self.row])
+
+    @property
+    def __dict__(self) -> dict:
+        return { name: getattr(self, name) for name in Trade.__slots__ }
+
+    def __reduce__(self):
+        return Trade, tuple(getattr(self, name) for name in Trade.__slots__)
+
+
+class MidPrices:
+    """
+    Mid price of every symbol at every tick as a [ticks, symbols] array.
+    Ticks where a book side is empty carry the last known mid price forward;
+    leading empty ticks take the first known one (what calc_mid used to search for).
+    """
+    def __init__(self, timestamps: np.ndarray, symbols: List[Symbol], mids: np.ndarray):
+        self.timestamps = timestamps
+        self.symbols = symbols
+        self.mids = mids
+        self.columns = { symbol: i for i, symbol in enumerate(symbols) }
+
+    def at(self, tick: int) -> dict[Symbol, float]:
+        """
+        Returns the mid price by symbol of the tick-th timestamp
+        """
+        return dict(zip(self.symbols, self.mids[tick].tolist()))
+
+    def of(self, symbol: Symbol) -> np.ndarray:
+        return self.mids[:, self.columns[symbol]]
+
+
+def fill_gaps(values: np.ndarray) -> np.ndarray:
+    """
+    Forward fills, then back fills, the NaNs of every column of a 2d array
+    """
+    rows = np.arange(len(values))[:, None]
+    last_valid = np.maximum.accumulate(np.where(np.isnan(values), 0, rows), axis=0)
+    filled = np.take_along_axis(values, last_valid, axis=0)
+    first_valid = np.argmax(~np.isnan(filled), axis=0)
+    leading = rows < first_valid[None, :]
+    return np.where(leading, filled[first_valid, np.arange(values.shape[1])][None, :], filled)
+
+
+def mid_prices_from_book(book: PriceBook, symbols: List[Symbol], time_limit: int) -> MidPrices:
+    """
+    Computes the gap-filled mid prices of symbols for every timestamp of the book up to time_limit
+    """
+    n = book.cutoff(time_limit)
+    ticks, timestamps = pd.factorize(book.timestamps[:n])
+    bids = np.where(book.bid_prices[:n] > 0, book.bid_prices[:n], np.nan)
+    asks = np.where(book.ask_prices[:n] > 0, book.ask_prices[:n], np.nan)
+    with np.errstate(invalid='ignore'):
+        best_bid = np.fmax.reduce(bids, axis=1)
+        best_ask = np.fmin.reduce(asks, axis=1)
+    row_mids = (best_bid + best_ask) / 2
+
+    mids = np.full((len(timestamps), len(symbols)), np.nan)
+    column_of_code = np.array([symbols.index(p) if p in symbols else -1 for p in book.products] + [-1], dtype=np.int64)
+    columns = column_of_code[book.product_codes[:n]]
+    rows = columns >= 0
+    mids[ticks[rows], columns[rows]] = row_mids[rows]
+    return MidPrices(np.asarray(timestamps, dtype=np.int64), list(symbols), fill_gaps(mids))
+
+
+def price_book_from_frame(df_prices: pd.DataFrame) -> PriceBook:
+    """
+    Converts a parsed prices DataFrame into a PriceBook
+    """
+    codes, uniques = pd.factorize(df_prices['product'])
+    return PriceBook(
+        df_prices['timestamp'].to_numpy(dtype=np.int64),
+        codes.astype(np.int16),
+        [str(product) for product in uniques],
+        df_prices[BID_PRICE_COLUMNS].to_numpy(dtype=np.float64),
+        df_prices[BID_VOLUME_COLUMNS].fillna(0).to_numpy(dtype=np.int64),
+        df_prices[ASK_PRICE_COLUMNS].to_numpy(dtype=np.float64),
+        df_prices[ASK_VOLUME_COLUMNS].fillna(0).to_numpy(dtype=np.int64),
+        df_prices['mid_price'].to_numpy(dtype=np.float64),
+        np.array([pd.api.types.is_integer_dtype(df_prices[c]) for c in BID_PRICE_COLUMNS]),
+        np.array([pd.api.types.is_integer_dtype(df_prices[c]) for c in ASK_PRICE_COLUMNS]),
+    )
+
+
+def load_prices(path: str) -> PriceBook:
+    """
+    Parses a prices_round_R_day_D.csv file into a PriceBook
+    """
+    return price_book_from_frame(pd.read_csv(path, sep=';'))
+
+
+def trade_tape_from_frame(df_trades: pd.DataFrame) -> TradeTape:
+    """
+    Converts a parsed trades DataFrame into a TradeTape
+    """
+    symbol_codes, symbols = pd.factorize(df_trades['symbol'])
+    names = pd.Index([str(name) for name in df_trades['buyer']] + [str(name) for name in df_trades['seller']])
+    name_codes, name_table = pd.factorize(names)
+    n = len(df_trades)
+    return TradeTape(
+        df_trades['timestamp'].to_numpy(dtype=np.int64),
+        symbol_codes.astype(np.int16),
+        [str(symbol) for symbol in symbols],
+        name_codes[:n].astype(np.int32),
+        name_codes[n:].astype(np.int32),
+        [str(name) for name in name_table],
+        df_trades['price'].to_numpy(dtype=np.float64),
+        df_trades['quantity'].to_numpy(dtype=np.int64),
+    )
+
+
+def load_trades(path: str) -> TradeTape:
+    """
+    Parses a trades_round_R_day_D_{wn,nn}.csv file into a TradeTape
+    """
+    return trade_tape_from_frame(pd.read_csv(path, sep=';', dtype={ 'seller': str, 'buyer': str }))
+
+
+def _level_lists(prices: np.ndarray, volumes: np.ndarray, integral: np.ndarray, sign: int):
+    # One python list per level, so the per row loop only does list indexing
+    levels = []
+    for level in range(prices.shape[1]):
+        column = prices[:, level]
+        valid = (column > 0).tolist()
+        if integral[level]:
+            column = np.where(np.isnan(column), 0, column).astype(np.int64)
+        levels.append((valid, column.tolist(), (sign * volumes[:, level]).tolist()))
+    return levels
+
+
+def build_states(book: PriceBook, positionable: List[Product], time_limit: int) -> dict[int, TradingState]:
+    """
+    Builds one TradingState per timestamp of the book, up to and including time_limit
+    """
+    n = book.cutoff(time_limit)
+    timestamps = book.timestamps[:n].tolist()
+    codes = book.product_codes[:n].tolist()
+    mids = book.mid_prices[:n].tolist()
+    bids = _level_lists(book.bid_prices[:n], book.bid_volumes[:n], book.integral_bids, 1)
+    asks = _level_lists(book.ask_prices[:n], book.ask_volumes[:n], book.integral_asks, -1)
+    is_positionable = [product in positionable for product in book.products]
+
+    states = {}
+    state = None
+    for i in range(n):
+        time = timestamps[i]
+        if state is None or state.timestamp != time:
+            state = states.get(time)
+            if state is None:
+                position: Dict[Product, Position] = {}
+                own_trades: Dict[Symbol, List[Trade]] = {}
+                market_trades: Dict[Symbol, List[Trade]] = {}
+                observations: Dict[Product, Observation] = {}
+                state = TradingState(time, {}, {}, own_trades, market_trades, position, observations)
+                states[time] = state
+        code = codes[i]
+        product = book.products[code]
+        if is_positionable[code] and product not in state.position:
+            state.position[product] = 0
+            state.own_trades[product] = []
+            state.market_trades[product] = []
+
+        # every state gets its own listings, like the fresh state the exchange hands over every tick
+        state.listings[product] = Listing(product, product, "1")
+
+        if product == "DOLPHIN_SIGHTINGS":
+            state.observations["DOLPHIN_SIGHTINGS"] = mids[i]
+
+        depth = OrderDepth()
+        for valid, prices, volumes in bids:
+            if valid[i]:
+                depth.buy_orders[prices[i]] = volumes[i]
+        for valid, prices, volumes in asks:
+            if valid[i]:
+                depth.sell_orders[prices[i]] = volumes[i]
+        state.order_depths[product] = depth
+
+    return states
+
+
+def add_market_trades(states: dict[int, TradingState], tape: TradeTape, time_limit: int) -> dict[int, TradingState]:
+    """
+    Appends the trades of the tape to the market_trades of the state at their timestamp
+    """
+    n = tape.cutoff(time_limit)
+    timestamps = tape.timestamps[:n].tolist()
+    symbols = [tape.symbols[code] for code in tape.symbol_codes[:n].tolist()]
+    for i in range(n):
+        market_trades = states[timestamps[i]].market_trades
+        symbol = symbols[i]
+        if symbol not in market_trades:
+            market_trades[symbol] = []
+        market_trades[symbol].append(TradeView(tape, i))
+    return states
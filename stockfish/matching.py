@@ -0,0 +1,259 @@
+"""
+Matching engine of the backtester
+Each symbol's book is held as sorted price levels with a price -> level index. Fills
+take volume out of the levels, so several orders of one tick never match the same
+liquidity twice, and the OrderDepth of the state is never copied or modified.
+Orders are netted per price level and checked against the position limit before matching.
+How an order meets the book is decided by a fill model:
+exact    fills only against the level at exactly the order price (the default matching)
+halfway  fills the whole order at its price if it reaches the mid price (halfway=True)
+depth    walks the opposite side from the best level like an exchange, across levels
+passive  like depth, and what is left of an order rests at its price until the next tick:
+         the market trades printed then at or through the price fill it, those at the price
+         only after the share queue_ahead of the volume displayed at it on the book
+"""
+from bisect import bisect_left, bisect_right
+import numpy as np
+from datamodel import Order, OrderDepth, Symbol, Trade
+from market_data import TradeTape
+from typing import Dict, List, Optional
+
+# share of the displayed volume at our price assumed to be ahead of a resting order
+PASSIVE_QUEUE_AHEAD = 1.0
+
+
+class PriceLevels:
+    """
+    One side of a book, best price first, with unsigned remaining volumes
+    """
+    def __init__(self, orders: Dict[int, int], descending: bool):
+        self.prices = sorted(orders, reverse=descending)
+        self.volumes = [abs(orders[price]) for price in self.prices]
+        self.index = { price: i for i, price in enumerate(self.prices) }
+
+    def best(self) -> Optional[int]:
+        return self.prices[0] if self.prices else None
+
+    def take(self, i: int, volume: int) -> int:
+        """
+        Removes up to volume from the i-th level and returns what was removed
+        """
+        taken = min(volume, self.volumes[i])
+        self.volumes[i] -= taken
+        return taken
+
+
+class SymbolBook:
+    def __init__(self, order_depth: OrderDepth, symbol: Symbol = '', time=0):
+        self.order_depth = order_depth
+        self.symbol = symbol
+        self.time = time
+        self.bids = PriceLevels(order_depth.buy_orders, True)
+        self.asks = PriceLevels(order_depth.sell_orders, False)
+        best_bid = self.bids.best()
+        best_ask = self.asks.best()
+        self.mid = None if best_bid is None or best_ask is None else (best_bid + best_ask) / 2
+        # market trade volume already given to resting buy and sell orders of this tick
+        self.tape_taken = { True: 0, False: 0 }
+
+    def opposite(self, order: Order) -> PriceLevels:
+        return self.asks if order.quantity > 0 else self.bids
+
+    def same(self, order: Order) -> PriceLevels:
+        return self.bids if order.quantity > 0 else self.asks
+
+
+class ExactPriceFill:
+    name = 'exact'
+
+    def fill(self, order: Order, book: SymbolBook) -> list[tuple[float, int]]:
+        levels = book.opposite(order)
+        i = levels.index.get(order.price)
+        if i is None:
+            return []
+        volume = levels.take(i, abs(order.quantity))
+        return [(order.price, volume)] if volume > 0 else []
+
+
+class HalfwayFill:
+    name = 'halfway'
+
+    def fill(self, order: Order, book: SymbolBook) -> list[tuple[float, int]]:
+        if book.mid is None:
+            return []
+        if order.quantity > 0 and order.price >= book.mid or order.quantity < 0 and order.price <= book.mid:
+            return [(order.price, abs(order.quantity))]
+        return []
+
+
+class DepthFill:
+    name = 'depth'
+
+    def fill(self, order: Order, book: SymbolBook) -> list[tuple[float, int]]:
+        levels = book.opposite(order)
+        buy = order.quantity > 0
+        remaining = abs(order.quantity)
+        fills = []
+        for i, price in enumerate(levels.prices):
+            if remaining == 0 or (price > order.price if buy else price < order.price):
+                break
+            volume = levels.take(i, remaining)
+            if volume > 0:
+                remaining -= volume
+                fills.append((price, volume))
+        return fills
+
+
+class MarketTradeIndex:
+    """
+    The trades of a TradeTape by (symbol, timestamp), each sorted by price with cumulative
+    quantities, so the volume printed below or above a price is two binary searches.
+    The index is built with NumPy, the slices are kept as lists since a tick holds few trades.
+    timestamps are those of the states, next_time finds the tick after a timestamp.
+    """
+    def __init__(self, tape: TradeTape, timestamps: np.ndarray, time_limit=999900):
+        n = tape.cutoff(time_limit)
+        codes = tape.symbol_codes[:n]
+        times = tape.timestamps[:n]
+        order = np.lexsort((tape.prices[:n], times, codes))
+        prices = tape.prices[:n][order].tolist()
+        cumulative = np.concatenate([[0], np.cumsum(tape.quantities[:n][order])]).tolist()
+        keys, starts, counts = np.unique(np.stack([codes[order], times[order]], axis=1), axis=0, return_index=True, return_counts=True)
+        self.slices: dict[tuple[Symbol, int], tuple[list[float], list[int]]] = {
+            (tape.symbols[code], time): (prices[start:start + count], cumulative[start:start + count + 1])
+            for (code, time), start, count in zip(keys.tolist(), starts.tolist(), counts.tolist())
+        }
+        timestamps = np.unique(timestamps).tolist()
+        self.next_times = dict(zip(timestamps, timestamps[1:]))
+
+    def next_time(self, time: int) -> Optional[int]:
+        return self.next_times.get(time)
+
+    def volume(self, symbol: Symbol, time: int, price: float, buy: bool) -> tuple[int, int]:
+        """
+        Returns the volume traded through price (below it for a buy, above for a sell) and at price
+        """
+        trades = self.slices.get((symbol, time))
+        if trades is None:
+            return 0, 0
+        prices, cumulative = trades
+        below = bisect_left(prices, price)
+        above = bisect_right(prices, price, below)
+        through = cumulative[below] - cumulative[0] if buy else cumulative[-1] - cumulative[above]
+        return int(through), int(cumulative[above] - cumulative[below])
+
+
+class PassiveFill(DepthFill):
+    name = 'passive'
+
+    def __init__(self, queue_ahead=PASSIVE_QUEUE_AHEAD):
+        if not 0 <= queue_ahead <= 1:
+            raise ValueError(f'queue_ahead is a share of the displayed volume, got {queue_ahead}')
+        self.queue_ahead = queue_ahead
+        self.trades: Optional[MarketTradeIndex] = None
+
+    def load_trades(self, trades: MarketTradeIndex):
+        self.trades = trades
+
+    def fill(self, order: Order, book: SymbolBook) -> list[tuple[float, int]]:
+        fills = super().fill(order, book)
+        if self.trades is None:
+            raise ValueError('The passive fill model needs the market trades, see MatchingEngine.load_trades')
+        remaining = abs(order.quantity) - sum(volume for _, volume in fills)
+        next_time = self.trades.next_time(book.time)
+        if remaining == 0 or next_time is None:
+            return fills
+        buy = order.quantity > 0
+        through, at = self.trades.volume(book.symbol, next_time, order.price, buy)
+        levels = book.same(order)
+        i = levels.index.get(order.price)
+        displayed = levels.volumes[i] if i is not None else 0
+        printed = through + max(0, at - int(self.queue_ahead * displayed))
+        volume = min(remaining, printed - book.tape_taken[buy])
+        if volume > 0:
+            book.tape_taken[buy] += volume
+            fills.append((order.price, volume))
+        return fills
+
+
+def aggregate_orders(orders: List[Order]) -> tuple[List[Order], int]:
+    """
+    Nets the orders into one order per (symbol, price, side) in a single pass, in the order
+    the levels first appear. Returns the aggregated orders and how many orders were merged
+    into an earlier one. Orders without quantity are dropped.
+    """
+    levels: dict[tuple[Symbol, float, bool], Order] = {}
+    merged = 0
+    for order in orders:
+        if order.quantity == 0:
+            continue
+        key = (order.symbol, order.price, order.quantity > 0)
+        level = levels.get(key)
+        if level is None:
+            levels[key] = Order(order.symbol, order.price, order.quantity)
+        else:
+            level.quantity += order.quantity
+            merged += 1
+    return list(levels.values()), merged
+
+
+def exceeds_position_limit(orders: List[Order], position: int, limit: int) -> bool:
+    """
+    True if all buy orders (or all sell orders) filling would take the position past the limit,
+    in which case the exchange cancels every order of the symbol
+    """
+    buys = sum(order.quantity for order in orders if order.quantity > 0)
+    sells = sum(-order.quantity for order in orders if order.quantity < 0)
+    return position + buys > limit or position - sells < -limit
+
+
+FILL_MODELS = {
+    ExactPriceFill.name: ExactPriceFill,
+    HalfwayFill.name: HalfwayFill,
+    DepthFill.name: DepthFill,
+    PassiveFill.name: PassiveFill,
+}
+
+
+class MatchingEngine:
+    def __init__(self, fill_model='exact', output=None):
+        # a name of FILL_MODELS, or a fill model instance like PassiveFill(queue_ahead=0.5)
+        if not isinstance(fill_model, str):
+            self.fill_model = fill_model
+        elif fill_model in FILL_MODELS:
+            self.fill_model = FILL_MODELS[fill_model]()
+        else:
+            raise ValueError(f'Unknown fill model {fill_model}, expected one of {", ".join(FILL_MODELS)}')
+        # where the orders without a fill are reported, sys.stdout by default
+        self.output = output
+
+    def load_trades(self, tape: TradeTape, timestamps: np.ndarray, time_limit=999900):
+        """
+        Hands the market trades of the day to a fill model that uses them
+        """
+        if hasattr(self.fill_model, 'load_trades'):
+            self.fill_model.load_trades(MarketTradeIndex(tape, timestamps, time_limit))
+
+    def match(self, trader_orders: dict[Symbol, List[Order]], order_depths: dict[Symbol, OrderDepth], time: int) -> list[Trade]:
+        """
+        Matches the orders of one tick against the books and returns the resulting trades,
+        with positive quantities for our buys and negative ones for our sells
+        """
+        trades = []
+        for symbol, orders in trader_orders.items():
+            if order_depths.get(symbol) == None:
+                continue
+            book = SymbolBook(order_depths[symbol], symbol, time)
+            for order in orders:
+                if order.quantity == 0:
+                    continue
+                fills = self.fill_model.fill(order, book)
+                if len(fills) == 0:
+                    print(f'No matches for order {order} at time {time}', file=self.output)
+                    print(f'Order depth is {order_depths[order.symbol].__dict__}', file=self.output)
+                for price, volume in fills:
+                    if order.quantity > 0:
+                        trades.append(Trade(symbol, price, volume, "YOU", "BOT", time))
+                    else:
+                        trades.append(Trade(symbol, price, -volume, "BOT", "YOU", time))
+        return trades
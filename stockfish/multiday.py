@@ -0,0 +1,164 @@
+"""
+Backtest over several days of a round as one continuous timeline
+The days run one after another with their timestamps offset by DAY_LENGTH per day, so day
+-1, 0 and 1 of round 2 run from 0 to 2999900. The trader object, its position and the own
+trades of the last tick carry over into the next day, only the last day is liquidated.
+Every day has its own ledger continuing the running values of the one before, so the
+activities log lists each day with its own day number and its profit and loss carried on.
+While a day runs, a background thread loads the next one and computes its mid prices; the
+states are built from the book in chunks as the day consumes them, like in shared_data.py,
+so only the states of a chunk are alive and the runs of later days are not slowed down by
+the garbage collector walking the states of a whole day.
+Strategies keyed to the time of day have to take state.timestamp % DAY_LENGTH, like
+trade_seasonal of Round5 does; on the exchange, where a day starts at 0, it is the timestamp.
+Sample command:
+python3 backtester.py 2 --days -1 0 1
+"""
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import List, Optional
+from datamodel import Product, Symbol
+from constants import DAY_LENGTH
+from ledger import Ledger
+from logger import LogSink
+from market_data import MidPrices, PriceBook, TradeTape, build_states, mid_prices_from_book
+from activities import ActivitiesTable, activities_table
+from profiler import NULL_PROFILER, Profiler
+from budget import TickBudget
+from backtester import (
+    Simulation,
+    load_window,
+    log_header,
+    new_log_path,
+    run_tick,
+    sandbox_log,
+    write_activities_header,
+    write_profile,
+)
+from streaming import Lookahead
+from shared_data import state_views
+
+
+class PreparedDay:
+    """
+    The book, tape and mid prices of a day, on the continuous timeline
+    """
+    def __init__(self, day: int, offset: int, book: PriceBook, tape: TradeTape, mid_prices: MidPrices):
+        self.day = day
+        self.offset = offset
+        self.book = book
+        self.tape = tape
+        self.mid_prices = mid_prices
+
+
+def ledger_symbols(book: PriceBook, positionable: List[Product]) -> List[Symbol]:
+    """
+    Returns the symbols in the order the first state of the book lists its positions
+    """
+    first_time = int(book.timestamps[0])
+    states = build_states(book.rows(0, book.cutoff(first_time)), positionable, first_time)
+    return list(states[first_time].position.keys())
+
+
+def prepare_day(simulation: Simulation, day: int, offset: int, symbols: Optional[List[Symbol]] = None) -> PreparedDay:
+    """
+    Loads a day up to the time limit of the simulation, offset on the timeline, with the mid
+    prices of symbols, by default those of its first state
+    """
+    book, tape = load_window(simulation.round, day, simulation.names, 0, simulation.time_limit)
+    book, tape = book.shifted(offset), tape.shifted(offset)
+    if symbols is None:
+        symbols = ledger_symbols(book, simulation.positionable)
+    return PreparedDay(day, offset, book, tape, mid_prices_from_book(book, symbols, offset + simulation.time_limit))
+
+
+def run_day(simulation: Simulation, prepared: PreparedDay, carried: Optional[tuple], sandbox: Optional[LogSink], final: bool) -> tuple:
+    """
+    Runs the states of a prepared day as state_views builds them, returns the position and
+    own trades its last state hands to the next day
+    """
+    time_limit = prepared.offset + simulation.time_limit
+    states = Lookahead(state_views(prepared.book, prepared.tape, simulation.positionable, time_limit))
+    simulation.engine.load_trades(prepared.tape, prepared.mid_prices.timestamps, time_limit)
+    state = states.next()
+    if carried is not None:
+        state.position, state.own_trades = carried
+    tick = 0
+    tick_timer = simulation.profiler.stage('tick')
+    while state is not None:
+        with tick_timer:
+            next_state = states.peek()
+            last = next_state is None
+            grouped_by_symbol, position, merged = run_tick(simulation, state, tick, prepared.mid_prices.mids[tick], final and last)
+        simulation.merged_orders += merged
+        if sandbox is not None and state.timestamp != 0:
+            sandbox.write(state.timestamp, None)
+        if last:
+            if final:
+                simulation.print("End of simulation reached. All positions left are liquidated")
+                simulation.print(f'{simulation.merged_orders} orders were merged into an order at the same price level')
+            return grouped_by_symbol, position
+        next_state.own_trades = grouped_by_symbol
+        next_state.position = position
+        tick += 1
+        state = states.next()
+
+
+def simulate_days(round: int, days: list[int], trader, time_limit=999900, names=True, fill_model='exact', profiler: Profiler = NULL_PROFILER, budget: Optional[TickBudget] = None, output=None, prefetch=True) -> dict[str, float]:
+    """
+    Runs trader over days of round as one timeline and writes one log, returns the final profit by symbol.
+    prefetch prepares the next day in a background thread while a day runs.
+    """
+    if len(days) == 0:
+        raise ValueError('simulate_days needs at least one day')
+    simulation = Simulation(round, days[0], trader, time_limit, names, fill_model, profiler=profiler, budget=budget, output=output)
+    log_path = simulation.log_path = new_log_path()
+    tables: list[ActivitiesTable] = []
+    # the own trades and position the last state of a day hands to the first state of the next
+    carried = None
+    profiler.instrument(trader)
+    with profiler.stage('simulation'), ThreadPoolExecutor(max_workers=1) as executor, open(log_path, 'w', encoding="utf-8", newline='\n') as f:
+        f.writelines(log_header)
+        f.write('\n')
+        with profiler.stage('prepare_day'):
+            prepared = prepare_day(simulation, days[0], 0)
+        # the ledger columns of every day, the mid prices of the later days follow them
+        symbols = prepared.mid_prices.symbols
+        upcoming: Optional[Future] = None
+        with sandbox_log(trader, f) as sandbox:
+            for i, day in enumerate(days):
+                # the time spent waiting for the background thread, or preparing the day without prefetch
+                if i > 0:
+                    with profiler.stage('prepare_day'):
+                        prepared = upcoming.result() if prefetch else prepare_day(simulation, day, i * DAY_LENGTH, symbols)
+                final = i == len(days) - 1
+                if prefetch and not final:
+                    upcoming = executor.submit(prepare_day, simulation, days[i + 1], (i + 1) * DAY_LENGTH, symbols)
+                ledger = Ledger(symbols, len(prepared.mid_prices.timestamps))
+                if simulation.ledger is not None:
+                    ledger.carry(simulation.ledger)
+                simulation.day = day
+                simulation.ledger = ledger
+                simulation.mid_prices = prepared.mid_prices
+                own_trades, position = run_day(simulation, prepared, carried, sandbox, final)
+                carried = (position, own_trades)
+                with profiler.stage('activities_log'):
+                    tables.append(activities_table(prepared.book, simulation.symbols, day, prepared.offset + time_limit, ledger))
+        with profiler.stage('activities_log'):
+            write_activities_header(f)
+            for table in tables:
+                table.write_csv(f)
+    profiler.restore()
+    total_profit = 0
+    for symbol, profit in tables[-1].final_profits().items():
+        simulation.print(f'Final profit for {symbol} = {profit}')
+        total_profit += profit
+    simulation.print(f'Total profit = {total_profit}')
+    simulation.print(f'\nSimulation on round {round} days {", ".join(map(str, days))} for time {int(tables[-1].timestamps.max())} complete')
+    if budget is not None:
+        budget.close()
+        budget.print_summary(output)
+    if profiler.enabled:
+        if budget is not None:
+            profiler.meta['budget'] = budget.report()
+        write_profile(profiler, log_path, output, round=round, days=days, names=names, fill_model=simulation.fill_model, prefetch=prefetch)
+    return simulation.ledger.final_profit()
@@ -0,0 +1,158 @@
+"""
+Stage profiler of the backtester
+Times the stages of a run (loading, state building, every Trader.run, matching, the ledger,
+the activities log) and the strategy methods of the trader, keeping every duration so the
+report has per-tick latency percentiles next to the totals. The report is written as JSON
+next to the log. Without --profile the backtester uses NULL_PROFILER, whose stages do
+nothing and whose trader is left as it is.
+Sample command:
+python3 backtester.py 2 0 --profile
+"""
+import json
+import time
+from typing import Optional
+import numpy as np
+
+
+class StageTimer:
+    """
+    Context manager adding the duration of every with block to durations
+    """
+    __slots__ = ('durations', 'start')
+
+    def __init__(self):
+        self.durations: list[float] = []
+        self.start = 0.0
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.durations.append(time.perf_counter() - self.start)
+        return False
+
+
+class NullTimer:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+class Profiler:
+    enabled = True
+
+    def __init__(self):
+        self.timers: dict[str, StageTimer] = {}
+        self.meta: dict[str, object] = {}
+        self.instrumented: list[tuple[object, str]] = []
+
+    def stage(self, name: str) -> StageTimer:
+        """
+        Returns the timer of a stage, for with profiler.stage(name): ...
+        A stage must not be nested in itself.
+        """
+        timer = self.timers.get(name)
+        if timer is None:
+            timer = self.timers[name] = StageTimer()
+        return timer
+
+    def wrap(self, owner, name: str, stage: str):
+        """
+        Replaces the method name of the instance owner by one timed as stage
+        """
+        method = getattr(owner, name)
+        timer = self.stage(stage)
+
+        def timed(*args, **kwargs):
+            with timer:
+                return method(*args, **kwargs)
+        setattr(owner, name, timed)
+        self.instrumented.append((owner, name))
+
+    def instrument(self, trader, methods: Optional[list[str]] = None):
+        """
+        Times the strategy methods of the trader, by default every public method of its class
+        and its base classes but run, as strategy.<name>, and the flush of its Logger as logger.flush
+        """
+        if methods is None:
+            methods = []
+            for cls in type(trader).__mro__[:-1]:
+                methods += [name for name, value in vars(cls).items()
+                            if callable(value) and not name.startswith('_') and name not in ('run', 'after_last_round')
+                            and name not in methods]
+        for name in methods:
+            self.wrap(trader, name, f'strategy.{name}')
+        logger = getattr(trader, 'logger', None)
+        if callable(getattr(logger, 'flush', None)):
+            self.wrap(logger, 'flush', 'logger.flush')
+
+    def restore(self):
+        """
+        Removes the timed methods again
+        """
+        for owner, name in reversed(self.instrumented):
+            delattr(owner, name)
+        self.instrumented = []
+
+    def report(self) -> dict:
+        """
+        Returns the calls, total and latency percentiles of every stage, shares of the simulation stage
+        """
+        wall = sum(self.timers['simulation'].durations) if 'simulation' in self.timers else None
+        stages = {}
+        for name, timer in self.timers.items():
+            if len(timer.durations) == 0:
+                continue
+            micros = np.array(timer.durations) * 1e6
+            # power of two buckets: the count of durations up to each bound in microseconds, above the previous one
+            bounds = 2.0 ** np.arange(0, max(1, int(np.ceil(np.log2(max(micros.max(), 1)))) + 1))
+            counts = np.bincount(np.searchsorted(bounds, micros), minlength=len(bounds))[:len(bounds)]
+            total = float(micros.sum() / 1e6)
+            stages[name] = {
+                'calls': len(micros),
+                'total_s': total,
+                'share': total / wall if wall else None,
+                'mean_us': float(micros.mean()),
+                'p50_us': float(np.percentile(micros, 50)),
+                'p99_us': float(np.percentile(micros, 99)),
+                'max_us': float(micros.max()),
+                'histogram_us': { f'<={int(bound)}': int(count) for bound, count in zip(bounds, counts) if count > 0 },
+            }
+        return { **self.meta, 'wall_s': wall, 'stages': stages }
+
+    def save(self, path: str):
+        with open(path, 'w', encoding="utf-8") as f:
+            json.dump(self.report(), f, indent=2)
+
+    def print_summary(self, file=None):
+        stages = self.report()['stages']
+        print(f'{"stage":<32} {"calls":>8} {"total s":>9} {"share":>6} {"p50 us":>9} {"p99 us":>9} {"max us":>10}', file=file)
+        for name, stage in sorted(stages.items(), key=lambda item: -item[1]['total_s']):
+            share = '' if stage['share'] is None else f'{stage["share"]:.1%}'
+            print(f'{name:<32} {stage["calls"]:>8} {stage["total_s"]:>9.3f} {share:>6} {stage["p50_us"]:>9.1f} {stage["p99_us"]:>9.1f} {stage["max_us"]:>10.1f}', file=file)
+
+
+class NullProfiler(Profiler):
+    """
+    Profiler that records nothing, the default of the backtester. NULL_PROFILER is shared by
+    every run without a profiler, so nothing of a run is kept on it.
+    """
+    enabled = False
+    timer = NullTimer()
+
+    def stage(self, name: str) -> NullTimer:
+        return self.timer
+
+    def instrument(self, trader, methods: Optional[list[str]] = None):
+        pass
+
+    def restore(self):
+        pass
+
+
+NULL_PROFILER = NullProfiler()
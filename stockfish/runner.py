@@ -0,0 +1,107 @@
+"""
+Runs the backtester on every available training day in parallel
+Every (round, day, names) combination with a prices and a trades file in TRAINING_DATA_PREFIX
+is simulated in its own worker process with a fresh trader, and the final profits of all days
+are merged into one table. Sample command, after compiling trader.py with bash.py:
+python3 runner.py
+The trader can also be imported directly as module:Class, e.g. for an algorithm file:
+python3 runner.py --trader stockfish.algorithms.round5:Round5 --rounds 1 2
+"""
+import argparse
+import contextlib
+import importlib
+import os
+import re
+import sys
+from concurrent.futures import ProcessPoolExecutor, as_completed
+import pandas as pd
+from backtester import TRAINING_DATA_PREFIX, simulate_alternative
+from matching import FILL_MODELS
+
+PRICES_FILE_PATTERN = re.compile(r'prices_round_(-?\d+)_day_(-?\d+)\.csv$')
+PARENT_DIRECTORY = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def discover_days(directory: str, rounds=None, names=None) -> list[tuple[int, int, bool]]:
+    """
+    Returns every (round, day, names) with both a prices and a matching trades file
+    """
+    jobs = []
+    files = set(os.listdir(directory))
+    for file_name in sorted(files):
+        match = PRICES_FILE_PATTERN.match(file_name)
+        if match is None:
+            continue
+        round, day = int(match.group(1)), int(match.group(2))
+        if rounds is not None and round not in rounds:
+            continue
+        for with_names, suffix in [(True, 'wn'), (False, 'nn')]:
+            if names is not None and with_names != names:
+                continue
+            if f'trades_round_{round}_day_{day}_{suffix}.csv' in files:
+                jobs.append((round, day, with_names))
+    return jobs
+
+
+def load_trader_class(spec: str):
+    """
+    Imports module:Class, e.g. trader:Trader
+    """
+    module_name, _, class_name = spec.partition(':')
+    if PARENT_DIRECTORY not in sys.path:
+        # algorithm files import their helpers as stockfish.*
+        sys.path.append(PARENT_DIRECTORY)
+    return getattr(importlib.import_module(module_name), class_name or 'Trader')
+
+
+def run_day(trader_spec: str, round: int, day: int, names: bool, time_limit: int, fill_model: str, verbose: bool) -> dict[str, float]:
+    trader = load_trader_class(trader_spec)()
+    if verbose:
+        return simulate_alternative(round, day, trader, time_limit, names, fill_model == 'halfway', fill_model=fill_model)
+    with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+        return simulate_alternative(round, day, trader, time_limit, names, fill_model == 'halfway', fill_model=fill_model)
+
+
+def run_all(jobs: list[tuple[int, int, bool]], trader_spec='trader:Trader', time_limit=999000, fill_model='halfway', workers=None, verbose=False) -> pd.DataFrame:
+    """
+    Simulates every job in a process pool (all cores by default) and returns one row per job
+    """
+    rows = []
+    with ProcessPoolExecutor(max_workers=workers or os.cpu_count()) as executor:
+        futures = {
+            executor.submit(run_day, trader_spec, round, day, names, time_limit, fill_model, verbose): (round, day, names)
+            for round, day, names in jobs
+        }
+        for future in as_completed(futures):
+            round, day, names = futures[future]
+            profits = future.result()
+            print(f'Round {round} day {day} ({"with" if names else "without"} names): {sum(profits.values())}')
+            rows.append({ 'round': round, 'day': day, 'names': names, **profits, 'total': sum(profits.values()) })
+    summary = pd.DataFrame(rows).sort_values(['round', 'day', 'names'], ascending=[True, True, False])
+    columns = [column for column in summary.columns if column != 'total'] + ['total']
+    return summary[columns].reset_index(drop=True)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Backtest a trader on every training day in parallel')
+    parser.add_argument('--trader', default='trader:Trader', help='module:Class to instantiate in every worker (default: trader:Trader)')
+    parser.add_argument('--rounds', type=int, nargs='*', help='only these rounds')
+    parser.add_argument('--names', choices=['wn', 'nn'], help='only the trades files with (wn) or without (nn) names')
+    parser.add_argument('--time-limit', type=int, default=999000)
+    parser.add_argument('--fill-model', choices=FILL_MODELS.keys(), default='halfway')
+    parser.add_argument('--workers', type=int, help='worker processes (default: all cores)')
+    parser.add_argument('--output', help='also write the summary table to this CSV file')
+    parser.add_argument('--verbose', action='store_true', help='keep the output of the simulations')
+    args = parser.parse_args()
+
+    names = None if args.names is None else args.names == 'wn'
+    jobs = discover_days(TRAINING_DATA_PREFIX, args.rounds, names)
+    if len(jobs) == 0:
+        print(f'No training days found in {TRAINING_DATA_PREFIX}')
+        sys.exit(1)
+    summary = run_all(jobs, args.trader, args.time_limit, args.fill_model, args.workers, args.verbose)
+    print()
+    print(summary.fillna('').to_string(index=False))
+    print(f'\nTotal profit over {len(summary)} runs = {summary["total"].sum()}')
+    if args.output:
+        summary.to_csv(args.output, index=False)
@@ -0,0 +1,174 @@
+"""
+Shared-memory market data for multi-process backtests
+MarketDataService loads every day once in the parent process and copies the columns of its
+PriceBook and TradeTape into one multiprocessing.shared_memory block per day. Workers get
+a small picklable SharedDay and attach to the blocks, the columns are NumPy arrays over the
+shared buffer, so no worker holds its own copy of the market data.
+backtest_views runs a trader over such a day without building the states of the whole day:
+state_views builds them from row views of the book chunk by chunk as the run consumes them,
+the ledger keeps no tick history and the Logger of the trader writes nothing. Worker memory
+stays flat when workers are added.
+"""
+from multiprocessing.shared_memory import SharedMemory
+from typing import Iterator, List
+import numpy as np
+from datamodel import Product, TradingState
+from ledger import Ledger
+from market_data import PriceBook, TradeTape, add_market_trades, build_states, mid_prices_from_book
+from cache import ALIGNMENT, PRICE_BOOK_ARRAYS, TRADE_TAPE_ARRAYS
+from logger import NullSink
+from backtester import Simulation, attached_sink, load_day, run_tick
+from streaming import Lookahead
+
+VIEW_CHUNK_TICKS = 500
+
+# Blocks attached by this process, kept open as long as their arrays are in use
+attached_blocks: dict[str, SharedMemory] = {}
+
+
+class SharedDay:
+    """
+    Where the columns of a day live: the name of the block, the dtype, shape and offset of
+    every array and the string tables of the book and tape
+    """
+    def __init__(self, key: tuple, block: str, layout: dict[str, tuple[str, tuple, int]], products: List[Product], symbols: List[str], names: List[str]):
+        self.key = key
+        self.block = block
+        self.layout = layout
+        self.products = products
+        self.symbols = symbols
+        self.names = names
+
+    def arrays(self, buffer, prefix: str) -> dict[str, np.ndarray]:
+        arrays = {}
+        for name, (dtype, shape, offset) in self.layout.items():
+            if not name.startswith(prefix):
+                continue
+            if 0 in shape:
+                arrays[name[len(prefix):]] = np.empty(shape, dtype=np.dtype(dtype))
+                continue
+            array = np.ndarray(shape, dtype=np.dtype(dtype), buffer=buffer, offset=offset)
+            array.flags.writeable = False
+            arrays[name[len(prefix):]] = array
+        return arrays
+
+    def attach(self) -> tuple[PriceBook, TradeTape]:
+        """
+        Returns the PriceBook and TradeTape of the day over the shared block, without copying
+        """
+        block = attached_blocks.get(self.block)
+        if block is None:
+            # worker processes share the resource tracker of the service, which unlinks the block
+            block = attached_blocks[self.block] = SharedMemory(name=self.block)
+        book = PriceBook(products=self.products, **self.arrays(block.buf, 'book.'))
+        tape = TradeTape(symbols=self.symbols, names=self.names, **self.arrays(block.buf, 'tape.'))
+        return book, tape
+
+
+def _aligned(offset: int) -> int:
+    return (offset + ALIGNMENT - 1) // ALIGNMENT * ALIGNMENT
+
+
+def share_day(key: tuple, book: PriceBook, tape: TradeTape) -> tuple[SharedMemory, SharedDay]:
+    """
+    Copies the columns of book and tape into a new shared block
+    """
+    columns = { f'book.{name}': np.ascontiguousarray(getattr(book, name)) for name in PRICE_BOOK_ARRAYS }
+    columns.update({ f'tape.{name}': np.ascontiguousarray(getattr(tape, name)) for name in TRADE_TAPE_ARRAYS })
+    layout = {}
+    size = 0
+    for name, array in columns.items():
+        offset = _aligned(size)
+        layout[name] = (array.dtype.str, array.shape, offset)
+        size = offset + array.nbytes
+    block = SharedMemory(create=True, size=max(size, 1))
+    for name, array in columns.items():
+        if array.size > 0:
+            np.ndarray(array.shape, dtype=array.dtype, buffer=block.buf, offset=layout[name][2])[...] = array
+    return block, SharedDay(key, block.name, layout, book.products, tape.symbols, tape.names)
+
+
+class MarketDataService:
+    """
+    Owns the shared blocks of a list of (round, day, names) jobs. Used as a context manager,
+    days are the SharedDay to hand to the workers and the blocks are removed on exit.
+    """
+    def __init__(self, jobs: list[tuple[int, int, bool]]):
+        self.jobs = jobs
+        self.blocks: list[SharedMemory] = []
+        self.days: list[SharedDay] = []
+
+    def __enter__(self):
+        try:
+            for round, day, names in self.jobs:
+                block, shared = share_day((round, day, names), *load_day(round, day, names))
+                self.blocks.append(block)
+                self.days.append(shared)
+        except BaseException:
+            self.close()
+            raise
+        return self
+
+    @property
+    def size(self) -> int:
+        return sum(block.size for block in self.blocks)
+
+    def close(self):
+        for block in self.blocks:
+            block.close()
+            block.unlink()
+        self.blocks = []
+
+    def __exit__(self, *exc):
+        self.close()
+        return False
+
+
+def state_views(book: PriceBook, tape: TradeTape, positionable: List[Product], time_limit: int, chunk_ticks=VIEW_CHUNK_TICKS) -> Iterator[TradingState]:
+    """
+    Yields the states build_states and add_market_trades make, building chunk_ticks of them at a time
+    """
+    n = book.cutoff(time_limit)
+    trades = tape.cutoff(time_limit)
+    tick_starts = np.flatnonzero(np.diff(book.timestamps[:n]) != 0) + 1
+    bounds = [0, *tick_starts[chunk_ticks - 1::chunk_ticks].tolist(), n]
+    trade_start = 0
+    for start, stop in zip(bounds[:-1], bounds[1:]):
+        # the trades before the first timestamp of the next chunk
+        trade_stop = trades if stop == n else int(np.searchsorted(tape.timestamps[:trades], book.timestamps[stop], 'left'))
+        states = build_states(book.rows(start, stop), positionable, time_limit)
+        add_market_trades(states, tape.rows(trade_start, trade_stop), time_limit)
+        trade_start = trade_stop
+        yield from states.values()
+
+
+def backtest_views(simulation: Simulation, book: PriceBook, tape: TradeTape) -> Ledger:
+    """
+    backtest_day over state_views, returns a Ledger without tick history
+    """
+    states = Lookahead(state_views(book, tape, simulation.positionable, simulation.time_limit))
+    simulation.engine.load_trades(tape, np.unique(book.timestamps[:book.cutoff(simulation.time_limit)]), simulation.time_limit)
+    state = states.next()
+    symbols = list(state.position.keys())
+    with simulation.profiler.stage('mid_prices'):
+        mids = mid_prices_from_book(book, symbols, simulation.time_limit).mids
+    simulation.ledger = Ledger(symbols, None)
+    tick = 0
+    tick_timer = simulation.profiler.stage('tick')
+    with attached_sink(simulation.trader, NullSink()):
+        while state is not None:
+            with tick_timer:
+                next_state = states.peek()
+                last = next_state is None
+                grouped_by_symbol, position, merged = run_tick(simulation, state, tick, mids[tick], last)
+            simulation.merged_orders += merged
+            if last:
+                simulation.print("End of simulation reached. All positions left are liquidated")
+                simulation.print(f'{simulation.merged_orders} orders were merged into an order at the same price level')
+            # the last state receives its own trades and position, like in trades_position_pnl_run
+            receiver = state if last else next_state
+            receiver.own_trades = grouped_by_symbol
+            receiver.position = position
+            tick += 1
+            state = states.next()
+    return simulation.ledger
@@ -0,0 +1,230 @@
+"""
+Streaming backtest with bounded memory
+The prices and trades CSVs are read in chunks and turned into states in timestamp order as
+the simulation consumes them. Each state is run, matched, booked into a ledger without tick
+history, and written to the log before the next chunk is needed, so memory does not grow with
+the length of the day. The activities log is spooled to a temporary file and appended to the
+log at the end, keeping the layout of the full run.
+A run starting later than 0 opens both files at its start through their index in cache.py.
+Sample command:
+python3 backtester.py 2 0 --stream
+"""
+import shutil
+import tempfile
+from collections import deque
+from typing import Iterator, Optional
+import numpy as np
+import pandas as pd
+from datamodel import OrderDepth, TradingState
+from ledger import Ledger
+from market_data import add_market_trades, build_states, price_book_from_frame, trade_tape_from_frame
+from profiler import NULL_PROFILER, Profiler
+from budget import TickBudget
+from cache import open_csv_at
+from backtester import (
+    Simulation,
+    log_header,
+    new_log_path,
+    run_tick,
+    sandbox_log,
+    training_paths,
+    write_activities,
+    write_activities_header,
+    write_profile,
+)
+
+STREAM_CHUNK_ROWS = 4096
+
+
+class TradeStream:
+    """
+    Reads a trades file in chunks and hands out its rows up to a timestamp
+    """
+    def __init__(self, path: str, chunksize: int, start_time=0):
+        self.chunks = read_chunks(path, chunksize, start_time, dtype={ 'seller': str, 'buyer': str })
+        self.buffer: Optional[pd.DataFrame] = None
+        self.exhausted = False
+
+    def until(self, time: int) -> pd.DataFrame:
+        while not self.exhausted and (self.buffer is None or self.buffer['timestamp'].iloc[-1] <= time):
+            chunk = next(self.chunks, None)
+            if chunk is None:
+                self.exhausted = True
+            else:
+                self.buffer = chunk if self.buffer is None else pd.concat([self.buffer, chunk], ignore_index=True)
+        if self.buffer is None:
+            return pd.DataFrame(columns=['timestamp', 'buyer', 'seller', 'symbol', 'currency', 'price', 'quantity'])
+        due = self.buffer['timestamp'] <= time
+        rows = self.buffer[due]
+        self.buffer = self.buffer[~due]
+        return rows
+
+
+def read_chunks(path: str, chunksize: int, start_time=0, **kwargs) -> Iterator[pd.DataFrame]:
+    """
+    pd.read_csv of path in chunks, from the first row with a timestamp of at least start_time
+    """
+    if start_time == 0:
+        yield from pd.read_csv(path, sep=';', chunksize=chunksize, **kwargs)
+        return
+    f, columns = open_csv_at(path, start_time)
+    with f:
+        yield from pd.read_csv(f, sep=';', chunksize=chunksize, header=None, names=columns, **kwargs)
+
+
+def _states_of(frame: pd.DataFrame, trades: TradeStream, positionable: list[str], time_limit: int) -> Iterator[TradingState]:
+    if len(frame) == 0:
+        return
+    states = build_states(price_book_from_frame(frame), positionable, time_limit)
+    if len(states) > 0:
+        add_market_trades(states, trade_tape_from_frame(trades.until(max(states))), time_limit)
+    yield from states.values()
+
+
+def stream_states(prices_path: str, trades_path: str, positionable: list[str], time_limit=999900, chunksize=STREAM_CHUNK_ROWS, start_time=0) -> Iterator[TradingState]:
+    """
+    Yields the states of a training day one by one, reading both files chunksize rows at a time.
+    Price key types follow the dtypes pandas infers per chunk, so a chunk without gaps in a
+    price column gives int keys where a whole-file parse may have given equal float keys.
+    """
+    trades = TradeStream(trades_path, chunksize, start_time)
+    carry = None
+    for chunk in read_chunks(prices_path, chunksize, start_time):
+        frame = chunk if carry is None else pd.concat([carry, chunk], ignore_index=True)
+        # the rows of the last timestamp may continue in the next chunk
+        last_time = frame['timestamp'].iloc[-1]
+        held_back = frame['timestamp'] == last_time
+        carry = frame[held_back]
+        yield from _states_of(frame[~held_back], trades, positionable, time_limit)
+        if last_time > time_limit:
+            return
+    if carry is not None:
+        yield from _states_of(carry, trades, positionable, time_limit)
+
+
+class Lookahead:
+    """
+    Iterator wrapper that can peek at upcoming items, buffering only what was peeked at
+    """
+    def __init__(self, iterator):
+        self.iterator = iter(iterator)
+        self.buffer = deque()
+
+    def peek(self, i=0):
+        while len(self.buffer) <= i:
+            item = next(self.iterator, None)
+            if item is None:
+                return None
+            self.buffer.append(item)
+        return self.buffer[i]
+
+    def next(self):
+        if len(self.buffer) > 0:
+            return self.buffer.popleft()
+        return next(self.iterator, None)
+
+
+def book_mid(order_depth: OrderDepth) -> Optional[float]:
+    if len(order_depth.buy_orders) == 0 or len(order_depth.sell_orders) == 0:
+        return None
+    return (max(order_depth.buy_orders) + min(order_depth.sell_orders)) / 2
+
+
+class StreamingMids:
+    """
+    Gap-filled mid prices like mid_prices_from_book: the last known mid while a side is empty,
+    and for leading gaps the first mid found by peeking ahead in the stream
+    """
+    def __init__(self, symbols: list[str]):
+        self.symbols = symbols
+        self.last: list[Optional[float]] = [None] * len(symbols)
+
+    def at(self, state: TradingState, upcoming: Lookahead) -> np.ndarray:
+        for i, symbol in enumerate(self.symbols):
+            mid = book_mid(state.order_depths[symbol])
+            if mid is not None:
+                self.last[i] = mid
+                continue
+            ahead = 0
+            while self.last[i] is None:
+                next_state = upcoming.peek(ahead)
+                if next_state is None:
+                    break
+                self.last[i] = book_mid(next_state.order_depths[symbol])
+                ahead += 1
+        return np.array([np.nan if mid is None else mid for mid in self.last])
+
+
+def simulate_streaming(round: int, day: int, trader, time_limit=999900, names=True, fill_model='exact', chunksize=STREAM_CHUNK_ROWS, profiler: Profiler = NULL_PROFILER, budget: Optional[TickBudget] = None, output=None, start_time=0) -> dict[str, float]:
+    """
+    simulate_alternative without holding the day in memory, returns the final profit by symbol.
+    The profiler times reading and building the states as read_states, except for the
+    states read by peeking ahead, which are part of the tick stage.
+    """
+    simulation = Simulation(round, day, trader, time_limit, names, fill_model, profiler=profiler, budget=budget, output=output, start_time=start_time)
+    if hasattr(simulation.engine.fill_model, 'load_trades'):
+        raise ValueError(f'The {simulation.fill_model} fill model needs the trades of the whole day, run it without streaming')
+    prices_path, trades_path = training_paths(round, day, names)
+    states = Lookahead(stream_states(prices_path, trades_path, simulation.positionable, time_limit, chunksize, start_time))
+    mids = None
+    tick = 0
+    time = 0
+    total_profit = 0
+    log_path = simulation.log_path = new_log_path()
+    tick_timer = profiler.stage('tick')
+    read_timer = profiler.stage('read_states')
+    with read_timer:
+        empty = states.peek() is None
+    if empty:
+        raise ValueError(f'No tick from {start_time} to {time_limit} on round {round} day {day}')
+    profiler.instrument(trader)
+    with profiler.stage('simulation'), open(log_path, 'w', encoding="utf-8", newline='\n') as f, tempfile.TemporaryFile('w+', encoding="utf-8", newline='\n') as activities:
+        f.writelines(log_header)
+        f.write('\n')
+        with sandbox_log(trader, f) as sandbox:
+            with read_timer:
+                state = states.next()
+            while state is not None:
+                with tick_timer:
+                    if simulation.ledger is None:
+                        simulation.ledger = Ledger(list(state.position.keys()), None)
+                        mids = StreamingMids(simulation.ledger.symbols)
+                    time = state.timestamp
+                    next_state = states.peek()
+                    last = next_state is None
+                    pnl = simulation.ledger.running_pnl()
+                    grouped_by_symbol, position, merged = run_tick(simulation, state, tick, mids.at(state, states), last)
+                simulation.merged_orders += merged
+
+                if sandbox is not None and time != 0:
+                    sandbox.write(time, None)
+                if last:
+                    simulation.print("End of simulation reached. All positions left are liquidated")
+                    simulation.print(f'{simulation.merged_orders} orders were merged into an order at the same price level')
+                    pnl = simulation.ledger.running_pnl()
+                with profiler.stage('activities_log'):
+                    total_profit += write_activities(activities, day, time, state, simulation.symbols, pnl, last, output)
+
+                # the last state receives its own trades and position, like in trades_position_pnl_run
+                receiver = state if last else next_state
+                receiver.own_trades = grouped_by_symbol
+                receiver.position = position
+                tick += 1
+                with read_timer:
+                    state = states.next()
+
+        with profiler.stage('activities_log'):
+            write_activities_header(f)
+            activities.seek(0)
+            shutil.copyfileobj(activities, f)
+    profiler.restore()
+    simulation.print(f'Total profit = {total_profit}')
+    simulation.print(f"\nSimulation on round {round} day {day} for time {time} complete")
+    if budget is not None:
+        budget.close()
+        budget.print_summary(output)
+    if profiler.enabled:
+        if budget is not None:
+            profiler.meta['budget'] = budget.report()
+        write_profile(profiler, log_path, output, round=round, day=day, names=names, fill_model=simulation.fill_model, stream=True)
+    return simulation.ledger.final_profit()
@@ -0,0 +1,149 @@
+"""
+Parameter sweep over the tuning values of a trader
+Every candidate parameter set is backtested on the chosen training days in a pool of worker
+processes. The days are loaded once into shared memory (see shared_data.py), every worker
+attaches to the same read-only columns and builds the states of a run as it goes, so adding
+workers does not multiply the market data. The results are ranked by total profit.
+Sample commands, a grid and 200 random samples:
+python3 sweep.py --grid etf_premium=350,400,450 etf_threshold=40,60,80
+python3 sweep.py --random 200 pairs_correlation=1.8:1.95 pairs_threshold=0.0005:0.003 --rounds 2
+Parameters are the keyword arguments of the trader class, see Round5.params in algorithms/round5.py.
+"""
+import argparse
+import itertools
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+import pandas as pd
+from backtester import TRAINING_DATA_PREFIX, Simulation
+from matching import FILL_MODELS
+from runner import discover_days, load_trader_class
+from shared_data import MarketDataService, SharedDay, backtest_views
+
+# Market data of the worker process, attached once by init_worker
+worker_days = {}
+worker_config = {}
+
+
+def parse_value(text: str):
+    for cast in (int, float):
+        try:
+            return cast(text)
+        except ValueError:
+            pass
+    return text
+
+
+def grid_space(grid: dict[str, list]) -> list[dict]:
+    """
+    Every combination of the listed values
+    """
+    names = list(grid)
+    return [dict(zip(names, values)) for values in itertools.product(*(grid[name] for name in names))]
+
+
+def random_space(space: dict[str, object], samples: int, seed=0) -> list[dict]:
+    """
+    samples parameter sets drawn from space: a (low, high) tuple is sampled uniformly
+    (as an integer if both bounds are integers), a list is sampled from its values
+    """
+    rng = np.random.default_rng(seed)
+    candidates = []
+    for _ in range(samples):
+        candidate = {}
+        for name, values in space.items():
+            if isinstance(values, tuple):
+                low, high = values
+                if isinstance(low, int) and isinstance(high, int):
+                    candidate[name] = int(rng.integers(low, high + 1))
+                else:
+                    candidate[name] = float(rng.uniform(low, high))
+            else:
+                candidate[name] = values[int(rng.integers(len(values)))]
+        candidates.append(candidate)
+    return candidates
+
+
+def parse_space(arguments: list[str]) -> dict[str, object]:
+    """
+    Parses name=v1,v2,... into a list of values and name=low:high into a range
+    """
+    space = {}
+    for argument in arguments:
+        name, _, values = argument.partition('=')
+        if ':' in values:
+            low, high = values.split(':')
+            space[name] = (parse_value(low), parse_value(high))
+        else:
+            space[name] = [parse_value(value) for value in values.split(',')]
+    return space
+
+
+def init_worker(days: list[SharedDay], trader_spec: str, time_limit: int, fill_model: str):
+    for shared in days:
+        worker_days[shared.key] = shared.attach()
+    worker_config.update(trader_spec=trader_spec, time_limit=time_limit, fill_model=fill_model)
+
+
+def evaluate(params: dict) -> dict[str, float]:
+    """
+    Backtests one parameter set on every day of the worker, returns the total profit per day
+    """
+    trader_class = load_trader_class(worker_config['trader_spec'])
+    profits = {}
+    for (round, day, names), (book, tape) in worker_days.items():
+        with open(os.devnull, 'w') as devnull:
+            simulation = Simulation(round, day, trader_class(**params), worker_config['time_limit'], names, worker_config['fill_model'], output=devnull)
+            ledger = backtest_views(simulation, book, tape)
+        profits[f'round_{round}_day_{day}{"" if names else "_nn"}'] = sum(ledger.final_profit().values())
+    return profits
+
+
+def sweep(candidates: list[dict], jobs: list[tuple[int, int, bool]], trader_spec: str, time_limit=999000, fill_model='halfway', workers=None) -> pd.DataFrame:
+    """
+    Runs every candidate and returns them ranked by total profit
+    """
+    workers = workers or os.cpu_count()
+    chunksize = max(1, len(candidates) // (workers * 4))
+    with MarketDataService(jobs) as service, \
+            ProcessPoolExecutor(max_workers=workers, initializer=init_worker, initargs=(service.days, trader_spec, time_limit, fill_model)) as executor:
+        rows = []
+        for i, (params, profits) in enumerate(zip(candidates, executor.map(evaluate, candidates, chunksize=chunksize))):
+            rows.append({ **params, **profits, 'total': sum(profits.values()) })
+            print(f'[{i + 1}/{len(candidates)}] {params}: {rows[-1]["total"]}')
+    results = pd.DataFrame(rows).sort_values('total', ascending=False).reset_index(drop=True)
+    results.insert(0, 'rank', range(1, len(results) + 1))
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Sweep the tuning parameters of a trader over the training days')
+    search = parser.add_mutually_exclusive_group(required=True)
+    search.add_argument('--grid', nargs='+', metavar='NAME=V1,V2', help='grid search over the listed values')
+    search.add_argument('--random', nargs='+', metavar='N NAME=LOW:HIGH', help='N random samples, from a range or a list of values')
+    parser.add_argument('--trader', default='stockfish.algorithms.round5:Round5', help='module:Class taking the parameters as keyword arguments')
+    parser.add_argument('--rounds', type=int, nargs='*', help='only these rounds')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--time-limit', type=int, default=999000)
+    parser.add_argument('--fill-model', choices=FILL_MODELS.keys(), default='halfway')
+    parser.add_argument('--workers', type=int, help='worker processes (default: all cores)')
+    parser.add_argument('--output', default='sweep_results.csv', help='ranked results table (default: sweep_results.csv)')
+    parser.add_argument('--top', type=int, default=10, help='rows of the ranking to print')
+    args = parser.parse_args()
+
+    if args.grid:
+        candidates = grid_space(parse_space(args.grid))
+    else:
+        candidates = random_space(parse_space(args.random[1:]), int(args.random[0]), args.seed)
+    jobs = discover_days(TRAINING_DATA_PREFIX, args.rounds, names=True)
+    if len(jobs) == 0:
+        print(f'No training days found in {TRAINING_DATA_PREFIX}')
+        sys.exit(1)
+    print(f'Sweeping {len(candidates)} parameter sets over {len(jobs)} days')
+    start = time.perf_counter()
+    results = sweep(candidates, jobs, args.trader, args.time_limit, args.fill_model, args.workers)
+    print(f'\nSweep finished in {time.perf_counter() - start:.1f}s, results written to {args.output}')
+    print(results.head(args.top).to_string(index=False))
+    results.to_csv(args.output, index=False)
@@ -2,7 +2,7 @@
 Submitted file
 """
 import json
-from typing import Any
+from typing import Any, Optional
 from datamodel import Order, ProsperityEncoder, Symbol, Trade, TradingState
 
 
@@ -10,7 +10,7 @@ class Trader:
     """
     Using stable, trending, pairs, seasonal, correlated, and ETF strategies to trade.
     """
-    def __init__(self):
+    def __init__(self, **params):
         self.logger = Logger(local=True)
         self.position_limit = {
             PEARLS: 20,
@@ -24,7 +24,26 @@ class Trader:
             UKULELE: 70,
             PICNIC_BASKET: 70
         }
+        # Tuning values of the strategies, overridable by keyword (see sweep.py)
+        self.params = {
+            'trending_window': 3,
+            'pairs_correlation': 1.875,
+            'pairs_threshold': 0.001,
+            'seasonal_trough_start': 125000,
+            'seasonal_trough_end': 150000,
+            'seasonal_peak_start': 525000,
+            'seasonal_peak_end': 550000,
+            'correlated_threshold': 8,
+            'etf_premium': 400,
+            'etf_threshold': 60
+        }
+        unknown = set(params) - set(self.params)
+        if unknown:
+            raise ValueError(f'Unknown parameters: {", ".join(sorted(unknown))}')
+        self.params.update(params)
+        # Only the last two mid prices of the pairs are compared
         self.mid_prices = {}
+        self.moving_averages = {}
         self.last_observation = {}
 
     def run(self, state):
@@ -43,31 +62,31 @@ class Trader:
             state,
             result,
             BANANAS,
-            3
+            self.params['trending_window']
         )
         self.trade_pairs(
             state,
             result,
             PINA_COLADAS,
             COCONUTS,
-            1.875,
-            0.001
+            self.params['pairs_correlation'],
+            self.params['pairs_threshold']
         )
         self.trade_seasonal(
             state,
             result,
             BERRIES,
-            125000,
-            150000,
-            525000,
-            550000
+            self.params['seasonal_trough_start'],
+            self.params['seasonal_trough_end'],
+            self.params['seasonal_peak_start'],
+            self.params['seasonal_peak_end']
         )
         self.trade_correlated(
             state,
             result,
             DIVING_GEAR,
             DOLPHIN_SIGHTINGS,
-            8
+            self.params['correlated_threshold']
         )
         self.trade_etf(
             state,
@@ -78,8 +97,8 @@ class Trader:
                 DIP: 4,
                 UKULELE: 1
             },
-            400,
-            60
+            self.params['etf_premium'],
+            self.params['etf_threshold']
         )
 
         self.logger.flush(state, result)
@@ -101,10 +120,9 @@ class Trader:
             return
         if product not in result:
             result[product] = []
-        if product not in self.mid_prices:
-            self.mid_prices[product] = []
-        self.mid_prices[product].append(get_mid_price(state.order_depths[product]))
-        acceptable_price = get_moving_average(self.mid_prices[product], window)
+        if product not in self.moving_averages:
+            self.moving_averages[product] = SimpleMovingAverage(window)
+        acceptable_price = self.moving_averages[product].update(get_mid_price(state.order_depths[product]))
         position = state.position.get(product, 0)
         buy_volume = self.position_limit.get(product, 0) - position
         sell_volume = self.position_limit.get(product, 0) + position
@@ -119,9 +137,9 @@ class Trader:
         if product2 not in result:
             result[product2] = []
         if product1 not in self.mid_prices:
-            self.mid_prices[product1] = []
+            self.mid_prices[product1] = RingBuffer(2)
         if product2 not in self.mid_prices:
-            self.mid_prices[product2] = []
+            self.mid_prices[product2] = RingBuffer(2)
         self.mid_prices[product1].append(get_mid_price(state.order_depths[product1]))
         self.mid_prices[product2].append(get_mid_price(state.order_depths[product2]))
         best_ask = get_best_ask(state.order_depths[product1])
@@ -146,9 +164,11 @@ class Trader:
         position = state.position.get(product, 0)
         buy_volume = self.position_limit.get(product, 0) - position
         sell_volume = self.position_limit.get(product, 0) + position
-        if buy_volume > 0 and state.timestamp >= trough_start and state.timestamp <= trough_end:
+        # the time of day, also on the later days of a multi-day backtest
+        time = state.timestamp % DAY_LENGTH
+        if buy_volume > 0 and time >= trough_start and time <= trough_end:
             place_buy_order(product, result[product], best_ask, buy_volume)
-        if sell_volume > 0 and state.timestamp >= peak_start and state.timestamp <= peak_end:
+        if sell_volume > 0 and time >= peak_start and time <= peak_end:
             place_sell_order(product, result[product], best_bid, sell_volume)
 
     def trade_correlated(self, state, result, product, observation, threshold):
@@ -206,70 +226,175 @@ class Trader:
                     place_sell_order(product, result[product], worst_bid - 1, sell_volume)
 
 
+PEARLS = "PEARLS"
+BANANAS = "BANANAS"
+COCONUTS = "COCONUTS"
+PINA_COLADAS = "PINA_COLADAS"
+DIVING_GEAR = "DIVING_GEAR"
+BERRIES = "BERRIES"
+DOLPHIN_SIGHTINGS = "DOLPHIN_SIGHTINGS"
+BAGUETTE = "BAGUETTE"
+DIP = "DIP"
+UKULELE = "UKULELE"
+PICNIC_BASKET = "PICNIC_BASKET"
+OLIVIA = "Olivia"
+# Timestamps of a day run below DAY_LENGTH, a multi-day backtest offsets day i by i * DAY_LENGTH
+DAY_LENGTH = 1000000
+
+
+class LogSink:
+    """
+    Receives the output of every flush with its timestamp, the base sink drops it
+    """
+    def write(self, timestamp: int, output: Optional[str]) -> None:
+        pass
+
+    def write_batch(self, lines: list[tuple[int, Optional[str]]]) -> None:
+        for timestamp, output in lines:
+            self.write(timestamp, output)
+
+    def close(self) -> None:
+        pass
+
+
+class StdoutSink(LogSink):
+    def write(self, timestamp: int, output: Optional[str]) -> None:
+        print(output)
+
+
 class Logger:
     local: bool
-    local_logs: dict[int, str] = {}
 
-    def __init__(self, local=False) -> None:
+    def __init__(self, local=False, compact=True, sink: Optional[LogSink] = None) -> None:
         self.logs = ""
         self.local = local
+        self.compact = compact
+        # stdout is where the exchange collects the logs, local or not
+        self.sink = sink if sink is not None else StdoutSink()
+        # built once instead of by every json.dumps call
+        self.encoder = ProsperityEncoder(separators=(",", ":"), sort_keys=True)
 
     def print(self, *objects: Any, sep: str = " ", end: str = "\n") -> None:
         self.logs += sep.join(map(str, objects)) + end
 
     def flush(self, state: TradingState, orders: dict[Symbol, list[Order]]) -> None:
-        output = json.dumps({
-            "state": state,
-            "orders": orders,
-            "logs": self.logs,
-        }, cls=ProsperityEncoder, separators=(",", ":"), sort_keys=True)
-        if self.local:
-            self.local_logs[state.timestamp] = output
-        print(output)
+        if self.compact:
+            output = self.serialize(state, orders)
+        else:
+            output = json.dumps({
+                "state": state,
+                "orders": orders,
+                "logs": self.logs,
+            }, cls=ProsperityEncoder, separators=(",", ":"), sort_keys=True)
+        self.sink.write(state.timestamp, output)
 
         self.logs = ""
 
-    def compress_state(self, state: TradingState) -> dict[str, Any]:
-        listings = []
-        for listing in state.listings.values():
-            listings.append([listing["symbol"], listing["product"], listing["denomination"]])
+    def close(self) -> None:
+        self.sink.close()
 
-        order_depths = {}
-        for symbol, order_depth in state.order_depths.items():
-            order_depths[symbol] = [order_depth.buy_orders, order_depth.sell_orders]
+    def serialize(self, state: TradingState, orders: dict[Symbol, list[Order]]) -> str:
+        """
+        Returns the compressed state and orders as compact JSON with sorted keys
+        """
+        return self.encoder.encode({
+            "state": self.compress_state(state),
+            "orders": self.compress_orders(orders),
+            "logs": self.logs,
+        })
 
+    def compress_state(self, state: TradingState) -> dict[str, Any]:
         return {
             "t": state.timestamp,
-            "l": listings,
-            "od": order_depths,
+            "l": self.compress_listings(state.listings),
+            "od": { symbol: [order_depth.buy_orders, order_depth.sell_orders] for symbol, order_depth in state.order_depths.items() },
             "ot": self.compress_trades(state.own_trades),
             "mt": self.compress_trades(state.market_trades),
             "p": state.position,
             "o": state.observations,
         }
 
-    def compress_trades(self, trades: dict[Symbol, list[Trade]]) -> list[list[Any]]:
+    def compress_listings(self, listings: dict) -> list[list[Any]]:
         compressed = []
-        for arr in trades.values():
-            for trade in arr:
-                compressed.append([
-                    trade.symbol,
-                    trade.buyer,
-                    trade.seller,
-                    trade.price,
-                    trade.quantity,
-                    trade.timestamp,
-                ])
-
+        for listing in listings.values():
+            if isinstance(listing, dict):
+                compressed.append([listing["symbol"], listing["product"], listing["denomination"]])
+            else:
+                compressed.append([listing.symbol, listing.product, listing.denomination])
         return compressed
 
+    def compress_trades(self, trades: dict[Symbol, list[Trade]]) -> list[list[Any]]:
+        return [
+            [trade.symbol, trade.buyer, trade.seller, trade.price, trade.quantity, trade.timestamp]
+            for arr in trades.values() for trade in arr
+        ]
+
     def compress_orders(self, orders: dict[Symbol, list[Order]]) -> list[list[Any]]:
-        compressed = []
-        for arr in orders.values():
-            for order in arr:
-                compressed.append([order.symbol, order.price, order.quantity])
+        return [[order.symbol, order.price, order.quantity] for arr in orders.values() for order in arr]
 
-        return compressed
+
+class RingBuffer:
+    """
+    The last size values, oldest first
+    """
+    def __init__(self, size):
+        if size < 1:
+            raise ValueError(f'Ring buffer size must be positive, got {size}')
+        self.size = size
+        self.values = [None] * size
+        self.start = 0
+        self.count = 0
+
+    def append(self, value):
+        """
+        Adds a value and returns the value it evicted, None while the buffer is filling
+        """
+        if self.count < self.size:
+            self.values[(self.start + self.count) % self.size] = value
+            self.count += 1
+            return None
+        evicted = self.values[self.start]
+        self.values[self.start] = value
+        self.start = (self.start + 1) % self.size
+        return evicted
+
+    def full(self):
+        return self.count == self.size
+
+    def __len__(self):
+        return self.count
+
+    def __getitem__(self, i):
+        """
+        Indexes like a list of the buffered values, so -1 is the newest value
+        """
+        if i < 0:
+            i += self.count
+        if i < 0 or i >= self.count:
+            raise IndexError('ring buffer index out of range')
+        return self.values[(self.start + i) % self.size]
+
+    def __iter__(self):
+        for i in range(self.count):
+            yield self.values[(self.start + i) % self.size]
+
+
+class SimpleMovingAverage:
+    """
+    Mean of the last window values, of all values while fewer have been seen (like get_moving_average)
+    """
+    def __init__(self, window):
+        self.buffer = RingBuffer(window)
+        self.total = 0
+        self.value = None
+
+    def update(self, x):
+        evicted = self.buffer.append(x)
+        self.total += x
+        if evicted is not None:
+            self.total -= evicted
+        self.value = self.total / len(self.buffer)
+        return self.value
 
 
 def get_best_ask(order_depth):
@@ -309,14 +434,6 @@ def get_mid_price(order_depth):
     return (best_bid + best_ask) / 2
 
 
-def get_moving_average(prices, window_size):
-    """
-    Returns the moving average of the last window_size trades
-    """
-    window_size = min(len(prices), window_size)
-    return sum(price for price in prices[-window_size:]) / window_size
-
-
 def place_buy_order(product, orders, price, quantity):
     """
     Places a buy order
@@ -329,23 +446,3 @@ def place_sell_order(product, orders, price, quantity):
     Places a sell order
     """
     orders.append(Order(product, price, -abs(quantity)))
-
-
-"""
-Constants for product names
-"""
-
-PEARLS = "PEARLS"
-BANANAS = "BANANAS"
-COCONUTS = "COCONUTS"
-PINA_COLADAS = "PINA_COLADAS"
-DIVING_GEAR = "DIVING_GEAR"
-BERRIES = "BERRIES"
-DOLPHIN_SIGHTINGS = "DOLPHIN_SIGHTINGS"
-BAGUETTE = "BAGUETTE"
-DIP = "DIP"
-UKULELE = "UKULELE"
-PICNIC_BASKET = "PICNIC_BASKET"
-OLIVIA = "Olivia"
-
-